@@ -17,8 +17,14 @@ class AbstractBot(ABC):
             text: str,
             inline_keyboard: InlineKeyboard | None = None,
             /, *,
-            chat_id: int | None = None
-    ) -> int:
+            chat_id: int | None = None,
+            random_id: int | None = None
+    ) -> int | None:
+        """
+        :param random_id: ключ идемпотентности: повтор с тем же ключом не создаёт второе сообщение,
+            если платформа это поддерживает.
+        :return: id отправленного сообщения или None, если платформа его не приняла.
+        """
         pass
 
     @abstractmethod
@@ -51,6 +57,14 @@ class AbstractBot(ABC):
     ) -> int:
         pass
 
+    @abstractmethod
+    async def preload(self, path: str, content_type: str, /, *, chat_id: int | None = None):
+        """
+        Заранее загружает медиа на платформу и запоминает ссылку на него,
+        чтобы отправка этого файла не требовала повторной загрузки.
+        """
+        pass
+
     @abstractmethod
     async def delete(self, message_id: int | None = None, chat_id: int | None = None):
         pass
@@ -64,7 +78,10 @@ class AbstractBot(ABC):
             message_id: int | None = None,
             chat_id: int | None = None,
             remove_inline_keyboard: bool = False
-    ):
+    ) -> bool:
+        """
+        :return: платформа приняла правку (или сообщение уже содержит то же самое).
+        """
         pass
 
     @abstractmethod
@@ -1,24 +1,38 @@
 import asyncio
 from abc import ABC, abstractmethod
-
-from aiolimiter import AsyncLimiter
+from contextvars import ContextVar
+from functools import partial
 
 from app.abc.bot import AbstractBot
 from app.abc.message import Message
+from app.store.unit_of_work import chat_fence
 from app.utils.limiter import Limiter
+from app.utils.metrics import HANDLER_DENIALS
 from app.web.application import Application
 
 
+_bot: ContextVar[AbstractBot] = ContextVar("bot")
+_denied_backlog = HANDLER_DENIALS.labels("backlog")
+_denied_locked = HANDLER_DENIALS.labels("locked")
+
+
 class Handler(ABC):
     lock = Limiter(lambda: asyncio.Lock())
-    limiter = Limiter(lambda: AsyncLimiter(max_rate=19, time_period=60))
 
     def __init__(self, app: Application):
         self.app = app
-        self.bot: AbstractBot | None = None
+
+    @property
+    def bot(self) -> AbstractBot:
+        """
+        Бот текущего вызова. Один экземпляр обработчика обслуживает параллельные вызовы
+        из разных чатов, поэтому бот хранится в контексте задачи, а не в атрибуте.
+        """
+        return _bot.get()
 
     async def __call__(self, msg: Message):
-        self.bot = self.app.bot(msg.update, self.limiter[msg.update.chat_id])
+        _bot.set(self.app.bot(msg.update))
+        chat_fence.set(partial(self.app.store.partitions.owns, msg.update.origin, msg.update.chat_id))
 
         await self.handler(msg)
 
@@ -28,11 +42,15 @@ class Handler(ABC):
 
 
 class LimitedHandler(Handler, ABC):
+    backlog_limit = 10  # исходящих запросов чата в очереди
+
     async def __call__(self, msg: Message):
-        if not self.limiter[msg.update.chat_id].has_capacity():
+        if self.app.bot.backlog(msg.update) >= self.backlog_limit:
+            _denied_backlog.inc()
             return
 
         if self.lock[msg.update.chat_id].locked():
+            _denied_locked.inc()
             return
 
         await super().__call__(msg)
@@ -1,28 +1,71 @@
 import typing
+from itertools import product
 from logging import getLogger
 
 from app.abc.bot_view import BotView
-from app.bot.updates import BotUpdate
+from app.bot.updates import BotUpdate, BotCommand, BotCallbackQuery
+
+Key = tuple[typing.Type[BotUpdate], str | None, str | None, typing.Hashable | None]
+
+# Признак обновления, по которому выбирается обработчик внутри типа.
+_DISCRIMINATORS: dict[typing.Type[BotUpdate], typing.Callable[[BotUpdate], typing.Hashable]] = {
+    BotCommand: lambda update: update.command,
+    BotCallbackQuery: lambda update: update.callback_data.type,
+}
 
 
 class Dispatcher:
     """
     Регистрирует обработчики обновлений и ищет подходящий для каждого пришедшего обновления.
+    Обработчики раскладываются в индекс по ключу (тип обновления, платформа, тип чата, признак),
+    где признак - команда или тип данных кнопки, а None в сигнатуре означает "любой".
+    Для обновления просматриваются только подходящие ключи, поэтому стоимость поиска
+    не зависит от количества обработчиков. Регулярные выражения сообщений проверяются
+    уже среди найденных кандидатов. При нескольких подходящих обработчиках, как и раньше,
+    выигрывает зарегистрированный первым.
     """
 
     def __init__(self):
         self.logger = getLogger(self.__class__.__name__)
-        self._handlers: dict[typing.Type[BotUpdate], list[BotView]] = dict()
+        self._index: dict[Key, list[tuple[int, BotView]]] = dict()
+        self._discriminators: dict[typing.Type[BotUpdate], set[typing.Hashable]] = dict()
+        self._resolved: dict[Key, list[BotView]] = dict()
+        self._count = 0
 
     def register(self, handler: BotView) -> typing.NoReturn:
-        self._handlers.setdefault(handler.update_type, []).append(handler)
+        signature = handler.signature
+        for discriminator in signature.keys():
+            key = (handler.update_type, signature.origin, signature.chat_type, discriminator)
+            self._index.setdefault(key, []).append((self._count, handler))
+            self._discriminators.setdefault(handler.update_type, set()).add(discriminator)
+        self._count += 1
+        self._resolved.clear()
 
     async def handle(self, update: BotUpdate) -> typing.NoReturn:
-        self.logger.info(f" new update {update}")
-        for handler in self._handlers.get(type(update), []):
-
-            if handler.signature.match(update):
+        self.logger.debug("new update %s", update)
+        for handler in self._candidates(update):
+            if handler.signature.refine(update):
                 await handler(update)
                 break
         else:
-            self.logger.info(f" matching handler was NOT found for {update}")
+            self.logger.debug("matching handler was NOT found for %s", update)
+
+    def _candidates(self, update: BotUpdate) -> list[BotView]:
+        update_type = type(update)
+        discriminator = None
+        if (get := _DISCRIMINATORS.get(update_type)) is not None:
+            discriminator = get(update)
+            # Неизвестные значения (произвольные команды) не раздувают кэш.
+            if discriminator not in self._discriminators.get(update_type, ()):
+                discriminator = None
+
+        key = (update_type, update.origin, update.chat_type, discriminator)
+        if (candidates := self._resolved.get(key)) is None:
+            candidates = self._resolved[key] = self._resolve(*key)
+        return candidates
+
+    def _resolve(self, update_type, origin, chat_type, discriminator) -> list[BotView]:
+        found = []
+        for key in product((update_type,), {origin, None}, {chat_type, None}, {discriminator, None}):
+            found.extend(self._index.get(key, ()))
+        return [handler for _, handler in sorted(found, key=lambda item: item[0])]
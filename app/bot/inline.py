@@ -1,6 +1,8 @@
 from dataclasses import dataclass, field
 from typing import Iterable, Final
 
+import orjson
+
 PLUG: Final = '_'
 TRANSPARENT: Final = 'ᅠᅠ'
 
@@ -10,6 +12,22 @@ class CallbackData:
     type: str = PLUG
     value: str = PLUG
 
+    def pack(self) -> str:
+        """
+        Компактное представление для callback_data Telegram (не больше 64 байт): "type:value".
+        """
+        return f"{self.type}:{self.value}"
+
+    @classmethod
+    def unpack(cls, raw: str) -> "CallbackData":
+        """
+        Разбирает результат pack. Кнопки, отправленные раньше, содержат JSON.
+        """
+        if raw.startswith('{'):
+            return cls(**orjson.loads(raw))
+        data_type, _, value = raw.partition(':')
+        return cls(data_type, value)
+
 
 @dataclass(slots=True)
 class InlineButton:
@@ -26,3 +44,22 @@ class InlineKeyboard:
 
     def add(self, *buttons: InlineButton):
         self._keyboard.append(buttons)
+
+    def signature(self) -> tuple:
+        """
+        Неизменяемое представление клавиатуры для сравнения содержимого сообщений.
+        """
+        return tuple(
+            tuple((b.text, b.callback_data.type, b.callback_data.value) for b in line)
+            for line in self._keyboard
+        )
+
+    @classmethod
+    def from_signature(cls, signature) -> "InlineKeyboard":
+        """
+        Восстанавливает клавиатуру из результата signature (например, прочитанного из JSON).
+        """
+        keyboard = cls()
+        for line in signature:
+            keyboard.add(*(InlineButton(text, CallbackData(data_type, value)) for text, data_type, value in line))
+        return keyboard
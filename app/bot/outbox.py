@@ -0,0 +1,222 @@
+from __future__ import annotations
+import asyncio
+import typing
+from datetime import datetime, timezone, timedelta
+
+import orjson
+from aiohttp import ClientConnectorError
+
+from app.abc.cleanup_ctx import CleanupCTX
+from app.bot.enums import Origin
+from app.bot.inline import InlineKeyboard
+from app.bot.scheduler import RetryAfter
+from app.utils.http import CircuitOpen
+
+if typing.TYPE_CHECKING:
+    from app.game.models import OutboxMessage
+
+
+class NotSent(Exception):
+    """
+    Платформа ответила ошибкой: сообщение точно не отправлено.
+    """
+
+
+class OutboxSender(CleanupCTX):
+    """
+    Отправляет сообщения ботов из таблицы outbox.
+    Строки читаются пачками в порядке записи и раздаются задачам чатов: у каждого чата с сообщениями
+    своя задача, которая отправляет их по порядку и удаляет строку сразу после отправки.
+    Чат, упёршийся в квоту или retry_after, задерживает только свои сообщения.
+    Повтор отправки не дублирует сообщение: send в ВК повторяется с тем же random_id из строки,
+    а перед send в Telegram, где ключа идемпотентности нет, в строке отмечается начало отправки.
+    Если отправка прервалась с неизвестным исходом (таймаут, падение процесса), такое сообщение
+    не повторяется. Правки повторяются без последствий.
+    Сообщение, которое не удалось отправить, и следующие за ним сообщения чата откладываются
+    с растущей паузой, после нескольких неудачных попыток сообщение выбрасывается.
+    Все правки сообщений игры идут через outbox, поэтому порядок правок одного сообщения сохраняется,
+    а из нескольких ожидающих правок одного сообщения отправляется только последняя.
+    """
+    # Платформы, которые сами отбрасывают повтор send с тем же random_id.
+    _DEDUPLICATED = {Origin.VK}
+    # Ошибки, после которых сообщение точно не отправлено: запрос не дошёл или платформа отказала.
+    _NOT_SENT = (NotSent, RetryAfter, CircuitOpen, ClientConnectorError)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._batch = 100  # строк за запрос
+        self._interval = 1  # seconds, опрос таблицы без уведомлений о новых строках
+        self._backoff = 2  # seconds, пауза перед первым повтором, дальше удваивается
+        self._max_attempts = 5
+        self._task: asyncio.Task | None = None
+        self._chats: dict[tuple, asyncio.Task] = {}  # (origin, chat_id) -> задача отправки чата
+        self._queues: dict[tuple, list[OutboxMessage]] = {}  # прочитанные и ещё не отправленные строки чата
+        self._taken: set[int] = set()  # строки в очередях чатов: повторно не читаются
+        # строки, вышедшие из очередей во время чтения пачки: снимок чтения мог застать их до удаления.
+        self._released: set[int] = set()
+
+    async def on_startup(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def on_shutdown(self):
+        # Неотправленные строки остаются в таблице и уйдут после перезапуска.
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.wait([self._task])
+        if self._chats:
+            _, pending = await asyncio.wait(self._chats.values(), timeout=3)
+            for task in pending:
+                task.cancel()
+            if pending:
+                await asyncio.wait(pending)
+
+    async def _run(self):
+        ready = self.app.store.db.outbox_ready
+        while True:
+            try:
+                await asyncio.wait_for(ready.wait(), self._interval)
+            except asyncio.TimeoutError:
+                pass
+            ready.clear()
+            try:
+                while await self._drain() == self._batch:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.exception("draining outbox failed", exc_info=e)
+
+    async def _drain(self) -> int:
+        """
+        Раздаёт одну пачку сообщений задачам чатов.
+        :return: количество прочитанных строк.
+        """
+        from app.game.models import OutboxMessage
+
+        self._released.clear()
+        async with self.app.store.db() as uow:
+            messages = await uow.outbox.list(
+                self._batch,
+                where=self.app.store.partitions.filter(OutboxMessage.origin, OutboxMessage.chat_id) &
+                OutboxMessage.id.not_in(self._taken)
+            )
+
+        for message in messages:
+            if message.id in self._released:
+                continue
+            key = (message.origin, message.chat_id)
+            self._taken.add(message.id)
+            self._queues.setdefault(key, []).append(message)
+            if key not in self._chats:
+                task = self._chats[key] = asyncio.create_task(self._send_chat(key))
+                task.add_done_callback(self._chat_done(key))
+
+        return len(messages)
+
+    def _chat_done(self, key: tuple):
+        def callback(task: asyncio.Task):
+            del self._chats[key]
+            # Строки, оставшиеся в очереди после ошибки, будут прочитаны заново.
+            self._release(self._queues.pop(key, ()))
+            if not task.cancelled() and (e := task.exception()) is not None:
+                self.logger.error(f"sending outbox messages of chat {key} failed", exc_info=e)
+        return callback
+
+    def _release(self, messages: typing.Iterable[OutboxMessage]):
+        for message in messages:
+            self._taken.discard(message.id)
+            self._released.add(message.id)
+
+    async def _send_chat(self, key: tuple):
+        """
+        Отправляет сообщения чата по порядку, пока в его очереди есть строки.
+        """
+        queue = self._queues[key]
+        while queue:
+            message = queue[0]
+            try:
+                if self._superseded(message, queue):
+                    await self._ack(message)
+                    continue
+                if message.sending_at is not None:
+                    # Прошлая отправка прервалась, и неизвестно, дошло ли сообщение: не дублируем.
+                    self.logger.warning(f"dropping outbox message {message.id}: it may have been sent already")
+                    await self._ack(message)
+                    continue
+                try:
+                    await self._send(message)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.logger.warning(f"sending outbox message {message.id} ({message.method}) failed", exc_info=e)
+                    await self._postpone(queue, not_sent=isinstance(e, self._NOT_SENT))
+                    return
+                await self._ack(message)
+            finally:
+                if queue and queue[0] is message:
+                    self._release([queue.pop(0)])
+
+    @staticmethod
+    def _superseded(message: OutboxMessage, queue: list[OutboxMessage]) -> bool:
+        """
+        Правку перекрывает более поздняя правка того же сообщения в очереди.
+        """
+        if message.method != "edit":
+            return False
+        message_id = orjson.loads(message.data)["message_id"]
+        return any(
+            m.method == "edit" and orjson.loads(m.data)["message_id"] == message_id for m in queue[1:]
+        )
+
+    async def _ack(self, message: OutboxMessage):
+        async with self.app.store.db() as uow:
+            await uow.outbox.delete([message.id])
+            await uow.commit()
+
+    async def _postpone(self, queue: list[OutboxMessage], not_sent: bool):
+        """
+        Откладывает неудачное сообщение (первое в очереди) вместе со следующими сообщениями чата.
+        Строки, прочитанные позже, остаются в таблице: их не выберут, пока ждёт отложенная.
+        :param not_sent: сообщение точно не отправлено, и его можно повторить.
+        """
+        head, *rest = queue
+        available_at = datetime.now(tz=timezone.utc) + timedelta(seconds=self._backoff * 2 ** head.attempts)
+        async with self.app.store.db() as uow:
+            if head.attempts + 1 >= self._max_attempts:
+                self.logger.error(f"dropping outbox message {head.id} after {head.attempts + 1} attempts")
+                await uow.outbox.delete([head.id])
+            else:
+                await uow.outbox.postpone([head.id], available_at, attempts=head.attempts + 1, not_sent=not_sent)
+            if rest:
+                await uow.outbox.postpone([m.id for m in rest], available_at)
+            await uow.commit()
+        self._release(queue[:len(rest) + 1])
+        del queue[:len(rest) + 1]
+
+    async def _send(self, message: OutboxMessage):
+        params = orjson.loads(message.data)
+        bot = self.app.bot.chat(message.origin, message.chat_id, message.bot_id)
+        inline_keyboard = InlineKeyboard.from_signature(params["inline_keyboard"]) \
+            if params.get("inline_keyboard") else None
+
+        match message.method:
+            case "send":
+                if message.origin not in self._DEDUPLICATED:
+                    async with self.app.store.db() as uow:
+                        await uow.outbox.sending(message.id)
+                        await uow.commit()
+                if await bot.send(
+                        params["text"], inline_keyboard, chat_id=message.chat_id, random_id=params.get("random_id")
+                ) is None:
+                    raise NotSent(f"outbox message {message.id} was rejected")
+            case "edit":
+                if not await bot.edit(
+                        params["text"],
+                        inline_keyboard=inline_keyboard,
+                        message_id=params["message_id"],
+                        chat_id=message.chat_id,
+                        remove_inline_keyboard=params["remove_inline_keyboard"]
+                ):
+                    raise NotSent(f"outbox message {message.id} was rejected")
+            case method:
+                raise ValueError(f"Unknown outbox method: {method}")
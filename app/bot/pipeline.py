@@ -0,0 +1,64 @@
+import asyncio
+from collections import deque
+
+from app.abc.cleanup_ctx import CleanupCTX
+from app.bot.updates import BotUpdate
+
+
+class UpdatePipeline(CleanupCTX):
+    """
+    Стадия обработки обновлений между поллерами и диспетчером.
+    Обновления одного чата обрабатываются строго по порядку, разные чаты - параллельно.
+    Поллер только складывает пачку обновлений и сразу уходит за следующей.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._capacity = 1000  # обновлений в обработке
+        self._concurrency = 32  # одновременно обрабатываемых чатов
+        self._slots: asyncio.Semaphore | None = None
+        self._workers: asyncio.Semaphore | None = None
+        self._chats: dict[tuple[str, int], deque[BotUpdate]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    async def on_startup(self):
+        self._slots = asyncio.Semaphore(self._capacity)
+        self._workers = asyncio.Semaphore(self._concurrency)
+
+    async def on_shutdown(self):
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=3)
+
+    async def put(self, update: BotUpdate):
+        """
+        Ставит обновление в очередь его чата.
+        Ждёт, только если в обработке уже слишком много обновлений.
+        :param update: обновление.
+        """
+        if not self.app.store.partitions.owns(update.origin, update.chat_id):
+            await self.app.store.partitions.forward(update)
+            return
+        await self._slots.acquire()
+        key = (update.origin, update.chat_id)
+        if (queue := self._chats.get(key)) is not None:
+            queue.append(update)
+            return
+        self._chats[key] = deque((update,))
+        task = asyncio.create_task(self._drain(key))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _drain(self, key: tuple[str, int]):
+        queue = self._chats[key]
+        try:
+            while queue:
+                update = queue.popleft()
+                try:
+                    async with self._workers:
+                        await self.app.bot.dispatcher.handle(update)
+                except Exception as e:
+                    self.logger.error(f"handling {update} failed", exc_info=e)
+                finally:
+                    self._slots.release()
+        finally:
+            del self._chats[key]
@@ -0,0 +1,62 @@
+import asyncio
+
+from app.abc.bot import AbstractBot
+from app.abc.cleanup_ctx import CleanupCTX
+
+
+class MediaPrefetcher(CleanupCTX):
+    """
+    Подготавливает медиа вопросов игры, пока игроки выбирают вопрос:
+    прогревает файлы в page cache и заранее загружает их на платформу,
+    чтобы к показу вопроса у бота уже была готовая ссылка на файл.
+    На каждую игру - одна задача, общее число одновременных загрузок ограничено.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._concurrency = 3  # одновременных загрузок
+        self._semaphore: asyncio.Semaphore | None = None
+        self._tasks: dict[tuple[str, int], asyncio.Task] = {}
+
+    async def on_startup(self):
+        self._semaphore = asyncio.Semaphore(self._concurrency)
+
+    async def on_shutdown(self):
+        for task in self._tasks.values():
+            task.cancel()
+        if self._tasks:
+            await asyncio.wait(self._tasks.values())
+
+    def start(self, bot: AbstractBot, origin: str, chat_id: int, media: list[tuple[str, str]]):
+        """
+        Запускает подготовку медиа игры.
+        :param bot: бот чата игры.
+        :param origin: платформа.
+        :param chat_id: чат игры.
+        :param media: имена файлов в хранилище и их content-type.
+        """
+        self.cancel(origin, chat_id)
+        if not media:
+            return
+        key = (origin, chat_id)
+        task = self._tasks[key] = asyncio.create_task(self._prefetch(bot, chat_id, media))
+        task.add_done_callback(lambda t: self._tasks.pop(key, None) if self._tasks.get(key) is t else None)
+
+    def cancel(self, origin: str, chat_id: int):
+        """
+        Отменяет подготовку медиа игры (игра закончилась).
+        """
+        if (task := self._tasks.pop((origin, chat_id), None)) is not None:
+            task.cancel()
+
+    async def _prefetch(self, bot: AbstractBot, chat_id: int, media: list[tuple[str, str]]):
+        for filename, content_type in media:
+            try:
+                async with self._semaphore:
+                    path = await self.app.store.media.best_path(filename)
+                    await self.app.store.media.warm(path)
+                    await bot.preload(path, content_type, chat_id=chat_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning(f"prefetching {filename} failed", exc_info=e)
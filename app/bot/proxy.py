@@ -1,26 +1,106 @@
-from aiolimiter import AsyncLimiter
-
 from app.abc.bot import AbstractBot
-from app.bot.enums import Origin
+from app.bot.enums import Origin, ChatType
 from app.bot.telegram.bot import TelegramBot
 from app.bot.updates import BotUpdate
 
 from app.bot.vk.accessor import VkAPIAccessor
 from app.bot.telegram.accessor import TelegramAPIAccessor
 from app.bot.dispatcher import Dispatcher
+from app.bot.outbox import OutboxSender
+from app.bot.pipeline import UpdatePipeline
+from app.bot.prefetch import MediaPrefetcher
 from app.bot.vk.bot import VkBot
+from app.utils.cache import TTLCache
+from app.utils.http import HttpClient
 
 from app.web.application import Application
 
 
 class BotProxy:
+    """
+    Боты всех платформ. На каждой платформе может работать несколько ботов (токенов, сообществ):
+    чат закрепляется за ботом, который первым получил из него обновление, и все ответы в чат
+    уходят через этот бот и расходуют его квоты. Состояние игр общее для всех ботов.
+    Бот игры хранится в games.bot_id, поэтому закрепление переживает перезапуск, вытеснение из кэша
+    и переход чата к другому экземпляру.
+    """
+
     def __init__(self, app: Application):
+        self.app = app
         self.dispatcher = Dispatcher()
+        self.pipeline = UpdatePipeline(app)
+        self.http = HttpClient(app)  # до аксессоров: закрывается после них
+        # профили пользователей обеих платформ по ключу (origin, user_id).
+        self.users = TTLCache(ttl=600)
+        # бот, за которым закреплён чат, по ключу (origin, chat_id); для чатов с игрой - копия games.bot_id.
+        self._chats = TTLCache(ttl=24 * 60 * 60, capacity=100_000)
+
+        self._telegram_apis = [TelegramAPIAccessor(app, token=token) for token in app.config.telegram.all_tokens]
+        self._vk_apis = [
+            VkAPIAccessor(app, token=group.token, group_id=group.group_id) for group in app.config.vk.all_groups
+        ]
+        self.prefetcher = MediaPrefetcher(app)  # после аксессоров: останавливается раньше них
+        self.outbox = OutboxSender(app)  # после аксессоров: останавливается раньше них
 
-        self._telegram_api = TelegramAPIAccessor(app)
-        self._vk_api = VkAPIAccessor(app)
+    def telegram(self, bot_id: int | None = None) -> TelegramAPIAccessor | None:
+        """
+        Telegram-бот по id (по умолчанию - первый из настроенных).
+        """
+        return self._find(self._telegram_apis, bot_id)
 
-    def __call__(self, update: BotUpdate, limiter: AsyncLimiter) -> AbstractBot:
+    async def bind(self, update: BotUpdate) -> bool:
+        """
+        Закрепляет чат обновления за получившим его ботом, если чат ещё не закреплён за ботом своей игры.
+        В группе, где состоят несколько наших ботов, одно и то же событие приходит каждому из них:
+        обрабатывается только копия бота, за которым закреплён чат. Личный чат переходит к боту,
+        которому пользователь написал последним.
+        Беседы разных сообществ ВК с одинаковым peer_id неразличимы и обслуживаются первым сообществом.
+        :return: обновление нужно обработать.
+        """
+        key = (update.origin, update.chat_id)
+        if (bot_id := self._chats.get(key)) is None:
+            async with self.app.store.db() as uow:
+                bot_id = await uow.lean.game_bot(update.origin, update.chat_id)
+        if bot_id is not None and bot_id != update.bot_id and update.chat_type != ChatType.PRIVATE:
+            self._chats.put(key, bot_id)
+            return False
+        self._chats.put(key, update.bot_id)
+        return True
+
+    def __call__(self, update: BotUpdate) -> AbstractBot:
         if update.origin == Origin.TELEGRAM:
-            return TelegramBot(self._telegram_api, update, limiter)
-        return VkBot(self._vk_api, update)
+            return TelegramBot(self._api(self._telegram_apis, update), update, self.users)
+        return VkBot(self._api(self._vk_apis, update), update, self.users)
+
+    def chat(self, origin: Origin, chat_id: int, bot_id: int | None = None) -> AbstractBot:
+        """
+        Бот чата без обновления: чат и сообщение передаются в вызовы явно.
+        :param bot_id: бот, получивший обновление, по которому пишется в чат.
+        """
+        if origin == Origin.TELEGRAM:
+            return TelegramBot(self._find_api(self._telegram_apis, origin, chat_id, bot_id), None, self.users)
+        return VkBot(self._find_api(self._vk_apis, origin, chat_id, bot_id), None, self.users)
+
+    def backlog(self, update: BotUpdate) -> int:
+        """
+        Количество исходящих запросов чата обновления, ожидающих отправки.
+        """
+        apis = self._telegram_apis if update.origin == Origin.TELEGRAM else self._vk_apis
+        return self._api(apis, update).scheduler.backlog(update.chat_id)
+
+    def _api(self, apis: list, update: BotUpdate):
+        # Отложенные обновления, сохранённые до появления bot_id, идут через закреплённый или первый бот.
+        return self._find_api(apis, update.origin, update.chat_id, getattr(update, "bot_id", None))
+
+    def _find_api(self, apis: list, origin: Origin, chat_id: int, bot_id: int | None):
+        bot_id = bot_id or self._chats.get((origin, chat_id))
+        return self._find(apis, bot_id) or apis[0]
+
+    @staticmethod
+    def _find(apis: list, bot_id: int | None):
+        if bot_id is None:
+            return apis[0]
+        for api in apis:
+            if api.bot_id == bot_id:
+                return api
+        return None
@@ -0,0 +1,283 @@
+import asyncio
+import time
+from asyncio import Future
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Callable, Awaitable, Any, Hashable
+
+from aiolimiter import AsyncLimiter
+
+from app.abc.cleanup_ctx import CleanupCTX
+from app.utils.limiter import Limiter
+from app.utils.metrics import ResponseLatency, API_RETRY_AFTER
+from app.utils.runner import Runner
+
+
+class Priority(IntEnum):
+    HIGH = 0  # ответы на нажатия кнопок, данные пользователей.
+    NORMAL = 1  # отправка и редактирование сообщений.
+    LOW = 2  # удаление служебных сообщений.
+
+
+class RetryAfter(Exception):
+    """
+    Платформа попросила повторить запрос позже (HTTP 429 / flood control).
+    :param seconds: через сколько секунд можно повторить запрос.
+    :param bot_wide: ограничение действует на весь бот, а не только на чат.
+    """
+
+    def __init__(self, seconds: float, *, bot_wide: bool = False):
+        super().__init__(f"retry after {seconds} seconds")
+        self.seconds = seconds
+        self.bot_wide = bot_wide
+
+
+@dataclass(slots=True)
+class Job:
+    call: Callable[[], Awaitable[Any]]
+    chat_id: int | None
+    priority: Priority
+    key: Hashable | None = None
+    digest: Hashable | None = None
+    batched: bool = False
+    not_before: float = 0
+    future: Future = field(default_factory=lambda: asyncio.get_running_loop().create_future())
+    attempts: int = 0
+
+
+class OutboundScheduler(CleanupCTX):
+    """
+    Планировщик исходящих запросов одного бота (токена).
+    Соблюдает общую квоту бота и квоты отдельных чатов, ставит запросы в очередь
+    вместо сна внутри обработчиков, обслуживает чаты по кругу внутри каждого приоритета
+    и повторяет запросы, на которые платформа ответила retry_after.
+    Старшие приоритеты идут первыми, но часть выборов отдаётся младшим, чтобы те не ждали бесконечно.
+    Запросы с ключом (редактирование сообщения) придерживаются на короткое окно, не задерживая
+    остальные запросы чата: следующий запрос с тем же ключом заменяет ожидающий, а запрос с тем же
+    содержимым, что было отправлено последним, не выполняется вовсе.
+    Первый запрос в чат завершает отсчёт времени ответа на обновление (latency).
+    :param origin: платформа бота, метка метрик.
+    """
+
+    def __init__(
+            self,
+            *args,
+            origin: str,
+            rate: AsyncLimiter,
+            chat_rate: Callable[[], AsyncLimiter] | None = None,
+            retries: int = 3,
+            **kwargs
+    ):
+        super().__init__(*args, **kwargs)
+        self._rate = rate
+        self._chat_rate = Limiter(chat_rate, capacity=10_000) if chat_rate else None
+        self._retries = retries
+        self.latency = ResponseLatency(origin)
+        self._retry_after = API_RETRY_AFTER.labels(origin)
+        self._tick = 0.05  # seconds
+        self._in_flight_limit = 64
+        self._coalesce_window = 0.25  # seconds
+        self._lower_first_every = 5  # каждый такой выбор начинается с младших полос
+        self._picks = 0
+        self._pending: dict[Hashable, Job] = {}
+        self._digests: OrderedDict[Hashable, Hashable] = OrderedDict()
+        self._digests_capacity = 10_000
+        self._lanes: dict[Priority, OrderedDict[int | None, deque[Job]]] = {p: OrderedDict() for p in Priority}
+        self._paused: dict[int | None, float] = {}
+        self._wakeup = asyncio.Event()
+        self._in_flight: asyncio.Semaphore | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._runner: Runner | None = None
+
+    async def on_startup(self):
+        self._in_flight = asyncio.Semaphore(self._in_flight_limit)
+        self._runner = Runner(self._dispatch)
+        await self._runner.start()
+
+    async def on_shutdown(self):
+        await self._runner.stop()
+        if self._tasks:
+            await asyncio.wait(self._tasks, timeout=3)
+        for lane in self._lanes.values():
+            for jobs in lane.values():
+                for job in jobs:
+                    job.future.cancel()
+            lane.clear()
+
+    async def submit(
+            self,
+            call: Callable[[], Awaitable[Any]],
+            *,
+            chat_id: int | None = None,
+            priority: Priority = Priority.NORMAL,
+            key: Hashable | None = None,
+            digest: Hashable | None = None,
+            batched: bool = False
+    ) -> Any:
+        """
+        Ставит запрос в очередь и ждёт его выполнения.
+        :param call: функция без аргументов, выполняющая запрос к API.
+        :param chat_id: чат, квоту которого расходует запрос (None - только общая квота).
+        :param priority: приоритет запроса.
+        :param key: ключ объединения, например (chat_id, message_id) редактируемого сообщения.
+        :param digest: хэш содержимого запроса с ключом. Запоминается, только если call вернул True.
+        :param batched: call уходит к платформе в одном запросе с другими (execute ВК): токен общей квоты
+            расходует отправитель этого запроса (charge), а не каждый call.
+        :return: результат запроса (для заменённого запроса - результат заменившего его запроса,
+            для пропущенного из-за совпадения digest - True).
+        """
+        if key is not None and (pending := self._pending.get(key)) is not None and not pending.future.done():
+            pending.call, pending.digest = call, digest
+            return await asyncio.shield(pending.future)
+
+        job = Job(call, chat_id, priority, key, digest, batched)
+        if key is not None:
+            job.not_before = time.monotonic() + self._coalesce_window
+            self._pending[key] = job
+        self._push(job)
+        return await asyncio.shield(job.future)
+
+    async def charge(self):
+        """
+        Расходует токен общей квоты за один запрос к платформе, объединивший запросы с batched.
+        """
+        await self._rate.acquire()
+
+    def forget(self, key: Hashable):
+        """
+        Забывает последнее отправленное содержимое по ключу,
+        например после изменения сообщения в обход ключа.
+        """
+        self._digests.pop(key, None)
+
+    def backlog(self, chat_id: int) -> int:
+        """
+        Количество запросов чата, ожидающих отправки.
+        """
+        return sum(len(lane.get(chat_id, ())) for lane in self._lanes.values())
+
+    def _push(self, job: Job, front: bool = False):
+        jobs = self._lanes[job.priority].setdefault(job.chat_id, deque())
+        if front:
+            jobs.appendleft(job)
+        else:
+            jobs.append(job)
+        self._wakeup.set()
+
+    def _pause(self, chat_id: int | None, seconds: float):
+        self._paused[chat_id] = max(self._paused.get(chat_id, 0), time.monotonic() + seconds)
+
+    def _is_paused(self, chat_id: int | None, now: float) -> bool:
+        if (until := self._paused.get(chat_id)) is None:
+            return False
+        if until > now:
+            return True
+        del self._paused[chat_id]
+        return False
+
+    def _is_available(self, chat_id: int | None, now: float) -> bool:
+        if self._is_paused(None, now):
+            return False
+        if chat_id is None:
+            return True
+        if self._is_paused(chat_id, now):
+            return False
+        return self._chat_rate is None or self._chat_rate[chat_id].has_capacity()
+
+    def _next(self) -> Job | None:
+        now = time.monotonic()
+        priorities = list(self._lanes)
+        if self._picks % self._lower_first_every == self._lower_first_every - 1:
+            # Младшие полосы по очереди выбираются первыми: поток старших запросов их не вытесняет.
+            start = 1 + (self._picks // self._lower_first_every) % (len(priorities) - 1)
+            priorities = priorities[start:] + priorities[:start]
+        for priority in priorities:
+            lane = self._lanes[priority]
+            for chat_id in list(lane):
+                jobs = lane[chat_id]
+                # Запрос, придержанный на окно объединения, не задерживает следующие запросы чата.
+                i = next((i for i, job in enumerate(jobs) if job.not_before <= now), None)
+                if i is None or not self._is_available(chat_id, now):
+                    continue
+                job = jobs[i]
+                del jobs[i]
+                del lane[chat_id]
+                if jobs:
+                    lane[chat_id] = jobs  # в конец круга.
+                if not job.future.done():
+                    self._picks += 1
+                    return job
+        return None
+
+    async def _dispatch(self):
+        if (job := self._next()) is None:
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._tick)
+            except TimeoutError:
+                pass
+            return
+
+        if job.key is not None and self._pending.get(job.key) is job:
+            del self._pending[job.key]
+
+        if not job.batched:
+            await self._rate.acquire()
+        if job.chat_id is not None and self._chat_rate is not None:
+            await self._chat_rate[job.chat_id].acquire()
+        await self._in_flight.acquire()
+
+        task = asyncio.create_task(self._execute(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, job: Job):
+        try:
+            if job.future.done():
+                return
+            if job.digest is not None and self._digests.get(job.key) == job.digest:
+                # Сообщение уже содержит это содержимое: правка считается выполненной.
+                self._resolve(job, result=True)
+                return
+            if job.chat_id is not None:
+                self.latency.responded(job.chat_id)
+            result = await job.call()
+        except RetryAfter as e:
+            self._retry_after.inc()
+            job.attempts += 1
+            if job.attempts > self._retries:
+                self._resolve(job, exception=e)
+            else:
+                self.logger.warning(f"chat {job.chat_id}: {e}, attempt {job.attempts}")
+                self._pause(None if e.bot_wide else job.chat_id, e.seconds)
+                self._push(job, front=True)
+        except Exception as e:
+            self._resolve(job, exception=e)
+        else:
+            # Ответ с ошибкой (ok: false у Telegram, error у ВК) не меняет сообщение:
+            # повтор той же правки не должен считаться уже отправленным.
+            self._remember(job, succeeded=result is True)
+            self._resolve(job, result=result)
+        finally:
+            self._in_flight.release()
+
+    def _remember(self, job: Job, succeeded: bool):
+        if job.key is None:
+            return
+        if job.digest is None or not succeeded:
+            self._digests.pop(job.key, None)
+            return
+        self._digests[job.key] = job.digest
+        self._digests.move_to_end(job.key)
+        if len(self._digests) > self._digests_capacity:
+            self._digests.popitem(last=False)
+
+    @staticmethod
+    def _resolve(job: Job, result: Any = None, exception: BaseException | None = None):
+        if job.future.done():
+            return
+        if exception is not None:
+            job.future.set_exception(exception)
+        else:
+            job.future.set_result(result)
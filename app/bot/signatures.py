@@ -1,6 +1,7 @@
 import re
 
 from dataclasses import dataclass, field
+from typing import Hashable
 
 from app.bot.enums import Origin, ChatType
 from app.bot.updates import BotAction, BotUpdate, BotCommand, BotMessage, BotCallbackQuery
@@ -17,6 +18,19 @@ class AbstractSignature:
             self.chat_type is None or self.chat_type == update.chat_type
         ))
 
+    def keys(self) -> list[Hashable | None]:
+        """
+        Значения признака (команда, тип данных кнопки), по которым обработчик
+        попадает в индекс диспетчера. None - любое значение.
+        """
+        return [None]
+
+    def refine(self, update: BotUpdate) -> bool:
+        """
+        Проверка, которую нельзя выразить ключом индекса.
+        """
+        return True
+
 
 @dataclass
 class MessageSignature(AbstractSignature):
@@ -30,9 +44,12 @@ class MessageSignature(AbstractSignature):
     def match(self, message: BotMessage) -> bool:
         return all((
             super().match(message),
-            self.pattern is None or self.pattern.fullmatch(message.text)
+            self.refine(message)
         ))
 
+    def refine(self, message: BotMessage) -> bool:
+        return self.pattern is None or self.pattern.fullmatch(message.text) is not None
+
 
 @dataclass
 class CommandSignature(AbstractSignature):
@@ -46,9 +63,12 @@ class CommandSignature(AbstractSignature):
     def match(self, command: BotCommand) -> bool:
         return all((
             super().match(command),
-            self.commands is None or command.command in self.commands
+            self.commands is None or command.command in self.commands_set
         ))
 
+    def keys(self) -> list[Hashable | None]:
+        return list(self.commands_set) if self.commands is not None else [None]
+
 
 @dataclass
 class CallbackQuerySignature(AbstractSignature):
@@ -61,6 +81,9 @@ class CallbackQuerySignature(AbstractSignature):
 
         ))
 
+    def keys(self) -> list[Hashable | None]:
+        return [self.data_type]
+
 
 @dataclass
 class ActionSignature(AbstractSignature):
@@ -1,60 +1,156 @@
 import asyncio
+import hmac
 import json
+import time
 from functools import cache
 from typing import Iterable
 
-import orjson as orjson
-from aiohttp import ClientSession, ClientConnectorError
+from aiohttp import ClientError
 
+from aiolimiter import AsyncLimiter
+
+from app.bot.enums import Origin
+from app.bot.scheduler import OutboundScheduler, RetryAfter
 from app.bot.updates import BotUpdate
 from app.bot.inline import InlineKeyboard
 from app.bot.telegram import loaders
 from app.bot.user import BotUser
 
+from app.utils.cache import TTLCache
+from app.utils.http import CircuitOpen
+from app.utils.metrics import ApiMetrics
 from app.utils.runner import Runner
 
 from app.abc.cleanup_ctx import CleanupCTX
 
 
 class TelegramAPIAccessor(CleanupCTX):
+    """
+    Доступ к Bot API одного бота.
+    :param token: токен бота.
+    """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, token: str, **kwargs):
         super().__init__(*args, **kwargs)
-        self._session: ClientSession | None = None
         self._runner: Runner | None = None
+        self._receiver: asyncio.Task | None = None
+        # обновления вебхука, на которые Telegram уже получил ответ, ещё не переданные в конвейер.
+        self._webhook_updates: asyncio.Queue[dict] = asyncio.Queue(maxsize=1000)
         self._bot_username: str | None = None
         self._bot_id: int | None = None
-        self._bot_token = self.app.config.telegram.token
+        self._bot_token = token
+        self._webhook_url = self.app.config.telegram.webhook_url
+        self._webhook_secret = self.app.config.telegram.webhook_secret
         self._timeout = 25  # seconds
         self._limit = 50
         self._offset = 0
+        self._media_timeout = 120  # seconds
+        self._media_chat_id = self.app.config.telegram.media_chat_id
+        self._file_ids = TTLCache(ttl=24 * 60 * 60, capacity=10_000)  # путь к файлу -> file_id
+        self._uploads: dict[str, asyncio.Event] = {}  # путь к файлу -> загрузка, которая сейчас идёт
+        self._idempotent = {
+            "getMe", "getUpdates", "getChatMember", "setWebhook", "deleteWebhook",
+            "editMessageText", "editMessageReplyMarkup", "deleteMessage"
+        }
+        self._metrics = ApiMetrics(Origin.TELEGRAM)
+        # 30 сообщений в секунду на бота и 20 в минуту на группу.
+        self.scheduler = OutboundScheduler(
+            self.app,
+            origin=Origin.TELEGRAM,
+            rate=AsyncLimiter(max_rate=30, time_period=1),
+            chat_rate=lambda: AsyncLimiter(max_rate=19, time_period=60)
+        )
 
     @property
     def bot_id(self):
         return self._bot_id
 
+    @property
+    def media_chat_id(self) -> int | None:
+        return self._media_chat_id
+
     async def on_startup(self):
-        self._session = ClientSession(base_url='https://api.telegram.org')
         await self._get_me()
-        self._runner = Runner(self.poll)
-        await self._runner.start()
+        if self._webhook_url:
+            self._receiver = asyncio.create_task(self._receive())
+            await self._set_webhook()
+        else:
+            await self._delete_webhook()
+            self._runner = Runner(self.poll)
+            await self._runner.start()
 
     async def on_shutdown(self):
-        await self._runner.stop()
-        await self._session.close()
+        if self._runner is not None:
+            await self._runner.stop()
+        if self._receiver is not None:
+            try:
+                await asyncio.wait_for(self._webhook_updates.join(), timeout=3)
+            except asyncio.TimeoutError:
+                self.logger.warning(f"dropping {self._webhook_updates.qsize()} webhook updates")
+            self._receiver.cancel()
+            await asyncio.wait([self._receiver])
+
+    def verify(self, secret_token: str | None) -> bool:
+        """
+        Проверяет секретный токен из заголовка X-Telegram-Bot-Api-Secret-Token.
+        Без настроенного секрета (режим опроса) вебхук не принимает ничего.
+        """
+        if not self._webhook_url or not self._webhook_secret:
+            return False
+        return secret_token is not None and hmac.compare_digest(secret_token, self._webhook_secret)
+
+    def feed(self, update: dict) -> bool:
+        """
+        Ставит обновление из вебхука в очередь, не дожидаясь базы и конвейера, чтобы сразу ответить Telegram.
+        :param update: обновление в формате Bot API.
+        :return: обновление принято; False - очередь заполнена, Telegram должен повторить его позже.
+        """
+        try:
+            self._webhook_updates.put_nowait(update)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _receive(self):
+        """
+        Передаёт обновления вебхука в конвейер обработки.
+        """
+        while True:
+            update = await self._webhook_updates.get()
+            try:
+                for bot_update in self._pack([update]):
+                    if await self.app.bot.bind(bot_update):
+                        await self.app.bot.pipeline.put(bot_update)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning("processing webhook update failed", exc_info=e)
+            finally:
+                self._webhook_updates.task_done()
 
     async def poll(self):
         while True:
+            if not self.app.store.partitions.leader:
+                # Платформу опрашивает экземпляр-лидер, обновления чужих чатов он пересылает владельцам.
+                await asyncio.sleep(1)
+                continue
             try:
                 for update in self._pack(await self.get_updates()):
-                    await self.app.bot.dispatcher.handle(update)
-            except (TimeoutError, ClientConnectorError, ConnectionRefusedError) as e:
+                    if await self.app.bot.bind(update):
+                        await self.app.bot.pipeline.put(update)
+            except RetryAfter as e:
+                self.logger.warning(str(e))
+                await asyncio.sleep(e.seconds)
+            except CircuitOpen as e:
+                self.logger.warning(str(e))
+                await asyncio.sleep(e.retry_in)
+            except (TimeoutError, ClientError, ValueError) as e:
+                # Сетевые ошибки, 5xx после повторов и неразборчивые ответы: опрос продолжается после паузы.
                 self.logger.warning(str(e), exc_info=e)
                 await asyncio.sleep(5)
 
     async def get_updates(self) -> list[dict]:
-        response = await self._session.get(self._url("getUpdates"), params=self._params)
-        match await response.json(loads=orjson.loads):
+        match await self._request("getUpdates", self._params):
             case {'result': updates} as data:
                 self.logger.debug('get_updates ' + json.dumps(data, indent=2))
                 self._offset = (updates[-1]['update_id'] + 1) if updates else self._offset
@@ -64,19 +160,20 @@ class TelegramAPIAccessor(CleanupCTX):
         return []
 
     async def get_user(self, user_id: int, chat_id: int) -> BotUser:
-        response = await self._session.get(self._url("getChatMember"), params={
+        match await self._request("getChatMember", {
             "chat_id": chat_id,
             "user_id": user_id
-        })
-        match await response.json(loads=orjson.loads):
+        }):
             case {'result': {'user': user}} as data:
                 self.logger.debug('get_user ' + json.dumps(data, indent=2))
-                return BotUser(
+                bot_user = BotUser(
                     id=user_id,
                     username=user.get("username", ''),
                     first_name=user.get("first_name", ''),
                     last_name=user.get("last_name", '')
                 )
+                self.app.bot.users.put((Origin.TELEGRAM, user_id), bot_user)
+                return bot_user
             case error:
                 self.logger.error('get_user ' + json.dumps(error, indent=2))
 
@@ -85,23 +182,22 @@ class TelegramAPIAccessor(CleanupCTX):
             chat_id: int,
             message_id: int,
             inline_keyboard: InlineKeyboard | None = None
-    ):
-        response = await self._session.get(self._url("editMessageReplyMarkup"), params={
+    ) -> bool:
+        data = await self._request("editMessageReplyMarkup", {
             "chat_id": chat_id,
             "message_id": message_id,
-            "reply_markup": self._inline_keyboard_markup(inline_keyboard)
+            **self._reply_markup(inline_keyboard)
         })
-        data = await response.json(loads=orjson.loads)
         self.logger.debug('edit_reply_markup ' + json.dumps(data, indent=2))
+        return self._edited(data)
 
     async def answer_callback_query(self, callback_query_id: str, text: str = ''):
-        response = await self._session.get(self._url("answerCallbackQuery"), params={
+        data = await self._request("answerCallbackQuery", {
             "callback_query_id": callback_query_id,
             "text": text,
             "show_alert": int(not bool(text)),
             "cache_time": 5
         })
-        data = await response.json(loads=orjson.loads)
         self.logger.debug('send_alert ' + json.dumps(data, indent=2))
 
     async def send_message(
@@ -110,21 +206,12 @@ class TelegramAPIAccessor(CleanupCTX):
             text: str,
             inline_keyboard: InlineKeyboard | None = None
     ) -> int | None:
-        response = await self._session.get(url=self._url("sendMessage"), params=dict(
-            chat_id=chat_id,
-            text=text,
-            parse_mode='HTML',
-            **dict(
-                reply_markup=self._inline_keyboard_markup(inline_keyboard)
-            ) if inline_keyboard else {}
-        ))
-        match await response.json(loads=orjson.loads):
-            case {"ok": False, "error_code": 429, "parameters": {
-                "retry_after": retry_after
-            }} as data:
-                self.logger.error('send_message ' + json.dumps(data, indent=2))
-                await asyncio.sleep(retry_after)
-                await self.send_message(chat_id, text)  # RECURSIVE!
+        match await self._request("sendMessage", {
+            "chat_id": chat_id,
+            "text": text,
+            "parse_mode": 'HTML',
+            **self._reply_markup(inline_keyboard)
+        }):
             case {"result": {"message_id": message_id}} as data:
                 self.logger.debug('send_message ' + json.dumps(data, indent=2))
                 return message_id
@@ -132,35 +219,58 @@ class TelegramAPIAccessor(CleanupCTX):
                 self.logger.debug('send_message ' + json.dumps(error, indent=2))
                 return None
 
-    async def send_photo(self, chat_id: int, photo_path: str, text: str = ''):
-        with open(photo_path, mode='rb') as photo_file:
-            response = await self._session.post(
-                self._url("sendPhoto"),
-                params={"chat_id": chat_id, "caption": text},
-                data={'photo': photo_file}
-            )
-        data = await response.json(loads=orjson.loads)
-        self.logger.debug('send_photo ' + json.dumps(data, indent=2))
-
-    async def send_video(self, chat_id: int, video_path: str, text: str = ''):
-        with open(video_path, mode='rb') as photo_file:
-            response = await self._session.post(
-                self._url("sendVideo"),
-                params={"chat_id": chat_id, "caption": text},
-                data={'video': photo_file}
-            )
-        data = await response.json(loads=orjson.loads)
-        self.logger.debug('send_photo ' + json.dumps(data, indent=2))
-
-    async def send_voice(self, chat_id: int, audio_path: str, text: str = ''):
-        with open(audio_path, mode='rb') as audio_file:
-            response = await self._session.post(
-                self._url("sendVoice"),
-                params={"chat_id": chat_id, "caption": text},
-                data={'voice': audio_file}
-            )
-        data = await response.json(loads=orjson.loads)
-        self.logger.debug('send_voice ' + json.dumps(data, indent=2))
+    async def send_photo(self, chat_id: int, photo_path: str, text: str = '') -> int | None:
+        return await self._send_media("sendPhoto", "photo", chat_id, photo_path, text)
+
+    async def send_video(self, chat_id: int, video_path: str, text: str = '') -> int | None:
+        return await self._send_media("sendVideo", "video", chat_id, video_path, text)
+
+    async def send_voice(self, chat_id: int, audio_path: str, text: str = '') -> int | None:
+        return await self._send_media("sendVoice", "voice", chat_id, audio_path, text)
+
+    def has_file_id(self, path: str) -> bool:
+        return path in self._file_ids
+
+    def is_uploading(self, path: str) -> bool:
+        return path in self._uploads
+
+    async def _send_media(self, method: str, field: str, chat_id: int, path: str, text: str) -> int | None:
+        """
+        Отправляет медиа. Файл, который уже загружался, отправляется по file_id без повторной загрузки,
+        а если файл загружается прямо сейчас (например, при подготовке медиа игры), сначала дожидается её.
+        :param method: метод Bot API (sendPhoto, sendVideo, sendVoice).
+        :param field: поле с файлом (photo, video, voice).
+        """
+        payload = {"chat_id": chat_id, "caption": text}
+        if path not in self._file_ids and (upload := self._uploads.get(path)) is not None:
+            await upload.wait()
+
+        upload = None
+        try:
+            if (file_id := self._file_ids.get(path)) is not None:
+                data = await self._request(method, payload | {field: file_id})
+            else:
+                upload = self._uploads[path] = asyncio.Event()
+                async with self.app.store.media.open(path) as file:
+                    data = await self._request(method, payload, files={field: file})
+
+            match data:
+                case {"result": {"message_id": message_id, **media}}:
+                    self.logger.debug(f'{method} ' + json.dumps(data, indent=2))
+                    match media.get(field):
+                        case [*_, {"file_id": file_id}] | {"file_id": file_id}:  # фото приходит списком размеров
+                            self._file_ids.put(path, file_id)
+                    return message_id
+                case error:
+                    self.logger.error(f'{method} ' + json.dumps(error, indent=2))
+                    self._file_ids.pop(path)
+                    return None
+        finally:
+            if upload is not None:
+                if self._uploads.get(path) is upload:
+                    del self._uploads[path]
+                # Если загрузка не удалась, ожидавшие загрузят файл сами.
+                upload.set()
 
     async def edit_message_text(
             self,
@@ -169,48 +279,69 @@ class TelegramAPIAccessor(CleanupCTX):
             text: str,
             inline_keyboard: InlineKeyboard | None = None,
             remove_inline_keyboard: bool = False
-    ):
-        response = await self._session.get(self._url("editMessageText"), params=dict(
-            chat_id=chat_id,
-            message_id=message_id,
-            text=text,
-            parse_mode='HTML',
-            reply_markup=''
-            if remove_inline_keyboard else
-            self._inline_keyboard_markup(inline_keyboard)
-        ))
-        data = await response.json(content_type=response.content_type, loads=orjson.loads)
+    ) -> bool:
+        # Без reply_markup Telegram убирает клавиатуру сообщения.
+        data = await self._request("editMessageText", {
+            "chat_id": chat_id,
+            "message_id": message_id,
+            "text": text,
+            "parse_mode": 'HTML',
+            **({} if remove_inline_keyboard else self._reply_markup(inline_keyboard))
+        })
         self.logger.debug('edit_message_text ' + json.dumps(data, indent=2))
+        return self._edited(data)
+
+    @staticmethod
+    def _edited(data: dict) -> bool:
+        match data:
+            case {"ok": True}:
+                return True
+            # Повтор уже применённой правки: сообщение и так содержит то, что нужно.
+            case {"ok": False, "description": str(description)} if "message is not modified" in description:
+                return True
+        return False
 
     async def delete_message(self, chat_id: int, message_id: int):
-        response = await self._session.get(
-            self._url("deleteMessage"),
-            params=dict(
-                message_id=message_id,
-                chat_id=chat_id
-            )
-        )
-        data = await response.json(content_type=response.content_type, loads=orjson.loads)
+        data = await self._request("deleteMessage", {
+            "message_id": message_id,
+            "chat_id": chat_id
+        })
         self.logger.debug('delete_message ' + json.dumps(data, indent=2))
 
     def _pack(self, updates: list[dict]) -> Iterable[BotUpdate]:
+        for bot_update in self._load(updates):
+            self.scheduler.latency.received(bot_update.chat_id)
+            # Профиль отправителя приходит вместе с обновлением.
+            if bot_update.user is not None:
+                self.app.bot.users.put((Origin.TELEGRAM, bot_update.user_id), bot_update.user)
+            yield bot_update
+
+    def _load(self, updates: list[dict]) -> Iterable[BotUpdate]:
         for update in updates:
-            match update:
-                case {"message": {"text": text} as command} as data if text.startswith("/"):
-                    command["text"] = text.replace(f"@{self._bot_username}", '')
-                    yield loaders.command_from_dict(**data)
-                case {"message": {"text": _}} as data:
-                    yield loaders.message_from_dict(**data)
-                case {"callback_query": _} as data:
-                    yield loaders.callback_query_from_dict(**data)
-                case {"message": {"new_chat_participant": _}} as data:
-                    yield loaders.action_from_dict(**data)
-                case data:
-                    self.logger.info('_pack: undefined update type =>  ' + json.dumps(data, indent=2))
+            try:
+                bot_update = loaders.load(update, self._bot_username, self._bot_id)
+            except (KeyError, TypeError, ValueError) as e:
+                self.logger.error('_pack: malformed update =>  ' + json.dumps(update, indent=2), exc_info=e)
+                continue
+            if bot_update is None:
+                self.logger.info('_pack: undefined update type =>  ' + json.dumps(update, indent=2))
+                continue
+            yield bot_update
+
+    async def _set_webhook(self):
+        data = await self._request("setWebhook", {
+            "url": f"{self._webhook_url.rstrip('/')}/telegram/webhook/{self._bot_id}",
+            "allowed_updates": ["message", "callback_query"],
+            "secret_token": self._webhook_secret
+        })
+        self.logger.info('set_webhook ' + json.dumps(data, indent=2))
+
+    async def _delete_webhook(self):
+        data = await self._request("deleteWebhook")
+        self.logger.debug('delete_webhook ' + json.dumps(data, indent=2))
 
     async def _get_me(self):
-        response = await self._session.get(self._url("getMe"))
-        match (await response.json(loads=orjson.loads)):
+        match await self._request("getMe"):
             case {'result': {'username': username, "id": bot_id}} as data:
                 self._bot_username = username
                 self._bot_id = bot_id
@@ -218,23 +349,71 @@ class TelegramAPIAccessor(CleanupCTX):
             case error:
                 self.logger.error('connect ' + json.dumps(error, indent=2))
 
+    async def _request(self, method: str, payload: dict | None = None, *, files: dict | None = None) -> dict:
+        """
+        Выполняет метод Bot API POST-запросом.
+        Параметры отправляются телом в JSON, а вместе с файлами - multipart-формой.
+        :param method: название метода.
+        :param payload: параметры метода.
+        :param files: файлы для отправки.
+        :return: ответ Telegram.
+        :raise RetryAfter: Telegram ответил 429 и попросил подождать.
+        """
+        if files is None:
+            body = dict(json=payload or {})
+        else:
+            body = dict(data={k: str(v) for k, v in (payload or {}).items()} | files)
+
+        latency, errors = self._metrics[method]
+        started = time.perf_counter()
+        try:
+            response = await self.app.bot.http.request(
+                "POST",
+                self._url(method),
+                timeout=self._method_timeout(method, files),
+                idempotent=method in self._idempotent,
+                **body
+            )
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            latency.observe(time.perf_counter() - started)
+
+        match response:
+            case {"ok": False, "error_code": 429, "parameters": {"retry_after": retry_after}} as error:
+                errors.inc()
+                self.logger.warning(method + ' ' + json.dumps(error, indent=2))
+                raise RetryAfter(retry_after)
+            case {"ok": False}:
+                errors.inc()
+                return response
+            case result:
+                return result
+
+    def _method_timeout(self, method: str, files: dict | None) -> float | None:
+        if method == "getUpdates":
+            return self._timeout + 10
+        if files is not None:
+            return self._media_timeout
+        return None
+
     @staticmethod
-    def _inline_keyboard_markup(inline_keyboard: InlineKeyboard | None = None) -> str:
+    def _reply_markup(inline_keyboard: InlineKeyboard | None = None) -> dict:
         if not inline_keyboard:
-            return ''
-        return orjson.dumps({"inline_keyboard": [
+            return {}
+        return {"reply_markup": {"inline_keyboard": [
             [
                 {
                     'text': b.text,
-                    "callback_data": orjson.dumps(b.callback_data).decode("utf-8")
+                    "callback_data": b.callback_data.pack()
                 } for b in line
             ] for line in inline_keyboard
-        ]
-        }).decode("utf-8")
+        ]}}
 
     @cache
     def _url(self, method: str):
-        return f'/bot{self._bot_token}/{method}'
+        return f'https://api.telegram.org/bot{self._bot_token}/{method}'
 
     @property
     def _params(self):
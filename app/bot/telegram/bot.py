@@ -1,18 +1,21 @@
-from aiolimiter import AsyncLimiter
+from functools import partial
 
 from app.abc.bot import AbstractBot
+from app.bot.enums import Origin
+from app.bot.scheduler import Priority
 from app.bot.telegram.accessor import TelegramAPIAccessor
 from app.bot.inline import InlineKeyboard
 from app.bot.updates import BotCallbackQuery, BotUpdate
 from app.bot.user import BotUser
+from app.utils.cache import TTLCache
 
 
 class TelegramBot(AbstractBot):
 
-    def __init__(self, telegram_api: TelegramAPIAccessor, update: BotUpdate, limiter: AsyncLimiter):
+    def __init__(self, telegram_api: TelegramAPIAccessor, update: BotUpdate | None, users: TTLCache):
         self._api = telegram_api
         self._update = update
-        self._limiter: AsyncLimiter | None = limiter
+        self._users = users
 
     @property
     def bot_id(self) -> int:
@@ -23,20 +26,19 @@ class TelegramBot(AbstractBot):
             text: str,
             inline_keyboard: InlineKeyboard | None = None,
             /, *,
-            chat_id: int | None = None
-    ) -> int:
+            chat_id: int | None = None,
+            random_id: int | None = None
+    ) -> int | None:
+        # Bot API не принимает ключ идемпотентности, random_id не используется.
         if self._update is not None:
             chat_id = chat_id or self._update.chat_id
 
         if chat_id is None:
             raise ValueError(f"Not enough params! ({chat_id=})")
 
-        await self._limiter.acquire()
-
-        return await self._api.send_message(
-            chat_id,
-            text,
-            inline_keyboard
+        return await self._api.scheduler.submit(
+            partial(self._api.send_message, chat_id, text, inline_keyboard),
+            chat_id=chat_id
         )
 
     async def send_photo(
@@ -52,9 +54,10 @@ class TelegramBot(AbstractBot):
         if chat_id is None:
             raise ValueError(f"Not enough params! ({chat_id=})")
 
-        await self._limiter.acquire()
-
-        return await self._api.send_photo(chat_id, photo_path, text)
+        return await self._api.scheduler.submit(
+            partial(self._api.send_photo, chat_id, photo_path, text),
+            chat_id=chat_id
+        )
 
     async def send_voice(
             self,
@@ -69,9 +72,10 @@ class TelegramBot(AbstractBot):
         if chat_id is None:
             raise ValueError(f"Not enough params! ({chat_id=})")
 
-        await self._limiter.acquire()
-
-        return await self._api.send_voice(chat_id, voice_path, text)
+        return await self._api.scheduler.submit(
+            partial(self._api.send_voice, chat_id, voice_path, text),
+            chat_id=chat_id
+        )
 
     async def send_video(
             self,
@@ -86,9 +90,31 @@ class TelegramBot(AbstractBot):
         if chat_id is None:
             raise ValueError(f"Not enough params! ({chat_id=})")
 
-        await self._limiter.acquire()
+        return await self._api.scheduler.submit(
+            partial(self._api.send_video, chat_id, video_path, text),
+            chat_id=chat_id
+        )
+
+    async def preload(self, path: str, content_type: str, /, *, chat_id: int | None = None):
+        # Загрузить файл в Telegram можно только отправив его в какой-то чат,
+        # поэтому без служебного чата file_id запоминается при первой отправке.
+        if self._api.media_chat_id is None or self._api.has_file_id(path) or self._api.is_uploading(path):
+            return
+
+        if content_type.startswith('image'):
+            send = self._api.send_photo
+        elif content_type.startswith('audio'):
+            send = self._api.send_voice
+        elif content_type.startswith('video'):
+            send = self._api.send_video
+        else:
+            return
 
-        return await self._api.send_video(chat_id, video_path, text)
+        await self._api.scheduler.submit(
+            partial(send, self._api.media_chat_id, path),
+            chat_id=self._api.media_chat_id,
+            priority=Priority.LOW
+        )
 
     async def edit(
             self,
@@ -99,7 +125,7 @@ class TelegramBot(AbstractBot):
             message_id: int | None = None,
             chat_id: int | None = None,
             remove_inline_keyboard: bool = False
-    ):
+    ) -> bool:
         if inline_keyboard is None and text is None and remove_inline_keyboard is False:
             raise ValueError("Nothing to edit!")
 
@@ -112,18 +138,30 @@ class TelegramBot(AbstractBot):
         if not chat_id or not message_id:
             raise ValueError(f"Not enough params! ({chat_id=}, {message_id=})")
 
-        await self._limiter.acquire()
+        key = (chat_id, message_id)
 
         if text is None:
-            await self._api.edit_reply_markup(chat_id, message_id, inline_keyboard)
-        else:
-            await self._api.edit_message_text(
+            # Меняется только клавиатура: объединять с ожидающей правкой текста нельзя.
+            edited = await self._api.scheduler.submit(
+                partial(self._api.edit_reply_markup, chat_id, message_id, inline_keyboard),
+                chat_id=chat_id
+            )
+            self._api.scheduler.forget(key)
+            return edited
+
+        return await self._api.scheduler.submit(
+            partial(
+                self._api.edit_message_text,
                 chat_id,
                 message_id,
                 text,
                 inline_keyboard,
                 remove_inline_keyboard
-            )
+            ),
+            chat_id=chat_id,
+            key=key,
+            digest=hash((text, inline_keyboard.signature() if inline_keyboard else None, remove_inline_keyboard))
+        )
 
     async def delete(self, message_id: int | None = None, chat_id: int | None = None):
         if isinstance(self._update, BotCallbackQuery):
@@ -135,9 +173,11 @@ class TelegramBot(AbstractBot):
         if not chat_id or not message_id:
             raise ValueError(f"Not enough params! ({chat_id=}, {message_id=})")
 
-        await self._limiter.acquire()
-
-        await self._api.delete_message(chat_id, message_id)
+        await self._api.scheduler.submit(
+            partial(self._api.delete_message, chat_id, message_id),
+            chat_id=chat_id,
+            priority=Priority.LOW
+        )
 
     async def callback(
             self,
@@ -153,7 +193,10 @@ class TelegramBot(AbstractBot):
         if callback_query_id is None:
             raise ValueError(f"Not enough params! ({callback_query_id=})")
 
-        await self._api.answer_callback_query(callback_query_id, text)
+        await self._api.scheduler.submit(
+            partial(self._api.answer_callback_query, callback_query_id, text),
+            priority=Priority.HIGH
+        )
 
     async def get_user(self, chat_id: int | None = None, user_id: int | None = None) -> BotUser:
         if not chat_id and not user_id and self._update is not None:
@@ -165,6 +208,10 @@ class TelegramBot(AbstractBot):
         if not chat_id or not user_id:
             raise ValueError(f"Not enough params! ({chat_id=}, {user_id=})")
 
-        await self._limiter.acquire()
+        if (user := self._users.get((Origin.TELEGRAM, user_id))) is not None:
+            return user
 
-        return await self._api.get_user(user_id=user_id, chat_id=chat_id)
+        return await self._api.scheduler.submit(
+            partial(self._api.get_user, user_id=user_id, chat_id=chat_id),
+            priority=Priority.HIGH
+        )
@@ -1,89 +1,81 @@
-from orjson import orjson
-
-from app.bot.updates import Origin
+"""
+Разбор обновлений Bot API в BotUpdate за один проход.
+Тип обновления определяется по ключу верхнего уровня, поля читаются напрямую
+по ключам без каскада структурных шаблонов и промежуточных словарей.
+"""
+from app.bot.updates import Origin, BotUpdate
 from app.bot.enums import ChatType, ActionType
 from app.bot.inline import CallbackData
 from app.bot.updates import BotCommand, BotAction, BotMessage, BotCallbackQuery
 from app.bot.user import BotUser
 
 
-def update_from_dict(**data):
-    match data:
-        case {"message": {
-            "from": {"id": user_id} as from_,
-            "chat": {"id": chat_id, "type": chat_type}
-        }}:
-            return dict(
-                origin=Origin.TELEGRAM,
-                user_id=user_id,
-                chat_id=chat_id,
-                chat_type=ChatType.PRIVATE if chat_type == 'private' else ChatType.GROUP,
-                user=BotUser(
-                    id=user_id,
-                    first_name=from_.get('first_name'),
-                    last_name=from_.get('last_name'),
-                    username=from_.get('username')
-                )
-            )
-        case {"callback_query": {
-            "from": {"id": user_id} as from_,
-            "message": {"chat": {"id": chat_id, "type": chat_type}}
-        }}:
-            return dict(
-                origin=Origin.TELEGRAM,
-                user_id=user_id,
-                chat_id=chat_id,
-                chat_type=ChatType.PRIVATE if chat_type == 'private' else ChatType.GROUP,
-                user=BotUser(
-                    id=user_id,
-                    first_name=from_.get('first_name'),
-                    last_name=from_.get('last_name'),
-                    username=from_.get('username')
-                )
-            )
-    raise ValueError("Unprocessable update data.")
+def load(update: dict, bot_username: str | None = None, bot_id: int | None = None) -> BotUpdate | None:
+    """
+    Превращает обновление Telegram в BotUpdate.
+    :param update: обновление в формате Bot API.
+    :param bot_username: имя бота, которое убирается из команд вида /play@bot.
+    :param bot_id: id бота, получившего обновление.
+    :return: обновление или None, если тип обновления не поддерживается.
+    :raise KeyError: в обновлении нет обязательных полей.
+    """
+    if (message := update.get("message")) is not None:
+        return _message(message, bot_username, bot_id)
+    if (callback_query := update.get("callback_query")) is not None:
+        return _callback_query(callback_query, bot_id)
+    return None
+
 
+def _message(message: dict, bot_username: str | None, bot_id: int | None) -> BotUpdate | None:
+    from_, chat = message["from"], message["chat"]
+    user_id = from_["id"]
 
-def command_from_dict(**data) -> BotCommand:
-    match data:
-        case {"message": {"text": text}}:
-            command, *_ = text.split()
+    if (text := message.get("text")) is not None:
+        if text.startswith("/"):
+            command = text.split(maxsplit=1)[0]
+            if bot_username:
+                command = command.replace(f"@{bot_username}", '')
             return BotCommand(
+                user_id, chat["id"], _chat_type(chat), Origin.TELEGRAM, _user(user_id, from_),
                 command=command.removeprefix('/'),
-                **update_from_dict(**data)
+                bot_id=bot_id
             )
-    raise ValueError("Unprocessable Telegram command.")
+        return BotMessage(
+            user_id, chat["id"], _chat_type(chat), Origin.TELEGRAM, _user(user_id, from_),
+            text=text,
+            bot_id=bot_id
+        )
 
+    if "new_chat_participant" in message:
+        return BotAction(
+            user_id, chat["id"], _chat_type(chat), Origin.TELEGRAM, _user(user_id, from_),
+            action=ActionType.ADD_TO_GROUP,
+            target_id=message["new_chat_member"]["id"],
+            bot_id=bot_id
+        )
+    return None
 
-def action_from_dict(**data) -> BotAction:
-    match data:
-        case {"message": {"new_chat_member": {"id": target_id}}}:
-            return BotAction(
-                action=ActionType.ADD_TO_GROUP,
-                target_id=target_id,
-                **update_from_dict(**data)
-            )
-    raise ValueError("Unprocessable Telegram action data.")
 
+def _callback_query(callback_query: dict, bot_id: int | None) -> BotCallbackQuery:
+    from_, message = callback_query["from"], callback_query["message"]
+    user_id, chat = from_["id"], message["chat"]
+    return BotCallbackQuery(
+        user_id, chat["id"], _chat_type(chat), Origin.TELEGRAM, _user(user_id, from_),
+        callback_data=CallbackData.unpack(callback_query["data"]),
+        callback_query_id=callback_query["id"],
+        message_id=message["message_id"],
+        bot_id=bot_id
+    )
 
-def message_from_dict(**data) -> BotMessage:
-    match data:
-        case {"message": {"text": text}}:
-            return BotMessage(text=text, **update_from_dict(**data))
-    raise ValueError("Unprocessable Telegram message data/")
 
+def _chat_type(chat: dict) -> ChatType:
+    return ChatType.PRIVATE if chat["type"] == 'private' else ChatType.GROUP
 
-def callback_query_from_dict(**data) -> BotCallbackQuery:
-    match data:
-        case {"callback_query": {
-            "id": callback_query_id,
-            "data": callback_data,
-            "message": {"message_id": message_id}
-        }}:
-            return BotCallbackQuery(
-                callback_data=CallbackData(**orjson.loads(callback_data)),
-                message_id=message_id,
-                callback_query_id=callback_query_id,
-                **update_from_dict(**data)
-            )
-    raise ValueError("Unprocessable Telegram callback_query data/")
+
+def _user(user_id: int, from_: dict) -> BotUser:
+    return BotUser(
+        id=user_id,
+        first_name=from_.get('first_name'),
+        last_name=from_.get('last_name'),
+        username=from_.get('username')
+    )
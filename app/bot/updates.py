@@ -1,5 +1,9 @@
 from abc import ABC
-from dataclasses import dataclass
+from dataclasses import dataclass, field, asdict
+from typing import Self
+
+import orjson
+from dacite import from_dict, Config
 
 from app.bot.inline import CallbackData
 from app.bot.enums import Origin, ChatType, ActionType
@@ -13,10 +17,25 @@ class BotUpdate(ABC):
     chat_type: ChatType | str
     origin: Origin | str
     user: BotUser | None
+    # id бота (сообщества), получившего обновление.
+    bot_id: int | None = field(default=None, kw_only=True)
 
     def __str__(self):
         return f"{self.__class__.__name__}[{self.origin}]"
 
+    def __bytes__(self) -> bytes:
+        return orjson.dumps({"type": self.__class__.__name__, "update": asdict(self)})
+
+    @classmethod
+    def from_bytes(cls, raw: bytes | str) -> Self:
+        """
+        Восстанавливает обновление, сериализованное через bytes().
+        """
+        data = orjson.loads(raw)
+        if (update_type := _UPDATE_TYPES.get(data["type"])) is None:
+            raise ValueError(f"Unknown update type: {data['type']}")
+        return from_dict(update_type, data["update"], config=Config(check_types=False))
+
 
 @dataclass(frozen=True, slots=True)
 class BotMessage(BotUpdate):
@@ -52,3 +71,7 @@ class BotAction(BotUpdate):
 
     def __str__(self):
         return f"{self.__class__.__name__}[{self.origin}]({self.action})"
+
+
+# Не __subclasses__: dataclass(slots=True) пересоздаёт класс, и прежний класс тоже остаётся в списке.
+_UPDATE_TYPES = {t.__name__: t for t in (BotMessage, BotCommand, BotCallbackQuery, BotAction)}
@@ -15,7 +15,8 @@ class HelpTelegram(BotView):
 
     async def handle(self, update: BotCallbackQuery):
         if self.limiter[update.chat_id].has_capacity():
-            await self.app.bot(update, self.limiter[update.chat_id]).send(
+            await self.limiter[update.chat_id].acquire()
+            await self.app.bot(update).send(
                 "/play - Начать игру.\n"
                 "/end - Отменить игру.\n"
                 "/help - Справка по командам."
@@ -28,7 +29,8 @@ class HelpVk(BotView):
 
     async def handle(self, update: BotCallbackQuery):
         if self.limiter[update.chat_id].has_capacity():
-            await self.app.bot(update, self.limiter[update.chat_id]).send(
+            await self.limiter[update.chat_id].acquire()
+            await self.app.bot(update).send(
                 "@имя_бота играть - Начать игру.\n"
                 "@имя_бота отменить - Отменить игру.\n"
                 "@имя_бота помощь - Справка по командам."
@@ -118,7 +120,8 @@ class Hello(BotView):
     limiter = AsyncLimiter(10)
 
     async def handle(self, update: BotAction):
-        await self.app.bot(update, self.limiter).send("Всем привет!")
+        await self.limiter.acquire()
+        await self.app.bot(update).send("Всем привет!")
 
 
 VIEWS = [
@@ -1,25 +1,36 @@
 import asyncio
 import json
+import time
 from random import randint
 from typing import Iterable
-from functools import cache
+from functools import cache, partial
 
-from aiohttp import ClientSession, ClientConnectorError
+from aiohttp import ClientError
+from aiolimiter import AsyncLimiter
 from orjson import orjson
 
 from app.abc.cleanup_ctx import CleanupCTX
-from app.bot.updates import BotUpdate
+from app.bot.enums import Origin
+from app.bot.scheduler import OutboundScheduler, RetryAfter, Priority
+from app.bot.updates import BotUpdate, BotCallbackQuery, BotCommand
 from app.bot.inline import InlineKeyboard
 from app.bot.user import BotUser
+from app.utils.cache import TTLCache
+from app.utils.http import CircuitOpen
+from app.utils.metrics import ApiMetrics
 from app.utils.runner import Runner
 from app.bot.vk import loaders
 
 
 class VkAPIAccessor(CleanupCTX):
+    """
+    Доступ к VK API одного сообщества.
+    :param token: ключ доступа сообщества.
+    :param group_id: id сообщества.
+    """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, token: str, group_id: int, **kwargs):
         super().__init__(*args, **kwargs)
-        self._session: ClientSession | None = None
         self._runner: Runner | None = None
         self._base_url = "https://api.vk.com"
         self._key: str | None = None
@@ -28,15 +39,40 @@ class VkAPIAccessor(CleanupCTX):
         self._v = "5.131"
         self._act = "a_check"
         self._wait = 25  # seconds
-        self._access_token = self.app.config.vk.token
-        self._group_id = self.app.config.vk.group_id
+        self._upload_timeout = 120  # seconds
+        # messages.send защищён от дублей random_id, остальные методы не меняют состояние
+        # или дают тот же результат при повторе.
+        self._idempotent = {
+            "messages.send", "messages.edit", "messages.delete", "messages.getByConversationMessageId",
+            "users.get", "groups.getLongPollServer", "groups.setLongPollSettings",
+            "photos.getMessagesUploadServer", "docs.getMessagesUploadServer"
+        }
+        self._access_token = token
+        self._group_id = group_id
+        # 20 запросов в секунду для ключа сообщества, отдельных квот на беседу у ВК нет.
+        self.scheduler = OutboundScheduler(self.app, origin=Origin.VK, rate=AsyncLimiter(max_rate=20, time_period=1))
+        self._metrics = ApiMetrics(Origin.VK)
+        self._users_window = 0.05  # seconds
+        self._users_batch: dict[int, asyncio.Future] = {}
+        self._calls_window = 0.02  # seconds
+        self._calls_batch: list[tuple[str, dict, asyncio.Future]] = []
+        self._execute_limit = 25  # вызовов в одном execute
+        self._execute_size = 16 * 1024  # bytes, параметров вызовов в одном execute: длинные тексты идут меньшими пачками
+        self._calls_size = 0  # bytes, параметров вызовов в _calls_batch
+        self._batchable = {"messages.send", "messages.edit", "messages.delete", "messages.sendMessageEventAnswer"}
+        self._tasks: set[asyncio.Task] = set()
+        # текст сообщений, отправленных или отредактированных ботом, по (peer_id, conversation_message_id).
+        self._texts = TTLCache(ttl=24 * 60 * 60, capacity=10_000)
+        # загруженные медиа сообщества: путь к файлу -> attachment.
+        self.attachments = TTLCache(ttl=24 * 60 * 60, capacity=10_000)
+        # загрузки, которые идут сейчас: путь к файлу -> задача загрузки.
+        self.uploads: dict[str, asyncio.Task] = {}
 
     @property
     def bot_id(self):
         return self._group_id
 
     async def on_startup(self):
-        self._session = ClientSession()
         try:
             await self._set_long_poll_settings()
             await self._get_long_poll_service()
@@ -47,28 +83,58 @@ class VkAPIAccessor(CleanupCTX):
             await self._runner.start()
 
     async def on_shutdown(self):
-        await self._runner.stop()
-        await self._session.close()
+        if self._runner is not None:
+            await self._runner.stop()
 
     async def poll(self):
         while True:
+            if not self.app.store.partitions.leader:
+                # Платформу опрашивает экземпляр-лидер, обновления чужих чатов он пересылает владельцам.
+                await asyncio.sleep(1)
+                continue
             try:
                 for update in self._pack(await self.get_updates()):
-                    await self.app.bot.dispatcher.handle(update)
-            except (TimeoutError, ClientConnectorError, ConnectionRefusedError) as e:
+                    if not await self.app.bot.bind(update):
+                        continue
+                    self._prefetch_user(update)
+                    await self.app.bot.pipeline.put(update)
+            except RetryAfter as e:
+                self.logger.warning(str(e))
+                await asyncio.sleep(e.seconds)
+            except CircuitOpen as e:
+                self.logger.warning(str(e))
+                await asyncio.sleep(e.retry_in)
+            except (TimeoutError, ClientError, ValueError) as e:
+                # Сетевые ошибки, 5xx после повторов и неразборчивые ответы: опрос продолжается после паузы.
                 self.logger.warning(str(e), exc_info=e)
                 await asyncio.sleep(5)
 
     async def get_updates(self) -> list[dict]:
-        async with self._session.get(url=self._server, params=self._get_updates_params) as response:
-            match (await response.json(content_type=response.content_type, loads=orjson.loads)):
-                case {"ts": ts, "updates": updates} as data:
-                    self.logger.debug('get_updates: ' + json.dumps(data, indent=2))
-                    self._ts = ts
-                    return updates
-                case error:
-                    self.logger.error('get_updates: ' + json.dumps(error, indent=2))
-                    await self._get_long_poll_service()
+        match await self.app.bot.http.request(
+                "GET",
+                self._server,
+                params=self._get_updates_params,
+                timeout=self._wait + 10,
+                idempotent=True
+        ):
+            case {"ts": ts, "updates": updates} as data:
+                self.logger.debug('get_updates: ' + json.dumps(data, indent=2))
+                self._ts = ts
+                return updates
+            case {"failed": 1, "ts": ts} as error:
+                # Часть событий потеряна, продолжаем с новой позиции.
+                self.logger.warning('get_updates: ' + json.dumps(error, indent=2))
+                self._ts = ts
+            case {"failed": 2} as error:
+                # Истёк ключ: нужен новый ключ, позиция в истории остаётся прежней.
+                self.logger.info('get_updates: ' + json.dumps(error, indent=2))
+                ts = self._ts
+                await self._get_long_poll_service()
+                self._ts = ts
+            case error:
+                # failed 3 (потеряна информация о сессии) или неизвестный ответ.
+                self.logger.error('get_updates: ' + json.dumps(error, indent=2))
+                await self._get_long_poll_service()
         return []
 
     async def send_message(
@@ -76,43 +142,41 @@ class VkAPIAccessor(CleanupCTX):
             chat_id: int,
             text: str,
             attachment: str = '',
-            inline_keyboard: InlineKeyboard | None = None
+            inline_keyboard: InlineKeyboard | None = None,
+            random_id: int | None = None
     ) -> int | None:
-        async with self._session.get(
-                url=self._url("messages.send"),
-                params=self._params(
-                    random_id=randint(-2147483648, 2147483648),
-                    peer_ids=[chat_id],
-                    message=text,
-                    keyboard=self._inline_keyboard_markup(inline_keyboard),
-                    dont_parse_links=0,
-                    attachment=attachment
-                )
-        ) as response:
-            match (await response.json(content_type=response.content_type, loads=orjson.loads)):
-                case {"response": [{"conversation_message_id": conversation_message_id}, *_]} as data:
-                    self.logger.debug('send_message: ' + json.dumps(data, indent=2))
-                    return conversation_message_id
-                case error:
-                    print(error)
-                    self.logger.error('send_message: ' + json.dumps(error, indent=2))
-                    return None
+        """
+        :param random_id: ключ от повторной отправки (по умолчанию - случайный на каждый вызов).
+        """
+        match await self._request(
+                "messages.send",
+                random_id=randint(-2147483648, 2147483648) if random_id is None else random_id,
+                peer_ids=[chat_id],
+                message=text,
+                keyboard=self._inline_keyboard_markup(inline_keyboard),
+                dont_parse_links=0,
+                attachment=attachment
+        ):
+            case {"response": [{"conversation_message_id": conversation_message_id}, *_]} as data:
+                self.logger.debug('send_message: ' + json.dumps(data, indent=2))
+                self._texts.put((chat_id, conversation_message_id), text)
+                return conversation_message_id
+            case error:
+                self.logger.error('send_message: ' + json.dumps(error, indent=2))
+                return None
 
     async def send_event_answer(self, text: str, event_id: str, user_id: int, chat_id: int):
-        async with self._session.get(
-                self._url("messages.sendMessageEventAnswer"),
-                params=self._params(
-                    event_id=event_id,
-                    user_id=user_id,
-                    peer_id=chat_id,
-                    event_data=self._snackbar(text),
-                )
-        ) as response:
-            match (await response.json(content_type=response.content_type, loads=orjson.loads)):
-                case {"response": _} as data:
-                    self.logger.debug('send_event_answer: ' + json.dumps(data, indent=2))
-                case error:
-                    self.logger.error('send_event_answer: ' + json.dumps(error, indent=2))
+        match await self._request(
+                "messages.sendMessageEventAnswer",
+                event_id=event_id,
+                user_id=user_id,
+                peer_id=chat_id,
+                event_data=self._snackbar(text),
+        ):
+            case {"response": _} as data:
+                self.logger.debug('send_event_answer: ' + json.dumps(data, indent=2))
+            case error:
+                self.logger.error('send_event_answer: ' + json.dumps(error, indent=2))
 
     async def edit_message(
             self,
@@ -120,150 +184,162 @@ class VkAPIAccessor(CleanupCTX):
             conversation_message_id: int,
             text: str | None = None,
             inline_keyboard: InlineKeyboard | None = None
-    ):
+    ) -> bool:
+        if text is None:
+            text = await self.get_message_text(chat_id, conversation_message_id)
 
-        async with self._session.get(self._url("messages.edit"), params=self._params(
+        match await self._request(
+                "messages.edit",
                 conversation_message_id=conversation_message_id,
-                message=text or await self.get_message_text(chat_id, conversation_message_id),
+                message=text,
                 peer_id=chat_id,
                 dont_parse_links=0,
                 keyboard=self._inline_keyboard_markup(inline_keyboard)
-        )) as response:
-            match (await response.json(content_type=response.content_type, loads=orjson.loads)):
-                case {"response": 1} as data:
-                    self.logger.debug('edit_message: ' + json.dumps(data, indent=2))
-                case error:
-                    self.logger.error('edit_message: ' + json.dumps(error, indent=2))
+        ):
+            case {"response": 1} as data:
+                self.logger.debug('edit_message: ' + json.dumps(data, indent=2))
+                self._texts.put((chat_id, conversation_message_id), text)
+                return True
+            case error:
+                self.logger.error('edit_message: ' + json.dumps(error, indent=2))
+                return False
 
     async def delete_message(self, chat_id: int, message_id: int):
-        response = await self._session.get(
-            self._url("messages.delete"),
-            params=self._params(
-                cmids=str(message_id),
-                delete_for_all=1,
-                peer_id=chat_id
-            )
+        self._texts.pop((chat_id, message_id))
+        data = await self._request(
+            "messages.delete",
+            cmids=str(message_id),
+            delete_for_all=1,
+            peer_id=chat_id
         )
-        match await response.json(content_type=response.content_type, loads=orjson.loads):
-            case data:
-                self.logger.debug('delete_message ' + json.dumps(data, indent=2))
-
-    async def get_user(self, user_id: int) -> (str, str, str):
-        async with self._session.get(
-                self._url("users.get"),
-                params=self._params(user_ids=[user_id], fields=['screen_name'])
-        ) as response:
-            match await response.json(content_type=response.content_type, loads=orjson.loads):
-                case {"response": [
-                    {
-                        "first_name": first_name,
-                        "last_name": last_name,
-                        "screen_name": screen_name
-                    }, *_
-                ]} as data:
-                    self.logger.debug('get_user ' + json.dumps(data, indent=2))
-                    return BotUser(id=user_id, username=screen_name, first_name=first_name, last_name=last_name)
-                case error:
-                    self.logger.error('get_user: ' + json.dumps(error, indent=2))
+        self.logger.debug('delete_message ' + json.dumps(data, indent=2))
+
+    async def get_user(self, user_id: int) -> BotUser | None:
+        """
+        Возвращает профиль пользователя. Запросы, пришедшие в течение короткого окна,
+        объединяются в один вызов users.get.
+        :param user_id: id пользователя.
+        """
+        if (future := self._users_batch.get(user_id)) is None:
+            future = self._enqueue_user(user_id)
+        return await asyncio.shield(future)
+
+    def _prefetch_user(self, update: BotUpdate):
+        """
+        Заранее запрашивает профиль автора нажатия или команды: обновления одного чата
+        обрабатываются по очереди, и без этого каждый обработчик ждал бы свой users.get.
+        """
+        if not isinstance(update, (BotCallbackQuery, BotCommand)):
+            return
+        if (Origin.VK, update.user_id) in self.app.bot.users or update.user_id in self._users_batch:
+            return
+        self._enqueue_user(update.user_id)
+
+    def _enqueue_user(self, user_id: int) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        if not self._users_batch:
+            loop.call_later(self._users_window, self._flush_users)
+        future = self._users_batch[user_id] = loop.create_future()
+        return future
+
+    def _flush_users(self):
+        batch, self._users_batch = self._users_batch, {}
+        task = asyncio.create_task(self._resolve_users(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve_users(self, batch: dict[int, asyncio.Future]):
+        try:
+            users = await self.scheduler.submit(partial(self._get_users, list(batch)), priority=Priority.HIGH)
+        except Exception as e:
+            self.logger.error(f"users.get failed for {list(batch)}", exc_info=e)
+            users = {}
+        for user_id, future in batch.items():
+            if (user := users.get(user_id)) is not None:
+                self.app.bot.users.put((Origin.VK, user_id), user)
+            if not future.done():
+                future.set_result(user)
+
+    async def _get_users(self, user_ids: list[int]) -> dict[int, BotUser]:
+        match await self._request("users.get", user_ids=user_ids, fields=["screen_name"]):
+            case {"response": [*users]} as data:
+                self.logger.debug('get_users ' + json.dumps(data, indent=2))
+                return {
+                    user["id"]: BotUser(
+                        id=user["id"],
+                        username=user.get("screen_name"),
+                        first_name=user["first_name"],
+                        last_name=user.get("last_name")
+                    ) for user in users
+                }
+            case error:
+                self.logger.error('get_users: ' + json.dumps(error, indent=2))
+        return {}
 
     def _pack(self, updates: list[dict]) -> Iterable[BotUpdate]:
         for update in updates:
-            match update:
-                case {
-                    "type": "message_new",
-                    "object": {"message": {"text": text}}
-                } as data if text.startswith("/") or text.startswith(f"[club{self._group_id}|"):
-                    yield loaders.command_from_dict(**data)
-                case {
-                    "type": "message_new",
-                    "object": {"message": {"text": text}}
-                } as data if text:
-                    yield loaders.message_from_dict(**data)
-                case {"type": "message_event", "object": {"payload": _}} as data:
-                    yield loaders.callback_query_from_dict(**data)
-                case {
-                    "type": "message_new",
-                    "object": {"message": {"action": {"member_id": _}}}
-                } as data:
-                    yield loaders.action_from_dict(**data)
-                case data:
-                    self.logger.error('_pack: unsupported update type => : ' + json.dumps(data, indent=2))
+            try:
+                bot_update = loaders.load(update, self._group_id)
+            except (KeyError, TypeError, ValueError) as e:
+                self.logger.error('_pack: malformed update => : ' + json.dumps(update, indent=2), exc_info=e)
+                continue
+            if bot_update is None:
+                self.logger.error('_pack: unsupported update type => : ' + json.dumps(update, indent=2))
+                continue
+            self.scheduler.latency.received(bot_update.chat_id)
+            yield bot_update
 
     async def _set_long_poll_settings(self):
-        async with self._session.get(
-                url=self._url("groups.setLongPollSettings"),
-                params=self._params(
-                    group_id=self._group_id,
-                    api_version=self._v,
-                    enabled=1,
-                    message_new=1,
-                    message_event=1,
-                    message_edit=0,
-                    message_typing_state=0,
-                    message_reply=0
-                )
-        ) as response:
-            self.logger.debug('_set_long_poll_settings ' + json.dumps(
-                await response.json(content_type=response.content_type, loads=orjson.loads), indent=2
-            ))
+        data = await self._request(
+            "groups.setLongPollSettings",
+            group_id=self._group_id,
+            api_version=self._v,
+            enabled=1,
+            message_new=1,
+            message_event=1,
+            message_edit=0,
+            message_typing_state=0,
+            message_reply=0
+        )
+        self.logger.debug('_set_long_poll_settings ' + json.dumps(data, indent=2))
 
     async def _get_long_poll_service(self):
-        async with self._session.get(
-                url=self._url("groups.getLongPollServer"),
-                params=self._params(group_id=self._group_id)
-        ) as response:
-            match (await response.json(content_type=response.content_type, loads=orjson.loads)):
-                case {"response": {"server": server, "key": key, "ts": ts}} as data:
-                    self._server, self._key, self._ts = server, key, ts
-                    self.logger.debug('_get_long_poll_service  ' + json.dumps(data, indent=2))
-                case error:
-                    self.logger.error('_get_long_poll_service ' + json.dumps(error, indent=2))
+        match await self._request("groups.getLongPollServer", group_id=self._group_id):
+            case {"response": {"server": server, "key": key, "ts": ts}} as data:
+                self._server, self._key, self._ts = server, key, ts
+                self.logger.debug('_get_long_poll_service  ' + json.dumps(data, indent=2))
+            case error:
+                self.logger.error('_get_long_poll_service ' + json.dumps(error, indent=2))
 
     async def get_photos_upload_url(self, chat_id: int) -> str | None:
-        async with self._session.post(
-                self._url("photos.getMessagesUploadServer"),
-                params=self._params(peer_id=chat_id)
-        ) as response:
-            match await response.json(content_type=response.content_type, loads=orjson.loads):
-                case {"response": {"upload_url": upload_url}} as data:
-                    self.logger.debug('get_photos_upload_url ' + json.dumps(data, indent=2))
-                    return upload_url
-                case error:
-                    self.logger.error('get_photos_upload_url ' + json.dumps(error, indent=2))
-            return None
+        match await self._request("photos.getMessagesUploadServer", peer_id=chat_id):
+            case {"response": {"upload_url": upload_url}} as data:
+                self.logger.debug('get_photos_upload_url ' + json.dumps(data, indent=2))
+                return upload_url
+            case error:
+                self.logger.error('get_photos_upload_url ' + json.dumps(error, indent=2))
+        return None
 
     async def get_voice_upload_url(self, chat_id: int) -> str | None:
-        async with self._session.post(
-                self._url("docs.getMessagesUploadServer"),
-                params=self._params(type='audio_message', peer_id=chat_id)
-        ) as response:
-            match await response.json(content_type=response.content_type, loads=orjson.loads):
-                case {"response": {"upload_url": upload_url}} as data:
-                    self.logger.debug('get_voice_upload_url ' + json.dumps(data, indent=2))
-                    return upload_url
-                case error:
-                    self.logger.error('get_voice_upload_url ' + json.dumps(error, indent=2))
-            return None
+        match await self._request("docs.getMessagesUploadServer", type='audio_message', peer_id=chat_id):
+            case {"response": {"upload_url": upload_url}} as data:
+                self.logger.debug('get_voice_upload_url ' + json.dumps(data, indent=2))
+                return upload_url
+            case error:
+                self.logger.error('get_voice_upload_url ' + json.dumps(error, indent=2))
+        return None
 
     async def get_doc_upload_url(self, chat_id: int) -> str | None:
-        async with self._session.post(
-                self._url("docs.getMessagesUploadServer"),
-                params=self._params(type='doc', peer_id=chat_id)
-        ) as response:
-            match await response.json(content_type=response.content_type, loads=orjson.loads):
-                case {"response": {"upload_url": upload_url}} as data:
-                    self.logger.debug('get_docs_upload_url ' + json.dumps(data, indent=2))
-                    return upload_url
-                case error:
-                    self.logger.error('get_docs_upload_url ' + json.dumps(error, indent=2))
-            return None
+        match await self._request("docs.getMessagesUploadServer", type='doc', peer_id=chat_id):
+            case {"response": {"upload_url": upload_url}} as data:
+                self.logger.debug('get_docs_upload_url ' + json.dumps(data, indent=2))
+                return upload_url
+            case error:
+                self.logger.error('get_docs_upload_url ' + json.dumps(error, indent=2))
+        return None
 
     async def save_photo(self, photo: str, server: str, photo_hash: str) -> str | None:
-        response = await self._session.post(
-            self._url('photos.saveMessagesPhoto'),
-            params=self._params(server=server, hash=photo_hash, photo=photo)
-        )
-        match await response.json(content_type=response.content_type, loads=orjson.loads):
+        match await self._request('photos.saveMessagesPhoto', server=server, hash=photo_hash, photo=photo):
             case {"response": [{"id": media_id, "owner_id": owner_id}, *_]} as data:
                 self.logger.debug('_save_photo: ' + json.dumps(data, indent=2))
                 return f"photo{owner_id}_{media_id}"
@@ -272,11 +348,7 @@ class VkAPIAccessor(CleanupCTX):
         return None
 
     async def save_voice(self, file: str) -> str | None:
-        response = await self._session.post(
-            self._url('docs.save'),
-            params=self._params(file=file)
-        )
-        match await response.json(content_type=response.content_type, loads=orjson.loads):
+        match await self._request('docs.save', file=file):
             case {"response": {"audio_message": {"id": media_id, "owner_id": owner_id}}} as data:
                 self.logger.debug('save_doc: ' + json.dumps(data, indent=2))
                 return f"doc{owner_id}_{media_id}"
@@ -285,11 +357,7 @@ class VkAPIAccessor(CleanupCTX):
         return None
 
     async def save_doc(self, file: str) -> str | None:
-        response = await self._session.post(
-            self._url('docs.save'),
-            params=self._params(file=file)
-        )
-        match await response.json(content_type=response.content_type, loads=orjson.loads):
+        match await self._request('docs.save', file=file):
             case {"response": {"doc": {"id": media_id, "owner_id": owner_id}}} as data:
                 self.logger.debug('save_doc: ' + json.dumps(data, indent=2))
                 return f"doc{owner_id}_{media_id}"
@@ -298,40 +366,180 @@ class VkAPIAccessor(CleanupCTX):
         return None
 
     async def upload_doc(self, upload_url: str, file_path: str) -> str | None:
-        with open(file_path, mode='rb') as photo_file:
-            async with self._session.post(upload_url, data=dict(file=photo_file)) as response:
-                # Иногда ВК присылает 'text/html'
-                match await response.json(content_type=response.content_type, loads=orjson.loads):
-                    case {"file": file} as data:
-                        self.logger.debug('upload_doc: ' + json.dumps(data, indent=2))
-                        return file
-                    case error:
-                        self.logger.error('upload_doc: ' + json.dumps(error, indent=2))
-                return None
+        async with self.app.store.media.open(file_path) as photo_file:
+            # Иногда ВК присылает 'text/html', поэтому тип ответа не проверяется.
+            match await self._upload(upload_url, dict(file=photo_file)):
+                case {"file": file} as data:
+                    self.logger.debug('upload_doc: ' + json.dumps(data, indent=2))
+                    return file
+                case error:
+                    self.logger.error('upload_doc: ' + json.dumps(error, indent=2))
+            return None
 
     async def upload_photo(self, upload_url: str, photo_path: str) -> (str | None, str | None, str | None):
-        with open(photo_path, mode='rb') as photo_file:
-            async with self._session.post(upload_url, data=dict(photo=photo_file)) as response:
-                # Иногда ВК присылает 'text/html'
-                match await response.json(content_type=response.content_type, loads=orjson.loads):
-                    case {"hash": photo_hash, "photo": photo, "server": server} as data:
-                        self.logger.debug('_upload_photo: ' + json.dumps(data, indent=2))
-                        return server, photo, photo_hash
-                    case error:
-                        self.logger.error('_upload_photo: ' + json.dumps(error, indent=2))
-                return None, None, None
+        async with self.app.store.media.open(photo_path) as photo_file:
+            # Иногда ВК присылает 'text/html', поэтому тип ответа не проверяется.
+            match await self._upload(upload_url, dict(photo=photo_file)):
+                case {"hash": photo_hash, "photo": photo, "server": server} as data:
+                    self.logger.debug('_upload_photo: ' + json.dumps(data, indent=2))
+                    return server, photo, photo_hash
+                case error:
+                    self.logger.error('_upload_photo: ' + json.dumps(error, indent=2))
+            return None, None, None
 
     async def get_message_text(self, chat_id: int, conversation_message_id: int) -> str:
-        async with self._session.get(self._url("messages.getByConversationMessageId"), params=self._params(
+        """
+        Текст сообщения: из кэша, если сообщение отправлял или менял сам бот, иначе запросом к ВК.
+        """
+        if (text := self._texts.get((chat_id, conversation_message_id))) is not None:
+            return text
+
+        match await self._request(
+                "messages.getByConversationMessageId",
                 peer_id=chat_id,
                 conversation_message_ids=[conversation_message_id]
-        )) as response:
-            match await response.json(content_type=response.content_type, loads=orjson.loads):
-                case {"response": {"count": 1, "items": [{"text": text}, *_]}} as data:
-                    self.logger.debug('_get_message_text: ' + json.dumps(data, indent=2))
-                    return text
-                case error:
-                    self.logger.error('_get_message_text: ' + json.dumps(error, indent=2))
+        ):
+            case {"response": {"count": 1, "items": [{"text": text}, *_]}} as data:
+                self.logger.debug('_get_message_text: ' + json.dumps(data, indent=2))
+                self._texts.put((chat_id, conversation_message_id), text)
+                return text
+            case error:
+                self.logger.error('_get_message_text: ' + json.dumps(error, indent=2))
+
+    async def _request(self, method: str, **params) -> dict:
+        """
+        Выполняет метод VK API POST-запросом с параметрами в теле формы.
+        Методы работы с сообщениями копятся в коротком окне и отправляются пачкой через execute.
+        :param method: название метода.
+        :param params: параметры метода (токен и версия добавляются автоматически).
+        :return: ответ ВК.
+        :raise RetryAfter: превышена частота запросов (коды ошибок 6 и 9).
+        """
+        latency, errors = self._metrics[method]
+        started = time.perf_counter()
+        try:
+            if method in self._batchable:
+                data = await self._enqueue_call(method, params)
+            else:
+                data = await self._call(method, params, idempotent=method in self._idempotent)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            latency.observe(time.perf_counter() - started)
+
+        match data:
+            case {"error": {"error_code": 6}} as error:
+                errors.inc()
+                self.logger.warning(method + ': ' + json.dumps(error, indent=2))
+                raise RetryAfter(1, bot_wide=True)
+            case {"error": {"error_code": 9}} as error:
+                errors.inc()
+                self.logger.warning(method + ': ' + json.dumps(error, indent=2))
+                raise RetryAfter(5)
+            case {"error": _}:
+                errors.inc()
+                return data
+            case result:
+                return result
+
+    async def _call(self, method: str, params: dict, idempotent: bool) -> dict:
+        return await self.app.bot.http.request(
+            "POST",
+            self._url(method),
+            form=self._params(**params),
+            idempotent=idempotent
+        )
+
+    async def _enqueue_call(self, method: str, params: dict) -> dict:
+        loop = asyncio.get_running_loop()
+        size = len(orjson.dumps(self._args(params)))
+        if self._calls_batch and self._calls_size + size > self._execute_size:
+            self._flush_calls()
+        if not self._calls_batch:
+            loop.call_later(self._calls_window, self._flush_calls)
+        future = loop.create_future()
+        self._calls_batch.append((method, params, future))
+        self._calls_size += size
+        if len(self._calls_batch) >= self._execute_limit or self._calls_size >= self._execute_size:
+            self._flush_calls()
+        return await asyncio.shield(future)
+
+    def _flush_calls(self):
+        batch, self._calls_batch, self._calls_size = self._calls_batch, [], 0
+        if not batch:
+            return
+        task = asyncio.create_task(self._execute(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _execute(self, batch: list[tuple[str, dict, asyncio.Future]]):
+        """
+        Выполняет пачку вызовов: удаления сообщений одной беседы объединяются
+        в один messages.delete, остальное уходит одним execute (вызовы внутри выполняются по порядку).
+        Токен общей квоты расходуется один раз на пачку: планировщик отдал вызовы без него (batched).
+        """
+        calls: list[tuple[str, dict, list[asyncio.Future]]] = []
+        deletes: dict[tuple, tuple[str, dict, list[asyncio.Future]]] = {}
+        for method, params, future in batch:
+            if method == "messages.delete":
+                key = (params["peer_id"], params.get("delete_for_all"))
+                if (call := deletes.get(key)) is not None:
+                    call[1]["cmids"] = f"{call[1]['cmids']},{params['cmids']}"
+                    call[2].append(future)
+                    continue
+                call = deletes[key] = (method, dict(params), [future])
+                calls.append(call)
+            else:
+                calls.append((method, params, [future]))
+
+        try:
+            await self.scheduler.charge()
+            if len(calls) == 1:
+                method, params, _ = calls[0]
+                results = [await self._call(method, params, idempotent=method in self._idempotent)]
+            else:
+                results = self._unpack_execute(len(calls), await self._call(
+                    "execute",
+                    dict(code=self._execute_code(calls)),
+                    idempotent=all(method in self._idempotent for method, _, _ in calls)
+                ))
+        except Exception as e:
+            for _, _, futures in calls:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(e)
+            return
+
+        for (_, _, futures), result in zip(calls, results):
+            for future in futures:
+                if not future.done():
+                    future.set_result(result)
+
+    def _execute_code(self, calls: list[tuple[str, dict, list]]) -> str:
+        return "return [" + ",".join(
+            f"API.{method}({orjson.dumps(self._args(params)).decode('utf-8')})" for method, params, _ in calls
+        ) + "];"
+
+    @staticmethod
+    def _unpack_execute(count: int, data: dict) -> list[dict]:
+        """
+        Раскладывает ответ execute на ответы отдельных методов.
+        Неудачный вызов возвращает false, а его ошибка идёт по порядку в execute_errors.
+        """
+        match data:
+            case {"response": [*responses]}:
+                errors = iter(data.get("execute_errors", []))
+                return [
+                    {"error": next(errors, {"error_msg": "execute failed"})} if response is False
+                    else {"response": response}
+                    for response in responses
+                ]
+            case error:
+                return [error] * count
+
+    async def _upload(self, upload_url: str, data: dict) -> dict:
+        return await self.app.bot.http.request("POST", upload_url, data=data, timeout=self._upload_timeout)
 
     @staticmethod
     def _inline_keyboard_markup(inline_keyboard: InlineKeyboard | None = None) -> str:
@@ -359,7 +567,19 @@ class VkAPIAccessor(CleanupCTX):
         return f"{self._base_url}/method/{method}"
 
     def _params(self, **params):
-        return params | dict(access_token=self._access_token, v=self._v)
+        """
+        Параметры метода для тела формы: пустые (None) параметры не передаются.
+        """
+        return {
+            k: v for k, v in self._args(params).items() if v is not None
+        } | dict(access_token=self._access_token, v=self._v)
+
+    @staticmethod
+    def _args(params: dict) -> dict:
+        """
+        Параметры метода: списки ВК принимает через запятую.
+        """
+        return {k: ",".join(map(str, v)) if isinstance(v, list) else v for k, v in params.items()}
 
     @property
     def _get_updates_params(self):
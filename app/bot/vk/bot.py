@@ -1,14 +1,22 @@
+import asyncio
+from functools import partial
+from typing import Callable, Awaitable
+
 from app.abc.bot import AbstractBot
+from app.bot.enums import Origin
+from app.bot.scheduler import Priority
 from app.bot.user import BotUser
 from app.bot.vk.accessor import VkAPIAccessor
 from app.bot.inline import InlineKeyboard
 from app.bot.updates import BotCallbackQuery, BotUpdate
+from app.utils.cache import TTLCache
 
 
 class VkBot(AbstractBot):
-    def __init__(self, api: VkAPIAccessor, update: BotUpdate | None = None):
+    def __init__(self, api: VkAPIAccessor, update: BotUpdate | None, users: TTLCache):
         self._api = api
         self._update = update
+        self._users = users
 
     @property
     def bot_id(self) -> int:
@@ -21,6 +29,9 @@ class VkBot(AbstractBot):
         if not user_id:
             raise ValueError(f"Not enough params! ({user_id=})")
 
+        if (user := self._users.get((Origin.VK, user_id))) is not None:
+            return user
+
         return await self._api.get_user(user_id)
 
     async def send(
@@ -29,18 +40,19 @@ class VkBot(AbstractBot):
             inline_keyboard: InlineKeyboard | None = None,
             photo_path: str | None = None,
             /, *,
-            chat_id: int | None = None
-    ) -> int:
+            chat_id: int | None = None,
+            random_id: int | None = None
+    ) -> int | None:
         if self._update is not None:
             chat_id = chat_id or self._update.chat_id
 
         if chat_id is None:
             raise ValueError(f"Not enough params! ({chat_id=})")
 
-        return await self._api.send_message(
-            chat_id,
-            text,
-            inline_keyboard=inline_keyboard
+        return await self._api.scheduler.submit(
+            partial(self._api.send_message, chat_id, text, inline_keyboard=inline_keyboard, random_id=random_id),
+            chat_id=chat_id,
+            batched=True
         )
 
     async def send_photo(
@@ -56,11 +68,11 @@ class VkBot(AbstractBot):
         if chat_id is None:
             raise ValueError(f"Not enough params! ({chat_id=})")
 
-        upload_url = await self._api.get_photos_upload_url(chat_id)
-        server, photo, photo_hash = await self._api.upload_photo(upload_url, photo_path)
-        attachment = await self._api.save_photo(photo, server, photo_hash)
+        attachment = await self._upload_photo(photo_path, chat_id)
 
-        return await self._api.send_message(chat_id, text=text, attachment=attachment)
+        return await self._submit(
+            partial(self._api.send_message, chat_id, text=text, attachment=attachment), chat_id, batched=True
+        )
 
     async def send_voice(
             self,
@@ -75,12 +87,11 @@ class VkBot(AbstractBot):
         if chat_id is None:
             raise ValueError(f"Not enough params! ({chat_id=})")
 
-        upload_url = await self._api.get_voice_upload_url(chat_id)
-        file = await self._api.upload_doc(upload_url, voice_path)
-
-        attachment = await self._api.save_voice(file)
+        attachment = await self._upload_voice(voice_path, chat_id)
 
-        return await self._api.send_message(chat_id, text=text, attachment=attachment)
+        return await self._submit(
+            partial(self._api.send_message, chat_id, text=text, attachment=attachment), chat_id, batched=True
+        )
 
     async def send_video(
             self,
@@ -95,13 +106,25 @@ class VkBot(AbstractBot):
         if chat_id is None:
             raise ValueError(f"Not enough params! ({chat_id=})")
 
-        upload_url = await self._api.get_doc_upload_url(chat_id)
+        attachment = await self._upload_video(video_path, chat_id)
+
+        return await self._submit(
+            partial(self._api.send_message, chat_id, text=text, attachment=attachment), chat_id, batched=True
+        )
 
-        file = await self._api.upload_doc(upload_url, video_path)
+    async def preload(self, path: str, content_type: str, /, *, chat_id: int | None = None):
+        if self._update is not None:
+            chat_id = chat_id or self._update.chat_id
 
-        attachment = await self._api.save_doc(file)
+        if chat_id is None:
+            raise ValueError(f"Not enough params! ({chat_id=})")
 
-        return await self._api.send_message(chat_id, text=text, attachment=attachment)
+        if content_type.startswith('image'):
+            await self._upload_photo(path, chat_id)
+        elif content_type.startswith('audio'):
+            await self._upload_voice(path, chat_id)
+        elif content_type.startswith('video'):
+            await self._upload_video(path, chat_id)
 
     async def delete(self, message_id: int | None = None, chat_id: int | None = None):
         if isinstance(self._update, BotCallbackQuery):
@@ -113,7 +136,12 @@ class VkBot(AbstractBot):
         if not chat_id or not message_id:
             raise ValueError(f"Not enough params! ({chat_id=}, {message_id=})")
 
-        await self._api.delete_message(chat_id, message_id)
+        await self._api.scheduler.submit(
+            partial(self._api.delete_message, chat_id, message_id),
+            chat_id=chat_id,
+            priority=Priority.LOW,
+            batched=True
+        )
 
     async def edit(
             self,
@@ -123,7 +151,7 @@ class VkBot(AbstractBot):
             message_id: int | None = None,
             chat_id: int | None = None,
             remove_inline_keyboard: bool = False
-    ):
+    ) -> bool:
         if inline_keyboard is None and text is None:
             raise ValueError("Nothing to edit!")
 
@@ -136,12 +164,28 @@ class VkBot(AbstractBot):
         if not chat_id or not message_id:
             raise ValueError(f"Not enough params! ({chat_id=}, {message_id=})")
 
-        await self._api.edit_message(
+        call = partial(
+            self._api.edit_message,
             chat_id=chat_id,
             conversation_message_id=message_id,
             text=text,
             inline_keyboard=inline_keyboard
         )
+        key = (chat_id, message_id)
+
+        if text is None:
+            # Меняется только клавиатура: объединять с ожидающей правкой текста нельзя.
+            edited = await self._submit(call, chat_id, batched=True)
+            self._api.scheduler.forget(key)
+            return edited
+
+        return await self._api.scheduler.submit(
+            call,
+            chat_id=chat_id,
+            key=key,
+            digest=hash((text, inline_keyboard.signature() if inline_keyboard else None)),
+            batched=True
+        )
 
     async def callback(
             self,
@@ -161,9 +205,59 @@ class VkBot(AbstractBot):
         if callback_query_id is None or chat_id is None or user_id is None:
             raise ValueError(f"Not enough params! ({callback_query_id=}, {chat_id=}, {user_id=})")
 
-        await self._api.send_event_answer(
+        await self._api.scheduler.submit(partial(
+            self._api.send_event_answer,
             text=text,
             event_id=callback_query_id,
             user_id=user_id,
             chat_id=chat_id
-        )
+        ), priority=Priority.HIGH, batched=True)
+
+    async def _submit(self, call, chat_id: int, batched: bool = False):
+        return await self._api.scheduler.submit(call, chat_id=chat_id, batched=batched)
+
+    async def _upload_photo(self, path: str, chat_id: int) -> str | None:
+        async def upload():
+            upload_url = await self._submit(partial(self._api.get_photos_upload_url, chat_id), chat_id)
+            server, photo, photo_hash = await self._api.upload_photo(upload_url, path)
+            attachment = await self._submit(partial(self._api.save_photo, photo, server, photo_hash), chat_id)
+            return self._remember(path, attachment)
+
+        return await self._upload(path, upload)
+
+    async def _upload_voice(self, path: str, chat_id: int) -> str | None:
+        async def upload():
+            upload_url = await self._submit(partial(self._api.get_voice_upload_url, chat_id), chat_id)
+            file = await self._api.upload_doc(upload_url, path)
+            attachment = await self._submit(partial(self._api.save_voice, file), chat_id)
+            return self._remember(path, attachment)
+
+        return await self._upload(path, upload)
+
+    async def _upload_video(self, path: str, chat_id: int) -> str | None:
+        async def upload():
+            upload_url = await self._submit(partial(self._api.get_doc_upload_url, chat_id), chat_id)
+            file = await self._api.upload_doc(upload_url, path)
+            attachment = await self._submit(partial(self._api.save_doc, file), chat_id)
+            return self._remember(path, attachment)
+
+        return await self._upload(path, upload)
+
+    async def _upload(self, path: str, upload: Callable[[], Awaitable[str | None]]) -> str | None:
+        """
+        Загружает файл, если его attachment ещё неизвестен. Одновременные загрузки одного файла
+        (подготовка медиа игры и показ вопроса) ждут одну и ту же задачу.
+        """
+        if (attachment := self._api.attachments.get(path)) is not None:
+            return attachment
+
+        if (task := self._api.uploads.get(path)) is None:
+            task = self._api.uploads[path] = asyncio.create_task(upload())
+            task.add_done_callback(lambda _: self._api.uploads.pop(path, None))
+        # Отмена одного из ожидающих (например, подготовки медиа) не прерывает загрузку для остальных.
+        return await asyncio.shield(task)
+
+    def _remember(self, path: str, attachment: str | None) -> str | None:
+        if attachment is not None:
+            self._api.attachments.put(path, attachment)
+        return attachment
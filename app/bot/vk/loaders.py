@@ -1,4 +1,8 @@
-from app.bot.updates import Origin
+"""
+Разбор событий Long Poll API сообщества в BotUpdate за один проход.
+Тип обновления определяется по полю type, поля читаются напрямую по ключам.
+"""
+from app.bot.updates import Origin, BotUpdate
 from app.bot.enums import ChatType, ActionType
 from app.bot.inline import CallbackData
 from app.bot.updates import BotCommand, BotAction, BotMessage, BotCallbackQuery
@@ -8,81 +12,56 @@ def define_chat_type(chat_id: int):
     return ChatType.GROUP if chat_id > 2000000000 else ChatType.PRIVATE
 
 
-def update_from_dict(**data):
-    match data:
-        case {"object": {"message": {
-            "from_id": user_id,
-            "peer_id": peer_id
-        }}}:
-            return dict(
-                origin=Origin.VK,
-                user_id=user_id,
-                chat_id=peer_id,
-                chat_type=define_chat_type(peer_id),
-                user=None
-            )
-        case {"object": {
-            "user_id": user_id,
-            "peer_id": peer_id,
-        }}:
-            return dict(
-                origin=Origin.VK,
-                user_id=user_id,
-                chat_id=peer_id,
-                chat_type=define_chat_type(peer_id),
-                user=None
-            )
-    raise ValueError("Unprocessable VK update data.")
+def load(update: dict, group_id: int) -> BotUpdate | None:
+    """
+    Превращает событие ВК в BotUpdate.
+    :param update: событие Long Poll API.
+    :param group_id: id сообщества бота, по упоминанию которого распознаются команды.
+    :return: обновление или None, если тип события не поддерживается.
+    :raise KeyError: в событии нет обязательных полей.
+    """
+    match update.get("type"):
+        case "message_new":
+            return _message(update["object"]["message"], group_id)
+        case "message_event":
+            return _event(update["object"], group_id)
+    return None
 
 
-def command_from_dict(**data) -> BotCommand:
-    match data:
-        case {"object": {"message": {"text": text}}}:
-            if text.startswith('/'):
-                command, *_ = text.split()
-                command = command.removeprefix('/')
-            else:
-                args = text.split(']')
-                command = args[1].strip() if len(args) > 1 else ''
-            return BotCommand(
-                command=command,
-                **update_from_dict(**data)
-            )
-    raise ValueError("Unprocessable VK command data.")
+def _message(message: dict, group_id: int) -> BotUpdate | None:
+    user_id, peer_id = message["from_id"], message["peer_id"]
+    text = message.get("text", '')
 
+    if text.startswith('/'):
+        command = text.split(maxsplit=1)[0].removeprefix('/')
+        return BotCommand(user_id, peer_id, define_chat_type(peer_id), Origin.VK, None, command=command, bot_id=group_id)
 
-def action_from_dict(**data) -> BotAction:
-    match data:
-        case {"object": {"message": {"action": ({"type": _, "member_id": member_id})}}}:
-            return BotAction(
-                action=ActionType.ADD_TO_GROUP,
-                target_id=member_id,
-                **update_from_dict(**data)
-            )
-    raise ValueError("Unprocessable VK action data.")
+    if text.startswith(f"[club{group_id}|"):
+        args = text.split(']')
+        command = args[1].strip() if len(args) > 1 else ''
+        return BotCommand(user_id, peer_id, define_chat_type(peer_id), Origin.VK, None, command=command, bot_id=group_id)
 
+    if text:
+        return BotMessage(user_id, peer_id, define_chat_type(peer_id), Origin.VK, None, text=text, bot_id=group_id)
 
-def message_from_dict(**data) -> BotMessage:
-    match data:
-        case {"object": {"message": {"text": text}}}:
-            return BotMessage(
-                text=text,
-                **update_from_dict(**data)
-            )
-    raise ValueError("Unprocessable VK message data.")
+    if (action := message.get("action")) is not None and "member_id" in action:
+        return BotAction(
+            user_id, peer_id, define_chat_type(peer_id), Origin.VK, None,
+            action=ActionType.ADD_TO_GROUP,
+            target_id=action["member_id"],
+            bot_id=group_id
+        )
+    return None
 
 
-def callback_query_from_dict(**data) -> BotCallbackQuery:
-    match data:
-        case {"object": {
-            "event_id": event_id,
-            "payload": {"type": data_type, "value": value},
-            "conversation_message_id": conversation_message_id
-        }}:
-            return BotCallbackQuery(
-                message_id=conversation_message_id,
-                callback_data=CallbackData(data_type, value),
-                callback_query_id=event_id,
-                **update_from_dict(**data)
-            )
-    raise ValueError("Unprocessable VK callback_query data.")
+def _event(event: dict, group_id: int) -> BotCallbackQuery | None:
+    if (payload := event.get("payload")) is None:
+        return None
+    peer_id = event["peer_id"]
+    return BotCallbackQuery(
+        event["user_id"], peer_id, define_chat_type(peer_id), Origin.VK, None,
+        callback_data=CallbackData(payload["type"], payload["value"]),
+        callback_query_id=event["event_id"],
+        message_id=event["conversation_message_id"],
+        bot_id=group_id
+    )
@@ -160,6 +160,8 @@ class Game(Base):
     id: Mapped[int] = mapped_column(primary_key=True, compare=True)
     origin: Mapped[Origin] = mapped_column(sa.Enum(Origin), nullable=False, compare=True)
     chat_id: Mapped[int] = mapped_column(sa.BigInteger, nullable=False, compare=True)
+    # бот, через который идёт игра: его сообщения может править только он сам.
+    bot_id: Mapped[int | None] = mapped_column(sa.BigInteger, nullable=True)
     state: Mapped[GameState] = mapped_column(sa.Enum(GameState), nullable=False)
     created_at: Mapped[datetime] = mapped_column(sa.DateTime(timezone=True), default=sa.func.now(tz='UTC'))
     selected_questions: Mapped[set[int]] = mapped_column(MutableList.as_mutable(ARRAY(sa.Integer)), default=[])
@@ -283,6 +285,11 @@ class Game(Base):
             if p.user_id == self.answering_user_id:
                 return p
 
+    def get_player(self, user_id: int) -> Player | None:
+        for p in self.players:
+            if p.user_id == user_id:
+                return p
+
     def get_current_player(self) -> Player:
         for p in self.players:
             if p.user_id == self.current_user_id:
@@ -291,9 +298,6 @@ class Game(Base):
     def any_questions(self) -> bool:
         return len(self.selected_questions) < 5 * GameConfig.GAME_THEMES_COUNT
 
-    def finish(self):
-        self.themes.clear()
-
 
 class DelayedMessage(Base):
     __tablename__ = "delayed_messages"
@@ -305,8 +309,46 @@ class DelayedMessage(Base):
     chat_id: Mapped[int] = mapped_column(sa.BigInteger, nullable=False)
     data: Mapped[bytes] = mapped_column(sa.LargeBinary(), nullable=False)
     created_at: Mapped[datetime] = mapped_column(sa.DateTime(timezone=True), default=sa.func.now(tz='UTC'))
+    due_at: Mapped[datetime] = mapped_column(sa.DateTime(timezone=True), nullable=False, index=True)
+    # До какого момента таймер обрабатывает забравший его воркер (backend database).
+    claimed_until: Mapped[datetime | None] = mapped_column(sa.DateTime(timezone=True), nullable=True)
 
     @property
     def seconds_remaining(self):
-        _delay = int(self.delay - (datetime.now(tz=timezone.utc) - self.created_at).total_seconds())
+        _delay = int((self.due_at - datetime.now(tz=timezone.utc)).total_seconds())
         return _delay if _delay > 1 else 1
+
+
+class OutboxMessage(Base):
+    """
+    Сообщение бота, записанное в той же транзакции, что и изменение игры.
+    Отправляется воркером OutboxSender, строка удаляется после успешной отправки.
+    """
+    __tablename__ = "outbox"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    origin: Mapped[Origin] = mapped_column(sa.Enum(Origin), nullable=False)
+    chat_id: Mapped[int] = mapped_column(sa.BigInteger, nullable=False)
+    bot_id: Mapped[int] = mapped_column(sa.BigInteger, nullable=True)
+    method: Mapped[str] = mapped_column(sa.String(20), nullable=False)
+    data: Mapped[bytes] = mapped_column(sa.LargeBinary(), nullable=False)
+    attempts: Mapped[int] = mapped_column(nullable=False, default=0)
+    available_at: Mapped[datetime] = mapped_column(
+        sa.DateTime(timezone=True), nullable=False, default=sa.func.now(tz='UTC'), index=True
+    )
+    # отправка без ключа идемпотентности на платформе началась, а её исход неизвестен.
+    sending_at: Mapped[datetime | None] = mapped_column(sa.DateTime(timezone=True), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(sa.DateTime(timezone=True), default=sa.func.now(tz='UTC'))
+
+
+class ForwardedUpdate(Base):
+    """
+    Обновление чужого чата, переданное экземпляром-лидером владельцу раздела.
+    Владелец забирает строки своих разделов по уведомлению или на пульсе.
+    """
+    __tablename__ = "forwarded_updates"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    partition: Mapped[int] = mapped_column(nullable=False, index=True)
+    data: Mapped[bytes] = mapped_column(sa.LargeBinary(), nullable=False)
+    created_at: Mapped[datetime] = mapped_column(sa.DateTime(timezone=True), default=sa.func.now(tz='UTC'))
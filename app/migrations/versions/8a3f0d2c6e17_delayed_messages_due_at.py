@@ -0,0 +1,28 @@
+"""delayed messages due_at
+
+Revision ID: 8a3f0d2c6e17
+Revises: 5c1e7a9b2f40
+Create Date: 2026-10-19 15:42:07.913604
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a3f0d2c6e17'
+down_revision = '5c1e7a9b2f40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('delayed_messages', sa.Column('due_at', sa.DateTime(timezone=True), nullable=True))
+    op.execute("UPDATE delayed_messages SET due_at = created_at + delay * interval '1 second'")
+    op.alter_column('delayed_messages', 'due_at', nullable=False)
+    op.create_index(op.f('ix-delayed_messages-due_at'), 'delayed_messages', ['due_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix-delayed_messages-due_at'), table_name='delayed_messages')
+    op.drop_column('delayed_messages', 'due_at')
@@ -0,0 +1,24 @@
+"""outbox sending_at
+
+Revision ID: a93e5b17c2d4
+Revises: f0a6c2d84e91
+Create Date: 2026-10-19 10:12:41.508316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a93e5b17c2d4'
+down_revision = 'f0a6c2d84e91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('outbox', sa.Column('sending_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('outbox', 'sending_at')
@@ -0,0 +1,24 @@
+"""delayed messages claimed_until
+
+Revision ID: b7d2e4f19a63
+Revises: 8a3f0d2c6e17
+Create Date: 2026-10-20 10:14:52.306118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d2e4f19a63'
+down_revision = '8a3f0d2c6e17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('delayed_messages', sa.Column('claimed_until', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('delayed_messages', 'claimed_until')
@@ -0,0 +1,33 @@
+"""forwarded updates
+
+Revision ID: e41c9a7d3b58
+Revises: b7d2e4f19a63
+Create Date: 2026-10-20 11:02:37.518940
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e41c9a7d3b58'
+down_revision = 'b7d2e4f19a63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'forwarded_updates',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('partition', sa.Integer(), nullable=False),
+        sa.Column('data', sa.LargeBinary(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id', name=op.f('pk-forwarded_updates'))
+    )
+    op.create_index(op.f('ix-forwarded_updates-partition'), 'forwarded_updates', ['partition'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix-forwarded_updates-partition'), table_name='forwarded_updates')
+    op.drop_table('forwarded_updates')
@@ -0,0 +1,24 @@
+"""games bot_id
+
+Revision ID: f0a6c2d84e91
+Revises: e41c9a7d3b58
+Create Date: 2026-10-20 11:47:05.224731
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f0a6c2d84e91'
+down_revision = 'e41c9a7d3b58'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('games', sa.Column('bot_id', sa.BigInteger(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('games', 'bot_id')
@@ -1,25 +1,20 @@
-import os
-from pathlib import Path
-
 from app.web.application import Application
 
 
 class Store:
     def __init__(self, app: Application):
-        self._dir = app.config.settings.media_dir
-
         from app.store.database import Database
-        self.db = Database(app)
+        from app.store.gauges import StateGauges
+        from app.store.media import MediaStorage
+        from app.store.partitions import Partitions
 
-    def save(self, name: str, file: bytes):
-        with open(f"{self._dir}/{name}", 'wb') as f:
-            f.write(file)
-
-    def remove(self, name: str):
-        os.remove(f"{self._dir}/{name}")
+        self.db = Database(app)
+        self.partitions = Partitions(app)  # после базы: останавливается раньше неё
+        self.media = MediaStorage(app)
+        self.gauges = StateGauges(app)  # после базы: останавливается раньше неё
 
     def path(self, name: str) -> str:
-        return f"{self._dir}/{name}"
+        return self.media.path(name)
 
 
 def setup_store(app: Application):
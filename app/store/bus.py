@@ -1,6 +1,8 @@
 import asyncio
 from asyncio import Future
 from asyncio.exceptions import CancelledError
+from datetime import datetime, timezone, timedelta
+from enum import StrEnum, auto
 from typing import Type
 
 from app.abc.cleanup_ctx import CleanupCTX
@@ -8,9 +10,19 @@ from app.abc.handler import Handler
 from app.abc.message import Message
 from app.bot.enums import Origin
 from app.game.models import DelayedMessage
+from app.store.timers import DatabaseTimers
+from app.store.unit_of_work import LeaseLost
 from app.utils.runner import Runner
 
 
+class Durability(StrEnum):
+    """
+    Как хранится отложенное сообщение.
+    """
+    EPHEMERAL: str = auto()  # только в памяти: теряется при перезапуске, в базу не пишется.
+    PERSISTED: str = auto()  # строка в delayed_messages: переживает перезапуск.
+
+
 class MessageBus(CleanupCTX):
     """
     Шина сообщений - событийно-ориентированный подход.
@@ -22,10 +34,17 @@ class MessageBus(CleanupCTX):
         self._handlers = {}
         self._runner: Runner | None = None
         self._delayed_messages = {}
+        self._ephemeral: set[int] = set()  # ключи _delayed_messages таймеров без строки в базе
+        # database: таймеры срабатывают из таблицы, задачи в памяти не создаются.
+        # После шины: начинает публиковать, когда шина уже запущена, и останавливается раньше неё.
+        self._timers = DatabaseTimers(self.app) if self.app.config.timers.backend == "database" else None
 
     async def on_startup(self):
         self._runner = Runner(self.handle)
-        await self._restore()
+        if self._timers is None:
+            # Таймеры чатов, перешедших от другого экземпляра, восстанавливаются из базы.
+            self.app.store.partitions.subscribe(acquired=self._restore, released=self._forget)
+            await self._restore()
         await self._runner.start()
 
     async def on_shutdown(self):
@@ -56,16 +75,56 @@ class MessageBus(CleanupCTX):
         """
         self._queue.put_nowait(message)
 
-    async def postpone_publish(self, message: Message, origin: Origin, chat_id: int, *, delay: int):
+    async def deliver(self, message: Message) -> bool:
+        """
+        Передаёт сообщение обработчикам в обход очереди и ждёт, пока они отработают.
+        :param message: команда или событие.
+        :return: все обработчики завершились без ошибок.
+        """
+        tasks = [asyncio.create_task(h(message)) for h in self._handlers.get(message.__class__.__name__, [])]
+        for task in tasks:
+            task.add_done_callback(self._done_callback)
+        if tasks:
+            await asyncio.wait(tasks)
+        return all(not task.cancelled() and task.exception() is None for task in tasks)
+
+    @property
+    def queued(self) -> int:
+        """
+        Сообщения, ожидающие раздачи обработчикам.
+        """
+        return self._queue.qsize()
+
+    @property
+    def pending_timers(self) -> int:
+        """
+        Таймеры отложенных сообщений в памяти экземпляра, которые ещё не сработали.
+        """
+        return sum(not task.done() for task, _ in self._delayed_messages.values())
+
+    async def postpone_publish(
+            self,
+            message: Message,
+            origin: Origin,
+            chat_id: int,
+            *,
+            delay: int,
+            durability: Durability = Durability.PERSISTED
+    ):
         """
         Откладывает ПУБЛИКАЦИЮ события или команды в шину сообщений.
         :param message: события или команда.
         :param origin: источник - необходимо для идентификации событий и команд.
         :param chat_id: - необходимо для идентификации событий и команд.
         :param delay: задержка в секундах (на сколько откладываем.)
+        :param durability: EPHEMERAL - для косметических пауз, потеря которых при перезапуске допустима.
         """
+        if durability == Durability.EPHEMERAL:
+            await self._postpone(message, origin, chat_id, delay, durability)
+            return
         await self._save(message, origin, chat_id, delay)
-        await self._postpone(message, origin, chat_id, delay)
+        if self._timers is None:
+            await self._postpone(message, origin, chat_id, delay)
 
     async def cancel(self, message_class: Type[Message], origin: Origin, chat_id: int):
         """
@@ -80,9 +139,12 @@ class MessageBus(CleanupCTX):
             task, _ = self._delayed_messages[hash_]
             task.cancel()
             del self._delayed_messages[hash_]
+            if hash_ in self._ephemeral:
+                self._ephemeral.discard(hash_)
+                return
 
         async with self.app.store.db() as uow:
-            await uow.delayed_messages.delete(message_class.__name__, origin, chat_id)
+            await uow.lean.delete_delayed_message(message_class.__name__, origin, chat_id)
             await uow.commit()
 
     async def cancel_all(self, origin: Origin, chat_id: int):
@@ -98,6 +160,11 @@ class MessageBus(CleanupCTX):
                 message = Message.from_model(dm)
                 await self.cancel(message.__class__, dm.origin, dm.chat_id)
 
+        for hash_ in list(self._ephemeral):
+            _, message = self._delayed_messages[hash_]
+            if message.update.origin == origin and message.update.chat_id == chat_id:
+                await self.cancel(message.__class__, origin, chat_id)
+
     async def force_publish(self, message_class: Type[Message], origin: Origin, chat_id: int):
         """
         Немедленно опубликовать отложенное сообщение.
@@ -106,24 +173,57 @@ class MessageBus(CleanupCTX):
         :param chat_id: - необходимо для идентификации событий и команд.
         """
         hash_ = self._hash(message_class, origin, chat_id)
+        if self._timers is not None and hash_ not in self._ephemeral:
+            async with self.app.store.db() as uow:
+                delayed_message = await uow.delayed_messages.pop(message_class.__name__, origin, chat_id)
+                await uow.commit()
+            if delayed_message is not None:
+                self.publish(Message.from_model(delayed_message))
+            return
+
         if hash_ in self._delayed_messages:
             _, message = self._delayed_messages[hash_]
             await self.cancel(message_class, origin, chat_id)
             self.publish(message)
 
-    async def _postpone(self, message: Message, origin: Origin, chat_id: int, delay: int):
+    async def _postpone(
+            self,
+            message: Message,
+            origin: Origin,
+            chat_id: int,
+            delay: int,
+            durability: Durability = Durability.PERSISTED
+    ):
         async def _postpone_task():
             await asyncio.sleep(delay)
 
+            # Сработавший таймер больше не отменяется и не публикуется через force_publish.
+            if self._delayed_messages.get(hash_, (None,))[0] is task:
+                del self._delayed_messages[hash_]
+                self._ephemeral.discard(hash_)
+
+            if not self.app.store.partitions.owns(origin, chat_id):
+                # Владение разделом истекло: строку восстановит владелец (или этот экземпляр,
+                # когда подтвердит владение).
+                return
+
             self.app.bus.publish(message)
 
+            if durability == Durability.EPHEMERAL:
+                return
+
             async with self.app.store.db() as uow:
-                await uow.delayed_messages.delete(message.name, origin, chat_id)
+                await uow.lean.delete_delayed_message(message.name, origin, chat_id)
                 await uow.commit()
 
+        hash_ = self._hash(message.__class__, origin, chat_id)
         task = asyncio.create_task(_postpone_task())
         task.add_done_callback(self._done_callback)
-        self._delayed_messages[self._hash(message.__class__, origin, chat_id)] = (task, message)
+        self._delayed_messages[hash_] = (task, message)
+        if durability == Durability.EPHEMERAL:
+            self._ephemeral.add(hash_)
+        else:
+            self._ephemeral.discard(hash_)
 
     @staticmethod
     def _hash(message_type: Type[Message], origin: Origin, chat_id: int):
@@ -134,6 +234,8 @@ class MessageBus(CleanupCTX):
             match future.exception():
                 case CancelledError():
                     pass
+                case LeaseLost() as e:
+                    self.logger.warning(f"handler changes discarded: {e}")
                 case BaseException() as e:
                     self.logger.exception('running failed', exc_info=e)
         except CancelledError:
@@ -146,15 +248,33 @@ class MessageBus(CleanupCTX):
                 chat_id=chat_id,
                 name=message.name,
                 data=bytes(message),
-                delay=delay
+                delay=delay,
+                due_at=datetime.now(tz=timezone.utc) + timedelta(seconds=delay)
             )
             uow.delayed_messages.add(delayed_message)
             await uow.commit()
 
-    async def _restore(self):
+    async def _restore(self, partitions: frozenset[int] | None = None):
+        """
+        Запускает сохранённые отложенные сообщения чатов экземпляра.
+        :param partitions: только чаты этих разделов (по умолчанию - всех разделов экземпляра).
+        """
         self.logger.info("restoring delayed messages...")
         async with self.app.store.db() as uow:
-            delayed_messages = await uow.delayed_messages.list()
+            delayed_messages = await uow.delayed_messages.list(
+                where=self.app.store.partitions.filter(DelayedMessage.origin, DelayedMessage.chat_id, partitions)
+            )
             for dm in delayed_messages:
                 await self._postpone(Message.from_model(dm), dm.origin, dm.chat_id, delay=dm.seconds_remaining)
             await uow.commit()
+
+    async def _forget(self, partitions: frozenset[int]):
+        """
+        Останавливает таймеры чатов, которые перешли к другому экземпляру. Строки в базе остаются:
+        их восстановит новый владелец.
+        """
+        for hash_, (task, message) in list(self._delayed_messages.items()):
+            if self.app.store.partitions.partition(message.update.origin, message.update.chat_id) in partitions:
+                task.cancel()
+                del self._delayed_messages[hash_]
+                self._ephemeral.discard(hash_)
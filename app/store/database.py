@@ -1,3 +1,4 @@
+import asyncio
 from typing import Optional
 
 from sqlalchemy.exc import IntegrityError
@@ -5,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engin
 
 from app.abc.cleanup_ctx import CleanupCTX
 from app.admin.models import Admin
+from app.store.pool import MeteredPool
 from app.store.unit_of_work import UnitOfWork
 
 
@@ -13,11 +15,25 @@ class Database(CleanupCTX):
         super().__init__(*args, **kwargs)
         self.engine: Optional[AsyncEngine] = None
         self.session_factory: Optional[async_sessionmaker[AsyncSession]] = None
+        # в outbox зафиксированы новые сообщения: будит OutboxSender, не дожидаясь опроса.
+        self.outbox_ready = asyncio.Event()
 
     async def on_startup(self) -> None:
+        config = self.app.config.database
         self.engine = create_async_engine(
-            self.app.config.database.dsn,
-            echo=self.app.config.settings.debug
+            config.dsn,
+            echo=self.app.config.settings.debug,
+            **({} if config.engine == "sqlite" else dict(
+                poolclass=MeteredPool,
+                pool_size=config.pool_size,
+                max_overflow=config.max_overflow,
+                pool_timeout=config.pool_timeout,
+                pool_recycle=config.pool_recycle,
+                pool_pre_ping=config.pool_pre_ping
+            )),
+            **({} if config.driver != "asyncpg" else dict(
+                connect_args={"prepared_statement_cache_size": config.statement_cache_size}
+            ))
         )
         self.session_factory = async_sessionmaker(
             self.engine,
@@ -29,8 +45,16 @@ class Database(CleanupCTX):
     async def on_shutdown(self) -> None:
         await self.engine.dispose(close=True)
 
+    def pool_stats(self) -> dict | None:
+        """
+        Состояние пула соединений (None, если пул не считает статистику).
+        """
+        if self.engine is None or not isinstance(pool := self.engine.pool, MeteredPool):
+            return None
+        return pool.snapshot()
+
     def __call__(self) -> UnitOfWork:
-        return UnitOfWork(self.session_factory())
+        return UnitOfWork(self.session_factory(), self.outbox_ready.set)
 
     async def create_admin(self):
         try:
@@ -0,0 +1,43 @@
+import asyncio
+
+from app.abc.cleanup_ctx import CleanupCTX
+from app.game.enums import GameState
+from app.utils.metrics import GAMES, TIMERS
+
+
+class StateGauges(CleanupCTX):
+    """
+    Периодически обновляет показатели, которые считаются запросами к базе (игры по состояниям,
+    таймеры в таблице): сбор метрик отдаёт готовые значения и не нагружает базу.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._interval = 15  # seconds
+        self._task: asyncio.Task | None = None
+
+    async def on_startup(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def on_shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.wait([self._task])
+
+    async def _run(self):
+        while True:
+            try:
+                await self._refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning("refreshing gauges failed", exc_info=e)
+            await asyncio.sleep(self._interval)
+
+    async def _refresh(self):
+        async with self.app.store.db() as uow:
+            games = await uow.lean.games_by_state()
+            delayed_messages = await uow.lean.count_delayed_messages()
+        for state in GameState:
+            GAMES.labels(state).set(games.get(state, 0))
+        TIMERS.labels("database").set(delayed_messages)
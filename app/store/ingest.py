@@ -0,0 +1,86 @@
+"""
+Обработка загружаемых медиа: определение типа по содержимому и оптимизация картинок.
+Функции оптимизации выполняются в пуле процессов, поэтому должны быть определены на уровне модуля.
+"""
+import os
+
+from PIL import Image, ImageOps
+
+HEAD_SIZE = 16
+
+_SIGNATURES = (
+    (0, b'\xff\xd8\xff', 'image/jpeg', 'jpeg'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png', 'png'),
+    (0, b'GIF87a', 'image/gif', 'gif'),
+    (0, b'GIF89a', 'image/gif', 'gif'),
+    (8, b'WEBP', 'image/webp', 'webp'),
+    (8, b'WAVE', 'audio/wav', 'wav'),
+    (0, b'OggS', 'audio/ogg', 'ogg'),
+    (0, b'fLaC', 'audio/flac', 'flac'),
+    (0, b'ID3', 'audio/mpeg', 'mp3'),
+    (0, b'\xff\xfb', 'audio/mpeg', 'mp3'),
+    (0, b'\xff\xf3', 'audio/mpeg', 'mp3'),
+    (0, b'\xff\xf2', 'audio/mpeg', 'mp3'),
+    (8, b'M4A ', 'audio/mp4', 'm4a'),
+    (8, b'qt  ', 'video/quicktime', 'mov'),
+    (4, b'ftyp', 'video/mp4', 'mp4'),
+    (0, b'\x1a\x45\xdf\xa3', 'video/webm', 'webm'),
+)
+
+# Основные бренды ftyp картинок HEIF/AVIF: тот же контейнер ISO BMFF, что у mp4, но не видео.
+_IMAGE_BRANDS = {b'heic', b'heix', b'hevc', b'hevx', b'heim', b'heis', b'mif1', b'msf1', b'avif', b'avis'}
+
+_OPTIMIZABLE = {'image/jpeg', 'image/png', 'image/webp'}
+
+
+def sniff(head: bytes) -> tuple[str, str] | None:
+    """
+    Определяет тип медиа по первым байтам файла, не доверяя заголовку Content-Type.
+    :param head: первые HEAD_SIZE байт файла.
+    :return: content-type и расширение или None, если тип не поддерживается.
+    """
+    for offset, signature, content_type, ext in _SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            if signature == b'ftyp' and head[8:12] in _IMAGE_BRANDS:
+                # Мессенджеры не показывают HEIC/AVIF ни как фото, ни как видео.
+                return None
+            return content_type, ext
+    return None
+
+
+def is_optimizable(content_type: str) -> bool:
+    return content_type in _OPTIMIZABLE
+
+
+def optimize_image(src: str, dst: str, max_side: int, quality: int) -> bool:
+    """
+    Уменьшает и пережимает картинку в JPEG под ограничения мессенджеров.
+    Поворот из EXIF применяется к пикселям: в JPEG без EXIF фото с телефона иначе легло бы на бок.
+    Анимированные картинки не трогаются - в JPEG остался бы только первый кадр.
+    Прозрачные пиксели ложатся на белый фон: в JPEG нет альфа-канала, и без фона они стали бы чёрными.
+    :param src: путь к оригиналу.
+    :param dst: путь к оптимизированному варианту.
+    :param max_side: максимальный размер большей стороны в пикселях.
+    :param quality: качество JPEG.
+    :return: True, если вариант сохранён (он меньше оригинала).
+    """
+    tmp = f"{dst}.part"
+    with Image.open(src) as image:
+        if getattr(image, 'is_animated', False):
+            return False
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((max_side, max_side))
+        if image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info:
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.save(tmp, format='JPEG', quality=quality, optimize=True, progressive=True)
+
+    if os.path.getsize(tmp) >= os.path.getsize(src):
+        os.remove(tmp)
+        return False
+    os.replace(tmp, dst)
+    return True
@@ -0,0 +1,121 @@
+"""
+Облегчённые запросы для горячих путей игры.
+Выражения Core собираются один раз при импорте модуля, поэтому SQLAlchemy берёт
+скомпилированный SQL из кэша, а asyncpg - подготовленный запрос из кэша соединения.
+Результат - строки (Row) с доступом по именам колонок, без identity map и сборки
+ORM-объектов со связями. Изменять игру по-прежнему нужно через ORM-репозитории.
+"""
+from sqlalchemy import select, delete, bindparam, Row, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.bot.enums import Origin
+from app.game.enums import GameState
+from app.game.models import Game, Player, Question, DelayedMessage, game_themes
+
+_games = Game.__table__
+_players = Player.__table__
+_questions = Question.__table__
+_delayed_messages = DelayedMessage.__table__
+
+_GAME = select(_games).where(
+    _games.c.origin == bindparam("origin"),
+    _games.c.chat_id == bindparam("chat_id")
+)
+
+_CURRENT_QUESTION = select(
+    _games.c.id.label("game_id"),
+    _games.c.state,
+    _games.c.leading_user_id,
+    _questions
+).join_from(_games, _questions, _games.c.current_question_id == _questions.c.id).where(
+    _games.c.origin == bindparam("origin"),
+    _games.c.chat_id == bindparam("chat_id")
+)
+
+_GAME_BOT = select(_games.c.bot_id).where(
+    _games.c.origin == bindparam("origin"),
+    _games.c.chat_id == bindparam("chat_id")
+)
+
+_PLAYER = select(_players).where(
+    _players.c.origin == bindparam("origin"),
+    _players.c.chat_id == bindparam("chat_id"),
+    _players.c.user_id == bindparam("user_id")
+)
+
+_DELETE_GAME_THEMES = delete(game_themes).where(
+    game_themes.c.game_id.in_(select(_games.c.id).where(
+        _games.c.origin == bindparam("origin"),
+        _games.c.chat_id == bindparam("chat_id")
+    ))
+)
+
+_DELETE_GAME = delete(_games).where(
+    _games.c.origin == bindparam("origin"),
+    _games.c.chat_id == bindparam("chat_id")
+)
+
+_DELETE_DELAYED_MESSAGE = delete(_delayed_messages).where(
+    _delayed_messages.c.origin == bindparam("origin"),
+    _delayed_messages.c.chat_id == bindparam("chat_id"),
+    _delayed_messages.c.name == bindparam("name")
+)
+
+_GAMES_BY_STATE = select(_games.c.state, func.count()).group_by(_games.c.state)
+
+_COUNT_DELAYED_MESSAGES = select(func.count()).select_from(_delayed_messages)
+
+
+class LeanRepository:
+    """
+    Чтение и удаление строк игры без ORM.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def game(self, origin: Origin, chat_id: int) -> Row | None:
+        """
+        Колонки игры без игроков, тем и вопроса.
+        """
+        return (await self.session.execute(_GAME, {"origin": origin, "chat_id": chat_id})).first()
+
+    async def current_question(self, origin: Origin, chat_id: int) -> Row | None:
+        """
+        Текущий вопрос игры вместе с состоянием игры и ведущим (game_id, state, leading_user_id).
+        :return: None, если игры нет или вопрос не выбран.
+        """
+        return (await self.session.execute(_CURRENT_QUESTION, {"origin": origin, "chat_id": chat_id})).first()
+
+    async def game_bot(self, origin: Origin, chat_id: int) -> int | None:
+        """
+        Бот, за которым закреплена игра чата (None, если игры нет).
+        """
+        return await self.session.scalar(_GAME_BOT, {"origin": origin, "chat_id": chat_id})
+
+    async def player(self, origin: Origin, chat_id: int, user_id: int) -> Row | None:
+        return (await self.session.execute(
+            _PLAYER, {"origin": origin, "chat_id": chat_id, "user_id": user_id}
+        )).first()
+
+    async def delete_game(self, origin: Origin, chat_id: int) -> int:
+        """
+        Удаляет игру вместе с её темами (game_themes), игроки удаляются каскадом в БД.
+        """
+        params = {"origin": origin, "chat_id": chat_id}
+        await self.session.execute(_DELETE_GAME_THEMES, params)
+        return (await self.session.execute(_DELETE_GAME, params)).rowcount
+
+    async def delete_delayed_message(self, name: str, origin: Origin, chat_id: int) -> int:
+        return (await self.session.execute(
+            _DELETE_DELAYED_MESSAGE, {"name": name, "origin": origin, "chat_id": chat_id}
+        )).rowcount
+
+    async def games_by_state(self) -> dict[GameState, int]:
+        """
+        Количество игр в каждом состоянии.
+        """
+        return {state: count for state, count in await self.session.execute(_GAMES_BY_STATE)}
+
+    async def count_delayed_messages(self) -> int:
+        return await self.session.scalar(_COUNT_DELAYED_MESSAGES)
@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, BinaryIO
+from uuid import uuid4
+
+from aiohttp import BodyPartReader
+
+from app.abc.cleanup_ctx import CleanupCTX
+from app.store import ingest
+from app.utils.limiter import Limiter
+
+
+class MediaTooLarge(Exception):
+    pass
+
+
+class UnsupportedMedia(Exception):
+    pass
+
+
+@dataclass(slots=True)
+class StagedMedia:
+    """
+    Загруженный файл, ещё не опубликованный под своим именем.
+    """
+    name: str
+    content_type: str
+    tmp_path: str
+
+
+class MediaStorage(CleanupCTX):
+    """
+    Контентно-адресуемое хранилище медиа вопросов.
+    Файлы называются по SHA-256 содержимого, поэтому одинаковые загрузки хранятся один раз.
+    Файл удаляется, когда на него не ссылается ни один вопрос (Question.filename).
+    Загрузка публикуется под своим именем до фиксации ссылки на неё, чтобы зафиксированная ссылка
+    не вела в никуда, а публикация с фиксацией и проверка ссылок с удалением одного имени взаимно
+    исключают друг друга: иначе параллельный release мог бы удалить файл, на который вот-вот сошлётся вопрос.
+    Все операции с диском выполняются в пуле потоков, чтобы не блокировать цикл событий.
+    Если включена предобработка, рядом с картинкой в пуле процессов сохраняется её
+    уменьшенный вариант, который и отправляется в мессенджеры.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._dir = self.app.config.settings.media_dir
+        self._max_size = self.app.config.media.max_size
+        self._chunk_size = self.app.config.media.chunk_size
+        # seconds: более свежие файлы сборка не трогает - это могут быть загрузки других экземпляров,
+        # ещё не дописанные или опубликованные до фиксации ссылки.
+        self._collect_grace = 3600
+        self._executor: ThreadPoolExecutor | None = None
+        self._processes: ProcessPoolExecutor | None = None
+        self._names = Limiter(lambda: asyncio.Lock(), capacity=1000)  # блокировки имён файлов
+
+    async def on_startup(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.app.config.media.workers,
+            thread_name_prefix="media"
+        )
+        if self.app.config.media.preprocess:
+            self._processes = ProcessPoolExecutor(max_workers=self.app.config.media.processes)
+        try:
+            await self.collect()
+        except Exception as e:
+            self.logger.error("media garbage collection failed", exc_info=e)
+
+    async def on_shutdown(self):
+        if self._processes is not None:
+            self._processes.shutdown(wait=True)
+        self._executor.shutdown(wait=True)
+
+    def path(self, name: str) -> str:
+        return f"{self._dir}/{name}"
+
+    async def save(self, field: BodyPartReader) -> StagedMedia:
+        """
+        Потоково записывает часть multipart-запроса во временный файл, попутно считая хэш содержимого.
+        Тип медиа определяется по первым байтам файла, а не по заголовку Content-Type.
+        Ссылка на файл фиксируется внутри publishing, если до этого дело не дошло - загрузку нужно выбросить (discard).
+        :param field: часть multipart-запроса.
+        :return: загрузка с именем файла в хранилище и его content-type.
+        """
+        tmp_path = self.path(f".{uuid4().hex}.part")
+        file = await self._run(open, tmp_path, 'wb')
+        digest = hashlib.sha256()
+        head = b''
+        size = 0
+        try:
+            while chunk := await field.read_chunk(self._chunk_size):
+                size += len(chunk)
+                if size > self._max_size:
+                    raise MediaTooLarge(f"file is larger than {self._max_size} bytes")
+                if len(head) < ingest.HEAD_SIZE:
+                    head += chunk[:ingest.HEAD_SIZE - len(head)]
+                await self._run(self._write, file, digest, chunk)
+            if (media_type := ingest.sniff(head)) is None:
+                raise UnsupportedMedia("unsupported media type")
+            content_type, ext = media_type
+            await self._run(self._close, file)
+        except BaseException:
+            await self._run(self._discard, file, tmp_path)
+            raise
+        return StagedMedia(f"{digest.hexdigest()}.{ext}", content_type, tmp_path)
+
+    @asynccontextmanager
+    async def publishing(self, staged: StagedMedia) -> AsyncIterator[None]:
+        """
+        Атомарно переименовывает загрузку в её имя в хранилище; в блоке фиксируется ссылка на файл.
+        Пока блок выполняется, release того же имени ждёт. Если блок завершился ошибкой,
+        файл удаляется, если на него так и не сослался ни один вопрос.
+        """
+        async with self._names[staged.name]:
+            await self._run(os.replace, staged.tmp_path, self.path(staged.name))
+            try:
+                yield
+            except BaseException:
+                await self._release(staged.name)
+                raise
+        await self._optimize(staged.name, staged.content_type)
+
+    async def discard(self, staged: StagedMedia):
+        """
+        Удаляет загрузку, ссылку на которую зафиксировать не удалось.
+        """
+        await self.remove(os.path.basename(staged.tmp_path), missing_ok=True)
+
+    async def best_path(self, name: str) -> str:
+        """
+        Путь к файлу, который лучше всего отправлять в мессенджер:
+        оптимизированный вариант, если он есть, иначе оригинал.
+        :param name: имя оригинала в хранилище.
+        """
+        variant_path = self.path(self.variant(name))
+        if await self._run(os.path.exists, variant_path):
+            return variant_path
+        return self.path(name)
+
+    @staticmethod
+    def variant(name: str) -> str:
+        stem, _, _ = name.partition('.')
+        return f"{stem}.opt.jpeg"
+
+    async def release(self, *names: str | None):
+        """
+        Удаляет файлы, на которые больше не ссылается ни один вопрос.
+        Вызывается после коммита изменений Question.filename, когда транзакция уже закрыта.
+        :param names: имена файлов, ссылки на которые были удалены.
+        """
+        for name in {n for n in names if n}:
+            async with self._names[name]:
+                await self._release(name)
+
+    async def collect(self):
+        """
+        Удаляет из хранилища файлы без ссылок и недописанные временные файлы, которые не менялись
+        дольше _collect_grace. Вызывается при запуске, до приёма загрузок.
+        """
+        modified_before = time.time() - self._collect_grace
+        async with self.app.store.db() as uow:
+            referenced = await uow.questions.filenames()
+        referenced |= {self.variant(name) for name in referenced}
+        for name in await self._run(self._files, self._dir, modified_before):
+            if name not in referenced:
+                self.logger.info(f"removing unreferenced media file {name}")
+                await self.remove(name)
+
+    async def remove(self, name: str, *, missing_ok: bool = False):
+        try:
+            await self._run(os.remove, self.path(name))
+        except FileNotFoundError:
+            if not missing_ok:
+                self.logger.warning(f"media file {name} is already removed")
+
+    @asynccontextmanager
+    async def open(self, path: str) -> AsyncIterator[BinaryIO]:
+        """
+        Открывает файл для потоковой отправки.
+        aiohttp читает переданный файл кусками в пуле потоков, поэтому здесь
+        достаточно не блокировать цикл событий на открытии и закрытии.
+        :param path: путь к файлу.
+        """
+        file = await self._run(open, path, 'rb')
+        try:
+            yield file
+        finally:
+            await self._run(file.close)
+
+    async def warm(self, path: str):
+        """
+        Подгружает файл в page cache, чтобы последующая отправка не ждала диск.
+        :param path: путь к файлу.
+        """
+        await self._run(self._warm, path)
+
+    async def _release(self, name: str):
+        # Вызывается под блокировкой имени.
+        async with self.app.store.db() as uow:
+            if await uow.questions.count(name):
+                return
+        await self.remove(name)
+        await self.remove(self.variant(name), missing_ok=True)
+
+    async def _optimize(self, name: str, content_type: str):
+        if self._processes is None or not ingest.is_optimizable(content_type):
+            return
+        variant_path = self.path(self.variant(name))
+        if await self._run(os.path.exists, variant_path):
+            return
+        try:
+            await asyncio.get_running_loop().run_in_executor(
+                self._processes,
+                ingest.optimize_image,
+                self.path(name),
+                variant_path,
+                self.app.config.media.max_image_side,
+                self.app.config.media.image_quality
+            )
+        except Exception as e:
+            self.logger.error(f"optimizing {name} failed", exc_info=e)
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    @staticmethod
+    def _files(directory: str, modified_before: float) -> list[str]:
+        return [
+            entry.name for entry in os.scandir(directory)
+            if entry.is_file() and entry.stat().st_mtime < modified_before
+        ]
+
+    def _warm(self, path: str):
+        with open(path, 'rb') as file:
+            if hasattr(os, 'posix_fadvise'):
+                os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+            else:
+                while file.read(self._chunk_size):
+                    pass
+
+    @staticmethod
+    def _write(file: BinaryIO, digest, chunk: bytes):
+        digest.update(chunk)
+        file.write(chunk)
+
+    @staticmethod
+    def _close(file: BinaryIO):
+        file.flush()
+        os.fsync(file.fileno())
+        file.close()
+
+    @staticmethod
+    def _discard(file: BinaryIO, path: str):
+        file.close()
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
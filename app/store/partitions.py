@@ -0,0 +1,302 @@
+import asyncio
+import time
+from math import ceil
+from typing import Callable, Awaitable, Any
+
+from sqlalchemy import ColumnElement, func, true, false, text, case
+
+from app.abc.cleanup_ctx import CleanupCTX
+from app.bot.enums import Origin
+from app.bot.updates import BotUpdate
+from app.game.models import ForwardedUpdate
+
+Listener = Callable[[frozenset[int]], Awaitable[Any]]
+
+# Сдвиг раздела для каждой платформы: одинаковые chat_id разных платформ - разные чаты.
+_ORIGIN_SHIFT = {origin: i for i, origin in enumerate(Origin)}
+
+
+class Partitions(CleanupCTX):
+    """
+    Разделение чатов между экземплярами приложения, работающими с одной базой.
+    Чат (origin, chat_id) относится к разделу (abs(chat_id) + сдвиг платформы) % partitions, разделом
+    владеет экземпляр, который держит сессионную advisory-блокировку Postgres с его номером.
+    Блокировки держит отдельное соединение: если экземпляр падает, Postgres снимает их вместе с сессией,
+    и разделы забирают оставшиеся экземпляры на следующем пульсе. Разделы делятся поровну между
+    экземплярами, которые держат общую блокировку участника, об изменениях экземпляры сообщают
+    друг другу через LISTEN/NOTIFY.
+    Экземпляр опрашивает таблицы, восстанавливает таймеры и обрабатывает обновления только своих чатов,
+    обновления чужих чатов пересылаются владельцу через таблицу forwarded_updates.
+    Владение ограничено по времени: без успешного пульса в течение нескольких интервалов, а также
+    сразу после обрыва соединения блокировок экземпляр считает, что разделов у него нет: таймеры
+    его чатов не срабатывают, а обработчики не фиксируют изменения (см. UnitOfWork.commit).
+    Без настройки cluster.partitions (и не на asyncpg) экземпляр владеет всеми чатами.
+    """
+    _LEASES = 0x4F47  # первый ключ блокировок разделов, второй - номер раздела
+    _MEMBERS = 0x4F48  # общая блокировка участника (второй ключ - 0)
+    _REBALANCE = "partitions_rebalance"
+    _UPDATES = "partitions_updates"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.count = 0  # 0 - разделение выключено
+        self.owned: frozenset[int] = frozenset()
+        self._heartbeat = 5  # seconds
+        self._valid_for = 3  # пульсов, в течение которых владение действительно без подтверждения
+        self._valid_until = 0.0  # time.monotonic()
+        self._forward_window = 0.02  # seconds
+        self._connection = None
+        self._wakeup = asyncio.Event()
+        self._inbox = asyncio.Event()
+        self._task: asyncio.Task | None = None
+        self._receiver: asyncio.Task | None = None
+        self._outgoing: list[ForwardedUpdate] = []
+        self._flushes: set[asyncio.Task] = set()
+        self._on_acquired: list[Listener] = []
+        self._on_released: list[Listener] = []
+
+    async def on_startup(self):
+        config = self.app.config.cluster
+        if config.partitions <= 0:
+            return
+        if self.app.config.database.driver != "asyncpg":
+            self.logger.warning("partitioning requires asyncpg, serving all chats")
+            return
+        self.count = config.partitions
+        self._heartbeat = config.heartbeat
+        await self._connect()
+        await self._rebalance()
+        self._task = asyncio.create_task(self._run())
+        self._receiver = asyncio.create_task(self._receive())
+
+    async def on_shutdown(self):
+        for task in (self._task, self._receiver):
+            if task is not None:
+                task.cancel()
+                await asyncio.wait([task])
+        if self._flushes:
+            await asyncio.wait(self._flushes, timeout=3)
+        if self._connection is not None:
+            # Закрытие сессии снимает все блокировки экземпляра.
+            await self._connection.close()
+            self._connection = None
+            self.owned = frozenset()
+            await self._notify(self._REBALANCE)
+
+    @property
+    def enabled(self) -> bool:
+        return self.count > 0
+
+    @property
+    def held(self) -> frozenset[int]:
+        """
+        Разделы, владение которыми подтверждено недавним пульсом.
+        """
+        return self.owned if time.monotonic() < self._valid_until else frozenset()
+
+    @property
+    def leader(self) -> bool:
+        """
+        Экземпляр владеет разделом 0 и опрашивает платформы: long polling бота возможен только в одном месте.
+        """
+        return not self.enabled or 0 in self.held
+
+    def partition(self, origin: Origin, chat_id: int) -> int:
+        return (abs(chat_id) + _ORIGIN_SHIFT[origin]) % self.count
+
+    def owns(self, origin: Origin, chat_id: int) -> bool:
+        return not self.enabled or self.partition(origin, chat_id) in self.held
+
+    def filter(
+            self,
+            origin: ColumnElement,
+            chat_id: ColumnElement,
+            partitions: frozenset[int] | None = None
+    ) -> ColumnElement[bool]:
+        """
+        Условие запроса: строка относится к чату из разделов экземпляра.
+        :param origin: колонка origin таблицы.
+        :param chat_id: колонка chat_id таблицы.
+        :param partitions: разделы (по умолчанию - все разделы экземпляра).
+        """
+        if not self.enabled:
+            return true()
+        if not (partitions := self.held if partitions is None else partitions):
+            return false()
+        shift = case(*((origin == o, i) for o, i in _ORIGIN_SHIFT.items()))
+        return ((func.abs(chat_id) + shift) % self.count).in_(partitions)
+
+    def subscribe(self, *, acquired: Listener | None = None, released: Listener | None = None):
+        """
+        Подписка на смену разделов экземпляра.
+        :param acquired: вызывается с разделами, которые перешли к экземпляру.
+        :param released: вызывается с разделами, которые экземпляр потерял.
+        """
+        if acquired is not None:
+            self._on_acquired.append(acquired)
+        if released is not None:
+            self._on_released.append(released)
+
+    async def forward(self, update: BotUpdate):
+        """
+        Передаёт обновление чужого чата его владельцу. Обновления, пересланные в коротком окне,
+        записываются одной транзакцией вместе с уведомлением владельцам.
+        """
+        self._outgoing.append(ForwardedUpdate(
+            partition=self.partition(update.origin, update.chat_id),
+            data=bytes(update)
+        ))
+        if len(self._outgoing) == 1:
+            task = asyncio.create_task(self._flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+
+    async def _flush(self):
+        await asyncio.sleep(self._forward_window)
+        outgoing, self._outgoing = self._outgoing, []
+        try:
+            async with self.app.store.db() as uow:
+                for forwarded_update in outgoing:
+                    uow.forwarded_updates.add(forwarded_update)
+                # Уведомление уходит при фиксации, вместе со строками.
+                await uow.session.execute(text("SELECT pg_notify(:channel, '')"), {"channel": self._UPDATES})
+                await uow.commit()
+        except Exception as e:
+            self.logger.warning(f"forwarding {len(outgoing)} updates failed", exc_info=e)
+
+    async def _receive(self):
+        """
+        Забирает обновления, пересланные в разделы экземпляра: по уведомлению или раз в пульс.
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self._inbox.wait(), self._heartbeat)
+            except asyncio.TimeoutError:
+                pass
+            self._inbox.clear()
+            if not (held := self.held):
+                continue
+            try:
+                async with self.app.store.db() as uow:
+                    updates = await uow.forwarded_updates.take(held)
+                    await uow.commit()
+                for raw in updates:
+                    # Если раздел успел перейти к другому экземпляру, put перешлёт обновление дальше.
+                    await self.app.bot.pipeline.put(BotUpdate.from_bytes(raw))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning("receiving forwarded updates failed", exc_info=e)
+
+    async def _connect(self):
+        import asyncpg
+
+        config = self.app.config.database
+        self._connection = await asyncpg.connect(
+            user=config.user,
+            password=config.password,
+            database=config.database,
+            host=config.host,
+            port=config.port
+        )
+        self._connection.add_termination_listener(self._on_terminated)
+        await self._connection.execute("SELECT pg_advisory_lock_shared($1, 0)", self._MEMBERS)
+        await self._connection.add_listener(self._REBALANCE, self._on_rebalance)
+        await self._connection.add_listener(self._UPDATES, self._on_update)
+        await self._notify(self._REBALANCE)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._heartbeat)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                if self._connection is None or self._connection.is_closed():
+                    # Блокировки потеряны вместе с сессией.
+                    await self._apply(frozenset())
+                    await self._connect()
+                await asyncio.wait_for(self._rebalance(), self._heartbeat)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.warning("partitions heartbeat failed", exc_info=e)
+                self._valid_until = 0
+                if self._connection is not None and not self._connection.is_closed():
+                    self._connection.terminate()
+                self._connection = None
+                await self._apply(frozenset())
+
+    async def _rebalance(self):
+        # Блокировки, которые сессия действительно держит: владение сверяется с Postgres на каждом пульсе.
+        owned = set(await self._connection.fetchval(
+            "SELECT coalesce(array_agg(objid), '{}') FROM pg_locks "
+            "WHERE locktype = 'advisory' AND granted AND pid = pg_backend_pid() AND classid = $1 AND objsubid = 2",
+            self._LEASES
+        )) & set(self.owned)
+        members = await self._connection.fetchval(
+            "SELECT count(*) FROM pg_locks "
+            "WHERE locktype = 'advisory' AND granted AND classid = $1 AND objid = 0 AND objsubid = 2",
+            self._MEMBERS
+        )
+        share = ceil(self.count / max(members, 1))
+
+        # Лишние разделы отдаются с конца: раздел 0 (опрос платформ) меняет владельца реже остальных.
+        for partition in sorted(owned, reverse=True)[:max(len(owned) - share, 0)]:
+            await self._connection.fetchval("SELECT pg_advisory_unlock($1, $2)", self._LEASES, partition)
+            owned.discard(partition)
+
+        for partition in range(self.count):
+            if len(owned) >= share:
+                break
+            if partition not in owned and await self._connection.fetchval(
+                    "SELECT pg_try_advisory_lock($1, $2)", self._LEASES, partition
+            ):
+                owned.add(partition)
+
+        if self.owned and time.monotonic() >= self._valid_until:
+            # Владение истекало: за это время таймеры разделов не срабатывали, а обработчики
+            # не фиксировали изменения. Разделы отдаются и забираются заново, подписчики восстанавливают их.
+            await self._apply(frozenset())
+        self._valid_until = time.monotonic() + self._heartbeat * self._valid_for
+        if await self._apply(frozenset(owned)):
+            await self._connection.execute("SELECT pg_notify($1, '')", self._REBALANCE)
+
+    async def _apply(self, owned: frozenset[int]) -> bool:
+        """
+        Запоминает разделы экземпляра и сообщает подписчикам об изменениях.
+        :return: разделы изменились.
+        """
+        acquired, released = owned - self.owned, self.owned - owned
+        if not acquired and not released:
+            return False
+        self.owned = owned
+        self.logger.info(f"partitions: {sorted(owned)} (+{sorted(acquired)}, -{sorted(released)})")
+        for listener in self._on_released if released else ():
+            await listener(released)
+        for listener in self._on_acquired if acquired else ():
+            await listener(acquired)
+        if acquired:
+            # В разделах могли остаться обновления, пересланные прежнему владельцу.
+            self._inbox.set()
+        return True
+
+    async def _notify(self, channel: str):
+        # Через пул: соединение блокировок занято пульсом.
+        async with self.app.store.db() as uow:
+            await uow.session.execute(text("SELECT pg_notify(:channel, '')"), {"channel": channel})
+            await uow.commit()
+
+    def _on_terminated(self, connection):
+        # Блокировки сняты вместе с сессией: экземпляр перестаёт действовать от имени разделов сразу,
+        # не дожидаясь пульса.
+        self._valid_until = 0
+        self._wakeup.set()
+
+    def _on_rebalance(self, connection, pid: int, channel: str, payload: str):
+        if pid != connection.get_server_pid():
+            self._wakeup.set()
+
+    def _on_update(self, connection, pid: int, channel: str, payload: str):
+        self._inbox.set()
@@ -0,0 +1,74 @@
+import time
+from dataclasses import dataclass
+
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+@dataclass(slots=True)
+class PoolStats:
+    """
+    Счётчики пула соединений с момента запуска.
+    """
+    checkouts: int = 0
+    timeouts: int = 0
+    waits: int = 0  # выдач, которые заметно ждали соединение
+    wait_total: float = 0  # seconds
+    wait_max: float = 0  # seconds
+    overflow_peak: int = 0
+
+    def observe(self, wait: float, overflow: int, *, slow: bool):
+        self.checkouts += 1
+        self.wait_total += wait
+        self.wait_max = max(self.wait_max, wait)
+        self.overflow_peak = max(self.overflow_peak, overflow)
+        if slow:
+            self.waits += 1
+
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    """
+    Пул соединений, который считает выдачи соединений, время их ожидания,
+    таймауты и использование соединений сверх pool_size.
+    Ожидание измеряется на всю выдачу: очередь за свободным соединением,
+    открытие нового соединения и pre-ping.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+        self._slow_wait = 0.01  # seconds
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except PoolTimeout:
+            self.stats.timeouts += 1
+            raise
+        wait = time.perf_counter() - started
+        self.stats.observe(wait, max(self.overflow(), 0), slow=wait > self._slow_wait)
+        return connection
+
+    def recreate(self) -> "MeteredPool":
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def snapshot(self) -> dict:
+        """
+        Текущее состояние пула и накопленные счётчики.
+        """
+        return {
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": max(self.overflow(), 0),
+            "max_overflow": self._max_overflow,
+            "checkouts": self.stats.checkouts,
+            "waits": self.stats.waits,
+            "timeouts": self.stats.timeouts,
+            "wait_total": round(self.stats.wait_total, 6),
+            "wait_max": round(self.stats.wait_max, 6),
+            "overflow_peak": self.stats.overflow_peak
+        }
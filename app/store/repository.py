@@ -1,11 +1,19 @@
 from abc import ABC, abstractmethod
+from datetime import datetime
+from enum import Enum
+from random import randint
+from typing import Iterable
 
-from sqlalchemy import select, and_, delete
+import orjson
+from sqlalchemy import select, and_, delete, update, func, true, ColumnElement
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload, raiseload, aliased
 
 from app.admin.models import Admin
 from app.bot.enums import Origin
-from app.game.models import Game, Theme, Player, DelayedMessage
+from app.bot.inline import InlineKeyboard
+from app.bot.updates import BotUpdate, BotCallbackQuery
+from app.game.models import Game, Theme, Player, DelayedMessage, Question, OutboxMessage, ForwardedUpdate
 
 
 class AbstractRepository(ABC):
@@ -26,18 +34,46 @@ class AbstractRepository(ABC):
         pass
 
 
+class GameLoad(Enum):
+    """
+    Что загружается вместе с игрой. Незагруженные связи при обращении бросают исключение.
+    """
+    FULL = "full"  # все связи одним запросом (игроки × темы × вопросы).
+    STATE = "state"  # только колонки игры.
+    PLAYERS = "players"  # игроки.
+    QUESTION = "question"  # игроки и текущий вопрос.
+    BOARD = "board"  # игроки, текущий вопрос, темы с вопросами (темы - отдельными запросами).
+
+
+_GAME_LOAD_OPTIONS = {
+    GameLoad.FULL: (),
+    GameLoad.STATE: (raiseload("*"),),
+    GameLoad.PLAYERS: (joinedload(Game.players), raiseload("*")),
+    GameLoad.QUESTION: (joinedload(Game.players), joinedload(Game.current_question), raiseload("*")),
+    GameLoad.BOARD: (
+        joinedload(Game.players),
+        joinedload(Game.current_question),
+        selectinload(Game.themes).selectinload(Theme.questions)
+    ),
+}
+
+
 class GameRepository(AbstractRepository):
 
     def add(self, game: Game):
         self.session.add(game)
 
-    async def get(self, origin: Origin, chat_id: int) -> Game | None:
+    async def get(self, origin: Origin, chat_id: int, load: GameLoad = GameLoad.FULL) -> Game | None:
+        """
+        :param load: какие связи игры нужны обработчику.
+        """
         return (await self.session.execute(
             select(Game).
             where(and_(
                 Game.origin == origin,
                 Game.chat_id == chat_id)
-            )
+            ).
+            options(*_GAME_LOAD_OPTIONS[load])
         )).scalar()
 
     async def list(self) -> list[object]:
@@ -71,6 +107,25 @@ class ThemeRepository(AbstractRepository):
         )).rowcount
 
 
+class QuestionRepository:
+    """
+    Ссылки вопросов на файлы хранилища медиа. Вопросы создаются и меняются через темы.
+    """
+
+    def __init__(self, session: AsyncSession):
+        self.session = session
+
+    async def count(self, filename: str) -> int:
+        return (await self.session.execute(
+            select(func.count(Question.id)).where(Question.filename == filename)
+        )).scalar()
+
+    async def filenames(self) -> set[str]:
+        return set((await self.session.execute(
+            select(Question.filename).where(Question.filename.is_not(None)).distinct()
+        )).scalars())
+
+
 class PlayerRepository(AbstractRepository):
     def add(self, player: Player):
         self.session.add(player)
@@ -86,6 +141,10 @@ class PlayerRepository(AbstractRepository):
         pass
 
 
+def _unclaimed() -> ColumnElement[bool]:
+    return DelayedMessage.claimed_until.is_(None) | (DelayedMessage.claimed_until <= func.now())
+
+
 class DelayedMessageRepository(AbstractRepository):
     def add(self, delayed_message: DelayedMessage):
         self.session.add(delayed_message)
@@ -93,10 +152,66 @@ class DelayedMessageRepository(AbstractRepository):
     async def get(self, origin: Origin, chat_id: int, user_id: int) -> DelayedMessage:
         pass
 
+    async def claim(
+            self,
+            limit: int,
+            claimed_until: datetime,
+            *,
+            where: ColumnElement[bool] | None = None
+    ) -> list[DelayedMessage]:
+        """
+        Забирает наступившие таймеры в аренду: строки блокируются (занятые другими воркерами пропускаются)
+        и помечаются claimed_until. До конца аренды таймеры не выбираются повторно, после неё -
+        выбираются снова, если их не подтвердили через ack.
+        :param claimed_until: конец аренды, он же метка, по которой таймер подтверждается.
+        """
+        delayed_messages = list((await self.session.execute(
+            select(DelayedMessage).
+            where(
+                DelayedMessage.due_at <= func.now(),
+                _unclaimed(),
+                true() if where is None else where
+            ).
+            order_by(DelayedMessage.due_at).
+            limit(limit).
+            with_for_update(skip_locked=True)
+        )).scalars())
+        for dm in delayed_messages:
+            dm.claimed_until = claimed_until
+        return delayed_messages
+
+    async def ack(self, delayed_message_id: int, claimed_until: datetime) -> int:
+        """
+        Удаляет обработанный таймер, если аренда всё ещё своя (не истекла и не перешла к другому воркеру).
+        """
+        return (await self.session.execute(
+            delete(DelayedMessage).where(
+                DelayedMessage.id == delayed_message_id,
+                DelayedMessage.claimed_until == claimed_until
+            )
+        )).rowcount
+
+    async def pop(self, name: str, origin: Origin, chat_id: int) -> DelayedMessage | None:
+        """
+        Удаляет таймер и возвращает его строку. Таймер, который уже обрабатывается воркером, не возвращается.
+        """
+        return (await self.session.execute(
+            delete(DelayedMessage).
+            where(
+                (DelayedMessage.origin == origin) &
+                (DelayedMessage.chat_id == chat_id) &
+                (DelayedMessage.name == name) &
+                _unclaimed()
+            ).
+            returning(DelayedMessage)
+        )).scalars().first()
+
     async def list(
             self,
             origin: Origin | None = None,
-            chat_id: int | None = None
+            chat_id: int | None = None,
+            *,
+            where: ColumnElement[bool] | None = None
     ) -> list[DelayedMessage]:
         if origin and chat_id:
             return list((await self.session.execute(
@@ -104,7 +219,9 @@ class DelayedMessageRepository(AbstractRepository):
                     DelayedMessage.origin == origin and DelayedMessage.chat_id == chat_id
                 )
             )).scalars())
-        return list((await self.session.execute(select(DelayedMessage))).scalars())
+        return list((await self.session.execute(
+            select(DelayedMessage).where(true() if where is None else where)
+        )).scalars())
 
     async def delete(self, name: str, origin: Origin, chat_id: int):
         return await self.session.execute(
@@ -117,6 +234,155 @@ class DelayedMessageRepository(AbstractRepository):
         )
 
 
+class OutboxRepository(AbstractRepository):
+    """
+    Сообщения ботов, которые уйдут только если транзакция зафиксируется.
+    Параметры вызова хранятся в JSON, отправкой занимается OutboxSender.
+    """
+
+    def __init__(self, session: AsyncSession):
+        super().__init__(session)
+        self.pending = 0  # добавлено строк с последней фиксации
+
+    def add(self, message: OutboxMessage):
+        self.session.add(message)
+        self.pending += 1
+
+    def send(self, update: BotUpdate, text: str, inline_keyboard: InlineKeyboard | None = None):
+        """
+        Новое сообщение в чат обновления. Id отправленного сообщения обработчику недоступен.
+        random_id записывается вместе со строкой: повтор отправки передаёт тот же ключ,
+        и платформа, которая его поддерживает (ВК), не создаёт второе сообщение.
+        """
+        self._put(update, "send", {
+            "text": text,
+            "inline_keyboard": inline_keyboard.signature() if inline_keyboard else None,
+            "random_id": randint(-2 ** 31, 2 ** 31 - 1)
+        })
+
+    def edit(
+            self,
+            update: BotUpdate,
+            text: str,
+            /, *,
+            inline_keyboard: InlineKeyboard | None = None,
+            message_id: int | None = None,
+            remove_inline_keyboard: bool = False
+    ):
+        """
+        Правка сообщения в чате обновления, по умолчанию - сообщения с нажатой кнопкой.
+        """
+        if isinstance(update, BotCallbackQuery):
+            message_id = message_id or update.message_id
+
+        if not message_id:
+            raise ValueError(f"Not enough params! ({message_id=})")
+
+        self._put(update, "edit", {
+            "text": text,
+            "inline_keyboard": inline_keyboard.signature() if inline_keyboard else None,
+            "message_id": message_id,
+            "remove_inline_keyboard": remove_inline_keyboard
+        })
+
+    def _put(self, update: BotUpdate, method: str, params: dict):
+        self.add(OutboxMessage(
+            origin=update.origin,
+            chat_id=update.chat_id,
+            bot_id=update.bot_id,
+            method=method,
+            data=orjson.dumps(params)
+        ))
+
+    async def get(self, message_id: int) -> OutboxMessage | None:
+        return await self.session.get(OutboxMessage, message_id)
+
+    async def list(self, limit: int = 100, *, where: ColumnElement[bool] | None = None) -> list[OutboxMessage]:
+        """
+        Готовые к отправке сообщения в порядке записи.
+        Сообщение не выбирается, пока более раннее сообщение его чата отложено после неудачи:
+        иначе новая правка ушла бы раньше старой, а повтор старой затёр бы её.
+        :param where: дополнительное условие (например, чаты экземпляра).
+        """
+        earlier = aliased(OutboxMessage)
+        return list((await self.session.execute(
+            select(OutboxMessage).
+            where(
+                OutboxMessage.available_at <= func.now(),
+                ~select(earlier.id).where(
+                    earlier.origin == OutboxMessage.origin,
+                    earlier.chat_id == OutboxMessage.chat_id,
+                    earlier.id < OutboxMessage.id,
+                    earlier.available_at > func.now()
+                ).exists(),
+                true() if where is None else where
+            ).
+            order_by(OutboxMessage.id).
+            limit(limit)
+        )).scalars())
+
+    async def delete(self, ids: Iterable[int]) -> int:
+        return (await self.session.execute(
+            delete(OutboxMessage).where(OutboxMessage.id.in_(ids))
+        )).rowcount
+
+    async def sending(self, message_id: int):
+        """
+        Отмечает, что отправка сообщения началась (см. OutboxMessage.sending_at).
+        """
+        await self.session.execute(
+            update(OutboxMessage).where(OutboxMessage.id == message_id).values(sending_at=func.now())
+        )
+
+    async def postpone(
+            self,
+            ids: Iterable[int],
+            available_at: datetime,
+            *,
+            attempts: int | None = None,
+            not_sent: bool = False
+    ):
+        """
+        Откладывает повторную отправку сообщений.
+        :param attempts: новое число попыток (None - не менять).
+        :param not_sent: платформа точно не приняла сообщения, отметка о начале отправки снимается.
+        """
+        values = {"available_at": available_at} | ({} if attempts is None else {"attempts": attempts})
+        if not_sent:
+            values["sending_at"] = None
+        await self.session.execute(
+            update(OutboxMessage).where(OutboxMessage.id.in_(ids)).values(**values)
+        )
+
+
+class ForwardedUpdateRepository(AbstractRepository):
+    """
+    Обновления, пересланные владельцам разделов (см. Partitions).
+    """
+
+    def add(self, forwarded_update: ForwardedUpdate):
+        self.session.add(forwarded_update)
+
+    async def get(self, forwarded_update_id: int) -> ForwardedUpdate | None:
+        return await self.session.get(ForwardedUpdate, forwarded_update_id)
+
+    async def take(self, partitions: Iterable[int]) -> list[bytes]:
+        """
+        Удаляет обновления разделов и возвращает их в порядке пересылки.
+        """
+        rows = (await self.session.execute(
+            delete(ForwardedUpdate).
+            where(ForwardedUpdate.partition.in_(partitions)).
+            returning(ForwardedUpdate.id, ForwardedUpdate.data)
+        )).all()
+        return [data for _, data in sorted(rows)]
+
+    async def list(self) -> list[ForwardedUpdate]:
+        return list((await self.session.execute(
+            select(ForwardedUpdate).order_by(ForwardedUpdate.id)
+        )).scalars())
+
+
 class AdminRepository(AbstractRepository):
     def add(self, admin: Admin):
         self.session.add(admin)
@@ -0,0 +1,83 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+
+from app.abc.cleanup_ctx import CleanupCTX
+from app.abc.message import Message
+from app.game.models import DelayedMessage
+from app.store.unit_of_work import TimerClaim, LeaseLost, timer_claim
+
+
+class DatabaseTimers(CleanupCTX):
+    """
+    Таймеры отложенных сообщений, для которых таблица delayed_messages - единственный источник истины.
+    Воркер пачками берёт наступившие строки в аренду через SELECT ... FOR UPDATE SKIP LOCKED
+    (claimed_until) и передаёт сообщения обработчикам.
+    Строка таймера удаляется в транзакции, которой обработчик фиксирует свои изменения (см. UnitOfWork.commit),
+    и только пока аренда своя. Если процесс упал или обработчик завершился ошибкой до фиксации, аренда
+    истекает и таймер срабатывает снова; если аренда истекла раньше фиксации, изменения обработчика
+    откатываются. Так изменения обработчика применяются ровно один раз. Таймеры переживают перезапуск
+    без восстановления.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        config = self.app.config.timers
+        self._interval, self._batch, self._lease = config.interval, config.batch, config.lease
+        self._task: asyncio.Task | None = None
+        self._deliveries: set[asyncio.Task] = set()
+
+    async def on_startup(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def on_shutdown(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.wait([self._task])
+        # Неподтверждённые таймеры сработают снова после истечения аренды.
+        if self._deliveries:
+            await asyncio.wait(self._deliveries, timeout=3)
+
+    async def _run(self):
+        while True:
+            try:
+                while await self._claim() == self._batch:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.logger.exception("claiming timers failed", exc_info=e)
+            await asyncio.sleep(self._interval)
+
+    async def _claim(self) -> int:
+        claimed_until = datetime.now(tz=timezone.utc) + timedelta(seconds=self._lease)
+        async with self.app.store.db() as uow:
+            delayed_messages = await uow.delayed_messages.claim(
+                self._batch,
+                claimed_until,
+                where=self.app.store.partitions.filter(DelayedMessage.origin, DelayedMessage.chat_id)
+            )
+            await uow.commit()
+
+        for dm in delayed_messages:
+            task = asyncio.create_task(self._deliver(dm.id, Message.from_model(dm), claimed_until))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+        return len(delayed_messages)
+
+    async def _deliver(self, delayed_message_id: int, message: Message, claimed_until: datetime):
+        claim = TimerClaim(delayed_message_id, claimed_until)
+        timer_claim.set(claim)
+        if not await self.app.bus.deliver(message):
+            if not claim.acked:
+                self.logger.warning(f"timer {delayed_message_id} ({message.name}) failed, retrying after its lease")
+            return
+        if claim.acked:
+            return
+        # Обработчики ничего не зафиксировали: таймер подтверждается пустой транзакцией.
+        try:
+            async with self.app.store.db() as uow:
+                await uow.commit()
+        except LeaseLost:
+            pass
+        except Exception as e:
+            self.logger.exception(f"acknowledging timer {delayed_message_id} failed", exc_info=e)
@@ -1,29 +1,115 @@
-from typing import Self
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from typing import Self, Callable, Awaitable, Any
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.store.lean import LeanRepository
 from app.store.repository import ThemeRepository, PlayerRepository, GameRepository, DelayedMessageRepository, \
-    AdminRepository
+    AdminRepository, QuestionRepository, OutboxRepository, ForwardedUpdateRepository
+
+
+class LeaseLost(Exception):
+    """
+    Аренда таймера истекла, таймер отменён или раздел чата перешёл к другому экземпляру:
+    обработчик не должен фиксировать свои изменения.
+    """
+
+
+@dataclass(slots=True)
+class TimerClaim:
+    """
+    Аренда таймера, сообщение которого обрабатывается в текущей задаче (см. DatabaseTimers).
+    """
+    delayed_message_id: int
+    claimed_until: datetime
+    acked: bool = False
+
+
+# Задачи обработчиков наследуют аренду из задачи доставки таймера.
+timer_claim: ContextVar[TimerClaim | None] = ContextVar("timer_claim", default=None)
+# Проверка, что чат обработчика всё ещё относится к разделам экземпляра (см. Handler, Partitions).
+chat_fence: ContextVar[Callable[[], bool] | None] = ContextVar("chat_fence", default=None)
 
 
 class UnitOfWork:
-    def __init__(self, session: AsyncSession):
+    """
+    Транзакция и её репозитории. Сетевые вызовы (сообщения ботов) не должны выполняться
+    внутри блока: соединение пула занято, пока блок не закончится. Данные для них
+    собираются внутри блока, а сами вызовы делаются после него или откладываются через later.
+    Сообщения, которые должны уйти вместе с изменением игры, записываются в outbox.
+    """
+
+    def __init__(self, session: AsyncSession, on_outbox: Callable[[], Any] | None = None):
+        """
+        :param session: сессия транзакции.
+        :param on_outbox: вызывается после фиксации транзакции, в которой были записаны сообщения outbox.
+        """
         self.session = session
         self.themes = ThemeRepository(session)
+        self.questions = QuestionRepository(session)
         self.players = PlayerRepository(session)
         self.games = GameRepository(session)
         self.delayed_messages = DelayedMessageRepository(session)
         self.admins = AdminRepository(session)
+        self.outbox = OutboxRepository(session)
+        self.forwarded_updates = ForwardedUpdateRepository(session)
+        # строки без ORM для горячих путей только на чтение и удаление.
+        self.lean = LeanRepository(session)
+        self._effects: list[Callable[[], Awaitable[Any]]] = []
+        self._on_outbox = on_outbox
 
     async def __aenter__(self) -> Self:
         return self
 
-    async def __aexit__(self, *args):
-        await self.rollback()
+    async def __aexit__(self, exc_type, *args):
+        # close откатывает незафиксированное, но не сбрасывает загруженные атрибуты:
+        # объекты остаются доступны для чтения после блока.
         await self.session.close()
+        effects, self._effects = self._effects, []
+        if exc_type is None:
+            for effect in effects:
+                await effect()
+
+    def later(self, func: Callable[..., Awaitable[Any]], /, *args, **kwargs):
+        """
+        Откладывает вызов до выхода из блока и освобождения соединения.
+        Отложенные вызовы выполняются по порядку и только если блок завершился без исключения.
+        """
+        self._effects.append(partial(func, *args, **kwargs))
 
     async def commit(self):
-        await self.session.commit()
+        """
+        Фиксирует транзакцию. Первая фиксация обработчика сработавшего таймера удаляет строку таймера
+        в той же транзакции: изменения обработчика и подтверждение таймера применяются вместе,
+        и повторно доставленный таймер не повторит их.
+        Обработчик не фиксирует изменения чата, раздел которого экземпляр уже не держит.
+        :raises LeaseLost: аренда таймера перешла к другому воркеру, таймер отменён или раздел чата
+            потерян - транзакция откатывается.
+        """
+        if (fence := chat_fence.get()) is not None and not fence():
+            await self.rollback()
+            raise LeaseLost("chat partition is no longer held")
+        claim = timer_claim.get()
+        if claim is not None and not claim.acked:
+            claim.acked = True
+            try:
+                if not await self.delayed_messages.ack(claim.delayed_message_id, claim.claimed_until):
+                    await self.rollback()
+                    raise LeaseLost(f"timer {claim.delayed_message_id} is no longer claimed")
+                await self.session.commit()
+            except BaseException:
+                claim.acked = False
+                raise
+        else:
+            await self.session.commit()
+        if self.outbox.pending:
+            self.outbox.pending = 0
+            if self._on_outbox is not None:
+                self._on_outbox()
 
     async def rollback(self):
         await self.session.rollback()
+        self.outbox.pending = 0
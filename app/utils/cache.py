@@ -0,0 +1,38 @@
+import time
+from collections import OrderedDict
+from typing import Hashable, Any
+
+
+class TTLCache:
+    """
+    LRU-кэш ограниченного размера, записи которого устаревают через ttl секунд.
+    """
+
+    def __init__(self, ttl: float, capacity: int = 10_000):
+        self.cache: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.ttl = ttl
+        self.capacity = capacity
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        if (item := self.cache.get(key)) is None:
+            return default
+        expires_at, value = item
+        if expires_at < time.monotonic():
+            del self.cache[key]
+            return default
+        self.cache.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        self.cache[key] = (time.monotonic() + self.ttl, value)
+        self.cache.move_to_end(key)
+        if len(self.cache) > self.capacity:
+            self.cache.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        if (item := self.cache.pop(key, None)) is None:
+            return default
+        return item[1]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key) is not None
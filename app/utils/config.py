@@ -13,6 +13,17 @@ class SettingsConfig:
     debug: bool = field(default_factory=bool)
 
 
+@dataclass
+class MediaConfig:
+    max_size: int = 50 * 1024 * 1024  # bytes
+    chunk_size: int = 64 * 1024  # bytes
+    workers: int = 4
+    preprocess: bool = False
+    processes: int = 2
+    max_image_side: int = 1280  # px
+    image_quality: int = 85
+
+
 @dataclass
 class SessionConfig:
     key: str
@@ -33,6 +44,13 @@ class DatabaseConfig:
     database: str
     host: str
     port: int
+    # pool_size + max_overflow должно оставаться меньше max_connections сервера.
+    pool_size: int = 10
+    max_overflow: int = 5
+    pool_timeout: float = 10  # seconds
+    pool_recycle: int = 30 * 60  # seconds
+    pool_pre_ping: bool = True
+    statement_cache_size: int = 500  # подготовленных запросов asyncpg на соединение
 
     @property
     def dsn(self) -> str:
@@ -44,15 +62,55 @@ class DatabaseConfig:
         ])
 
 
+@dataclass
+class VkGroupConfig:
+    token: str
+    group_id: int
+
+
 @dataclass
 class VkConfig:
     token: str
     group_id: int
+    groups: list[VkGroupConfig] = field(default_factory=list)  # дополнительные сообщества
+
+    def __post_init__(self):
+        self.groups = [g if isinstance(g, VkGroupConfig) else VkGroupConfig(**g) for g in self.groups]
+
+    @property
+    def all_groups(self) -> list[VkGroupConfig]:
+        return [VkGroupConfig(self.token, self.group_id), *self.groups]
 
 
 @dataclass
 class TelegramConfig:
     token: str
+    tokens: list[str] = field(default_factory=list)  # токены дополнительных ботов
+    webhook_url: str | None = None
+    webhook_secret: str | None = None
+    media_chat_id: int | None = None  # служебный чат для предзагрузки медиа
+
+    def __post_init__(self):
+        if self.webhook_url and not self.webhook_secret:
+            raise ValueError("telegram.webhook_secret is required when telegram.webhook_url is set")
+
+    @property
+    def all_tokens(self) -> list[str]:
+        return [self.token, *self.tokens]
+
+
+@dataclass
+class ClusterConfig:
+    partitions: int = 0  # разделов чатов между экземплярами приложения, 0 - один экземпляр
+    heartbeat: float = 5  # seconds
+
+
+@dataclass
+class TimersConfig:
+    backend: str = "memory"  # memory - задача на каждый таймер, database - выборка наступивших из таблицы
+    interval: float = 0.5  # seconds, опрос таблицы (database)
+    batch: int = 100  # таймеров за запрос (database)
+    lease: float = 60  # seconds, после которых необработанный таймер забирается снова (database)
 
 
 @dataclass
@@ -61,8 +119,11 @@ class Config:
     database: DatabaseConfig
     admin: AdminConfig
     settings: SettingsConfig
+    media: MediaConfig
     telegram: TelegramConfig
     vk: VkConfig
+    cluster: ClusterConfig
+    timers: TimersConfig
 
     @classmethod
     def load(cls):
@@ -72,6 +133,9 @@ class Config:
             telegram=TelegramConfig(**raw_config["telegram"]),
             vk=VkConfig(**raw_config["vk"]),
             settings=SettingsConfig(**raw_config["settings"]),
+            media=MediaConfig(**raw_config.get("media", {})),
+            cluster=ClusterConfig(**raw_config.get("cluster", {})),
+            timers=TimersConfig(**raw_config.get("timers", {})),
             session=SessionConfig(**raw_config["session"]),
             database=DatabaseConfig(**raw_config["database"]),
             admin=AdminConfig(**raw_config["admin"])
@@ -0,0 +1,184 @@
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from urllib.parse import urlsplit
+
+import orjson
+from aiohttp import ClientSession, TCPConnector, ClientTimeout, ClientConnectionError, ClientPayloadError, ClientError
+from yarl import URL
+
+from app.abc.cleanup_ctx import CleanupCTX
+
+
+class CircuitOpen(Exception):
+    """
+    Платформа недоступна: запросы к ней временно не выполняются.
+    """
+
+    def __init__(self, name: str, retry_in: float):
+        super().__init__(f"circuit {name} is open, retry in {retry_in:.1f} seconds")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class ServerError(ClientError):
+    """
+    Платформа ответила 5xx (или телом, которое не разбирается как JSON).
+    """
+
+    def __init__(self, status: int):
+        super().__init__(f"server responded with {status}")
+        self.status = status
+
+
+@dataclass(slots=True)
+class Circuit:
+    """
+    Предохранитель одной платформы.
+    После threshold неудач подряд размыкается на reset_timeout секунд,
+    затем пропускает один пробный запрос: успех замыкает его, неудача размыкает снова.
+    Пока пробный запрос выполняется, остальные запросы не пропускаются.
+    """
+    threshold: int = 5
+    reset_timeout: float = 30  # seconds
+    trial_timeout: float = 1  # seconds, через сколько повторить запрос, пока идёт пробный
+    failures: int = 0
+    opened_at: float | None = None
+    trial: bool = False
+
+    def check(self, name: str) -> bool:
+        """
+        :return: запрос пробный - его исход нужно сообщить через success, failure или release.
+        :raise CircuitOpen: запрос выполнять нельзя.
+        """
+        if self.opened_at is None:
+            return False
+        if (retry_in := self.opened_at + self.reset_timeout - time.monotonic()) > 0:
+            raise CircuitOpen(name, retry_in)
+        if self.trial:
+            raise CircuitOpen(name, self.trial_timeout)
+        self.trial = True
+        return True
+
+    def success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.trial = False
+
+    def failure(self):
+        self.failures += 1
+        self.trial = False
+        if self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """
+        Пробный запрос завершился без ответа платформы (например, был отменён).
+        """
+        self.trial = False
+
+
+class HttpClient(CleanupCTX):
+    """
+    Общий HTTP-клиент ботов: один пул соединений с keep-alive и кэшем DNS,
+    таймауты на каждый запрос, повтор идемпотентных запросов с экспоненциальной
+    задержкой и случайным разбросом, предохранитель на каждую платформу.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._session: ClientSession | None = None
+        self._limit = 100  # соединений всего
+        self._limit_per_host = 50
+        self._keepalive_timeout = 60  # seconds
+        self._dns_ttl = 300  # seconds
+        self._connect_timeout = 5  # seconds
+        self._timeout = 15  # seconds
+        self._retries = 2
+        self._backoff = 0.5  # seconds
+        self._circuits: dict[str, Circuit] = {}
+
+    async def on_startup(self):
+        self._session = ClientSession(
+            connector=TCPConnector(
+                limit=self._limit,
+                limit_per_host=self._limit_per_host,
+                keepalive_timeout=self._keepalive_timeout,
+                ttl_dns_cache=self._dns_ttl
+            ),
+            timeout=ClientTimeout(total=self._timeout, connect=self._connect_timeout)
+        )
+
+    async def on_shutdown(self):
+        await self._session.close()
+
+    async def request(
+            self,
+            method: str,
+            url: str,
+            *,
+            params: dict | None = None,
+            data=None,
+            json: dict | None = None,
+            form: dict | None = None,
+            timeout: float | None = None,
+            idempotent: bool = False
+    ) -> dict:
+        """
+        Выполняет запрос и возвращает разобранный JSON-ответ.
+        :param method: HTTP-метод.
+        :param url: адрес.
+        :param params: параметры строки запроса.
+        :param data: тело запроса (форма или multipart).
+        :param json: тело запроса в JSON, кодируется orjson один раз до отправки.
+        :param form: тело запроса в виде формы, кодируется один раз до отправки.
+        :param timeout: таймаут всего запроса в секундах (по умолчанию 15).
+        :param idempotent: запрос можно безопасно повторить при сетевой ошибке или 5xx.
+        :raise CircuitOpen: платформа признана недоступной.
+        :raise ServerError: платформа ответила 5xx или не-JSON после всех попыток.
+        """
+        name = urlsplit(url).hostname
+        circuit = self._circuits.setdefault(name, Circuit())
+        trial = circuit.check(name)
+
+        headers = None
+        if json is not None:
+            data, headers = orjson.dumps(json), {"Content-Type": "application/json"}
+        elif form is not None:
+            # Кодировщик строки запроса yarl написан на C, urlencode для формы aiohttp - на Python.
+            data = URL.build(query=form).raw_query_string.encode()
+            headers = {"Content-Type": "application/x-www-form-urlencoded"}
+
+        attempts = self._retries + 1 if idempotent else 1
+        try:
+            for attempt in range(attempts):
+                try:
+                    async with self._session.request(
+                            method,
+                            url,
+                            params=params,
+                            data=data,
+                            headers=headers,
+                            timeout=ClientTimeout(total=timeout or self._timeout, connect=self._connect_timeout)
+                    ) as response:
+                        if response.status >= 500:
+                            raise ServerError(response.status)
+                        try:
+                            result = await response.json(content_type=None, loads=orjson.loads)
+                        except ValueError:
+                            # Страница ошибки прокси или балансировщика вместо ответа API.
+                            raise ServerError(response.status)
+                except (ClientConnectionError, ClientPayloadError, ServerError, TimeoutError) as e:
+                    circuit.failure()
+                    if attempt + 1 == attempts or circuit.opened_at is not None:
+                        raise
+                    delay = self._backoff * 2 ** attempt * random.uniform(0.5, 1.5)
+                    self.logger.warning(f"{method} {name}: {e!r}, retrying in {delay:.2f} seconds")
+                    await asyncio.sleep(delay)
+                else:
+                    circuit.success()
+                    return result
+        finally:
+            if trial:
+                circuit.release()
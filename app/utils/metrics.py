@@ -0,0 +1,180 @@
+"""
+Метрики приложения в текстовом формате Prometheus.
+Значения - обычные атрибуты объектов: приложение работает в одном потоке событийного цикла,
+поэтому обновление метрики - это сложение без блокировок. Дочерние значения с метками создаются
+при первом обращении, на горячих путях их держат в атрибутах или берут из словаря по строке.
+"""
+import time
+from bisect import bisect_left
+from typing import Callable, Hashable
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)  # seconds
+
+
+class Counter:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: float = 1):
+        self.value += amount
+
+    def samples(self, name: str, labels: str) -> list[str]:
+        return [f"{name}{labels} {self.value}"]
+
+
+class Gauge(Counter):
+    __slots__ = ()
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Histogram:
+    __slots__ = ("_bounds", "_counts", "sum", "count")
+
+    def __init__(self, bounds: tuple[float, ...] = _LATENCY_BUCKETS):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)  # последняя корзина - +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value: float):
+        self._counts[bisect_left(self._bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name: str, labels: str) -> list[str]:
+        prefix = labels[1:-1] + ',' if labels else ''
+        lines, cumulative = [], 0
+        for bound, count in zip((*self._bounds, "+Inf"), self._counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{labels} {self.sum}")
+        lines.append(f"{name}_count{labels} {self.count}")
+        return lines
+
+
+class Family:
+    """
+    Метрика с метками: значение на каждый набор значений меток.
+    """
+
+    def __init__(self, name: str, documentation: str, kind: str, factory: Callable, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labels_names = labels
+        self._factory = factory
+        self._children: dict[Hashable, Counter | Gauge | Histogram] = {}
+        if not labels:
+            self._children[()] = factory()
+
+    def labels(self, *values: str):
+        if (child := self._children.get(values)) is None:
+            child = self._children[values] = self._factory()
+        return child
+
+    def __getattr__(self, item):
+        # Метрика без меток работает как её единственное значение.
+        return getattr(self._children[()], item)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._children.items():
+            labels = ','.join(f'{k}="{_escape(str(v))}"' for k, v in zip(self.labels_names, values))
+            lines.extend(child.samples(self.name, f"{{{labels}}}" if labels else ''))
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._families: list[Family] = []
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Family:
+        return self._add(Family(name, documentation, "counter", Counter, labels))
+
+    def gauge(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Family:
+        return self._add(Family(name, documentation, "gauge", Gauge, labels))
+
+    def histogram(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Family:
+        return self._add(Family(name, documentation, "histogram", Histogram, labels))
+
+    def render(self) -> str:
+        return '\n'.join(line for family in self._families for line in family.render()) + '\n'
+
+    def _add(self, family: Family) -> Family:
+        self._families.append(family)
+        return family
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+REGISTRY = Registry()
+
+UPDATE_LATENCY = REGISTRY.histogram(
+    "bot_update_response_seconds", "Time from receiving an update to the first API call into its chat.", ("origin",)
+)
+API_LATENCY = REGISTRY.histogram(
+    "bot_api_request_seconds", "Platform API request latency.", ("origin", "method")
+)
+API_ERRORS = REGISTRY.counter(
+    "bot_api_errors_total", "Platform API requests that failed or returned an error.", ("origin", "method")
+)
+API_RETRY_AFTER = REGISTRY.counter(
+    "bot_api_retry_after_total", "Platform API requests throttled with retry_after.", ("origin",)
+)
+HANDLER_DENIALS = REGISTRY.counter(
+    "bot_handler_denials_total", "Updates dropped by LimitedHandler.", ("reason",)
+)
+GAMES = REGISTRY.gauge("games", "Active games by state.", ("state",))
+TIMERS = REGISTRY.gauge("delayed_messages", "Pending delayed messages.", ("storage",))
+BUS_QUEUE = REGISTRY.gauge("bus_queue_depth", "Messages waiting in the message bus queue.")
+DB_POOL = REGISTRY.gauge("db_pool", "Database connection pool state and counters.", ("stat",))
+
+
+class ApiMetrics:
+    """
+    Задержка и ошибки запросов к API одной платформы с кэшем значений по имени метода.
+    """
+
+    def __init__(self, origin: str):
+        self._origin = origin
+        self._methods: dict[str, tuple[Histogram, Counter]] = {}
+
+    def __getitem__(self, method: str) -> tuple[Histogram, Counter]:
+        if (metrics := self._methods.get(method)) is None:
+            metrics = self._methods[method] = (
+                API_LATENCY.labels(self._origin, method), API_ERRORS.labels(self._origin, method)
+            )
+        return metrics
+
+
+class ResponseLatency:
+    """
+    Время от получения обновления до первого исходящего запроса в его чат.
+    Отсчёт идёт от самого раннего обновления чата, на которое ещё не было ответа.
+    Обновления, оставшиеся без ответа дольше max_age, не учитываются.
+    """
+
+    def __init__(self, origin: str):
+        self._histogram = UPDATE_LATENCY.labels(origin)
+        self._received: dict[int, float] = {}
+        self._capacity = 10_000  # чатов, ожидающих ответа
+        self._max_age = 60  # seconds
+
+    def received(self, chat_id: int):
+        if chat_id in self._received:
+            return
+        if len(self._received) >= self._capacity:
+            self._received.clear()
+        self._received[chat_id] = time.perf_counter()
+
+    def responded(self, chat_id: int):
+        if (received := self._received.pop(chat_id, None)) is None:
+            return
+        if (elapsed := time.perf_counter() - received) <= self._max_age:
+            self._histogram.observe(elapsed)
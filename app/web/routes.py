@@ -1,5 +1,6 @@
 from app.web.application import Application
-from app.web.views import ThemesView, MediaView, ThemeView, QuestionView, SessionView
+from app.web.views import ThemesView, MediaView, ThemeView, QuestionView, SessionView, TelegramWebhookView, \
+    DatabasePoolView, MetricsView
 
 
 def setup_web_routes(app: Application):
@@ -8,3 +9,9 @@ def setup_web_routes(app: Application):
     app.router.add_view("/themes/{theme_id}/questions/{question_id}", QuestionView)
     app.router.add_view("/themes/{theme_id}/questions/{question_id}/media", MediaView)
     app.router.add_view("/session/", SessionView)
+    app.router.add_view("/database/pool", DatabasePoolView)
+    app.router.add_view("/metrics", MetricsView)
+    if app.config.telegram.webhook_url:
+        # В режиме опроса маршрут вебхука лишь открывал бы вход для поддельных обновлений.
+        app.router.add_view("/telegram/webhook", TelegramWebhookView)
+        app.router.add_view(r"/telegram/webhook/{bot_id:-?\d+}", TelegramWebhookView)
@@ -1,12 +1,15 @@
-from uuid import uuid4
-
-from aiohttp.web_exceptions import HTTPUnauthorized
+from aiohttp import web
+from aiohttp.web_exceptions import HTTPUnauthorized, HTTPForbidden, HTTPNotFound, HTTPBadRequest, \
+    HTTPServiceUnavailable
 from aiohttp_apispec import request_schema, response_schema, docs
 from aiohttp_session import new_session, get_session
+from orjson import orjson
 from sqlalchemy.exc import IntegrityError
 
 from app.admin.models import SessionAdmin
 from app.game.models import Theme
+from app.store.media import MediaTooLarge, UnsupportedMedia
+from app.utils.metrics import REGISTRY, TIMERS, BUS_QUEUE, DB_POOL
 from app.utils.responses import json_response, error_json_response
 from app.web.application import View, AuthRequired
 from app.web.schemas import NewThemeSchema, ThemeSchema, ResponseThemesSchema, EditThemeSchema, EditQuestionSchema, \
@@ -65,24 +68,35 @@ class MediaView(View):
         theme_id = int(self.request.match_info['theme_id'])
         question_id = int(self.request.match_info['question_id'])
 
+        # Файл пишется на диск до открытия транзакции: соединение пула не занято на время загрузки.
+        field = await (await self.request.multipart()).next()
+        if field is None:
+            return error_json_response(http_status=400, message="Media file is required!")
+        try:
+            staged = await self.app.store.media.save(field)
+        except MediaTooLarge as e:
+            return error_json_response(http_status=413, message=str(e))
+        except UnsupportedMedia as e:
+            return error_json_response(http_status=415, message=str(e))
+
         async with self.app.store.db() as uow:
-            theme = await uow.themes.get(theme_id)
-            if theme is None:
-                return error_json_response(http_status=404, message="Specific theme not found!")
-            for q in theme.questions:
-                if q.id == question_id:
-                    async for field in (await self.request.multipart()):
-                        file = await field.read()
-                        if q.filename:
-                            self.app.store.remove(q.filename)
-                        content_type = field.headers['Content-Type']
-                        _, ext = content_type.split('/')
-                        q.content_type = content_type
-                        q.filename = str(uuid4().hex) + "." + ext
-                        self.app.store.save(q.filename, file)
-                        await uow.commit()
-                        return json_response(message="Media successfully added!")
-        return error_json_response(http_status=404, message="Specific question not found!")
+            try:
+                theme = await uow.themes.get(theme_id)
+                q = next((q for q in theme.questions if q.id == question_id), None) if theme else None
+            except BaseException:
+                await self.app.store.media.discard(staged)
+                raise
+            if q is None:
+                await self.app.store.media.discard(staged)
+                message = "Specific theme not found!" if theme is None else "Specific question not found!"
+                return error_json_response(http_status=404, message=message)
+            previous_filename = q.filename
+            q.content_type = staged.content_type
+            q.filename = staged.name
+            async with self.app.store.media.publishing(staged):
+                await uow.commit()
+        await self.app.store.media.release(previous_filename)
+        return json_response(message="Media successfully added!")
 
     @docs(tags=["media"])
     async def delete(self):
@@ -93,14 +107,14 @@ class MediaView(View):
             theme = await uow.themes.get(theme_id)
             if theme is None:
                 return error_json_response(http_status=404, message="Specific theme not found!")
-            for q in theme.questions:
-                if q.id == question_id:
-                    self.app.store.remove(q.filename)
-                    q.filename = None
-                    q.content_type = None
-                    await uow.commit()
-                    return json_response(message="Media successfully deleted!")
-        return error_json_response(http_status=404, message="Specific question not found!")
+            if (q := next((q for q in theme.questions if q.id == question_id), None)) is None:
+                return error_json_response(http_status=404, message="Specific question not found!")
+            previous_filename = q.filename
+            q.filename = None
+            q.content_type = None
+            await uow.commit()
+        await self.app.store.media.release(previous_filename)
+        return json_response(message="Media successfully deleted!")
 
 
 @AuthRequired
@@ -138,11 +152,10 @@ class ThemeView(View):
             theme = await uow.themes.get()
             if not theme:
                 return error_json_response(http_status=404, message="Specific theme not found!")
-            for q in theme.questions:
-                if q.filename is not None:
-                    self.app.store.remove(q.filename)
+            filenames = [q.filename for q in theme.questions]
             await uow.themes.delete(theme_id)
             await uow.commit()
+        await self.app.store.media.release(*filenames)
         return json_response(message="Theme successfully deleted!")
 
 
@@ -180,3 +193,48 @@ class QuestionView(View):
                         return json_response(message="Theme successfully updated!")
 
             return error_json_response(http_status=404, message="Specific question not found!")
+
+
+@AuthRequired
+class DatabasePoolView(View):
+    @docs(tags=["database"])
+    async def get(self):
+        if (stats := self.app.store.db.pool_stats()) is None:
+            return error_json_response(http_status=404, message="Pool statistics are not available!")
+        return json_response(data=stats)
+
+
+@AuthRequired
+class MetricsView(View):
+    """
+    Метрики в текстовом формате Prometheus. Показатели состояния из базы (игры, таймеры в таблице)
+    обновляются периодически (см. StateGauges), остальные (таймеры в памяти, очередь шины, пул)
+    считаются в момент запроса, счётчики и гистограммы накапливаются по ходу работы.
+    """
+
+    @docs(tags=["metrics"])
+    async def get(self):
+        TIMERS.labels("memory").set(self.app.bus.pending_timers)
+        BUS_QUEUE.set(self.app.bus.queued)
+        for stat, value in (self.app.store.db.pool_stats() or {}).items():
+            DB_POOL.labels(stat).set(value)
+        return web.Response(text=REGISTRY.render(), content_type="text/plain; version=0.0.4", charset="utf-8")
+
+
+class TelegramWebhookView(View):
+    @docs(tags=["telegram"])
+    async def post(self):
+        bot_id = self.request.match_info.get("bot_id")
+        telegram = self.app.bot.telegram(int(bot_id) if bot_id is not None else None)
+        if telegram is None:
+            raise HTTPNotFound
+        if not telegram.verify(self.request.headers.get("X-Telegram-Bot-Api-Secret-Token")):
+            raise HTTPForbidden
+        try:
+            update = await self.request.json(loads=orjson.loads)
+        except ValueError:
+            # Повтор того же тела не поможет: иначе Telegram присылал бы его снова и снова.
+            raise HTTPBadRequest
+        if not telegram.feed(update):
+            raise HTTPServiceUnavailable
+        return json_response()
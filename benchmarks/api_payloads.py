@@ -0,0 +1,95 @@
+"""
+Кодирование параметров запросов к API платформ: прежние строки запроса против тел POST-запросов.
+Сравнивается только работа процесса до отправки: сборка клавиатуры, кодирование параметров
+и строки запроса так же, как это делает aiohttp (URL.extend_query), без сети.
+Клавиатура - табло вопросов make_table полной игры.
+
+Запуск из корня репозитория: python -m benchmarks.api_payloads
+"""
+import timeit
+
+import orjson
+from yarl import URL
+
+from app.bot.inline import InlineKeyboard
+from app.bot.telegram.accessor import TelegramAPIAccessor
+from app.bot.vk.accessor import VkAPIAccessor
+from app.game.keyboards import make_table
+from app.game.models import Theme, Question
+
+THEMES = 6
+QUESTIONS = 5
+TEXT = "🔮 Так сошлись звезды...\n\n<b>Игрок</b> будет первым выбирать вопрос."
+TELEGRAM_URL = "https://api.telegram.org/bot123456:token/sendMessage"
+VK_URL = "https://api.vk.com/method/messages.edit"
+
+
+def board() -> InlineKeyboard:
+    themes = [
+        Theme(id=t, title=f"Тема {t}", questions=[
+            Question(id=t * QUESTIONS + q, cost=(q + 1) * 100) for q in range(QUESTIONS)
+        ]) for t in range(THEMES)
+    ]
+    return make_table(themes, already_selected=[1, 7, 12])
+
+
+def telegram_query(keyboard: InlineKeyboard) -> str:
+    # Как было: клавиатура и callback_data кодировались в JSON-строки и уходили в строке GET-запроса.
+    markup = orjson.dumps({"inline_keyboard": [
+        [
+            {
+                'text': b.text,
+                "callback_data": orjson.dumps(b.callback_data).decode("utf-8")
+            } for b in line
+        ] for line in keyboard
+    ]}).decode("utf-8")
+    params = dict(chat_id=-100123456789, text=TEXT, parse_mode='HTML', reply_markup=markup)
+    return URL(TELEGRAM_URL).extend_query(params).raw_path_qs
+
+
+def telegram_body(keyboard: InlineKeyboard) -> bytes:
+    payload = {"chat_id": -100123456789, "text": TEXT, "parse_mode": 'HTML'}
+    return orjson.dumps(payload | TelegramAPIAccessor._reply_markup(keyboard))
+
+
+def vk_params(keyboard: InlineKeyboard) -> dict:
+    return dict(
+        conversation_message_id=42,
+        message=TEXT,
+        peer_id=2000000001,
+        dont_parse_links=0,
+        keyboard=VkAPIAccessor._inline_keyboard_markup(keyboard),
+        access_token="vk1.a." + "x" * 200,
+        v="5.131"
+    )
+
+
+def vk_query(keyboard: InlineKeyboard) -> str:
+    return URL(VK_URL).extend_query(vk_params(keyboard)).raw_path_qs
+
+
+def vk_form(keyboard: InlineKeyboard) -> bytes:
+    # Так HttpClient.request кодирует form.
+    return URL.build(query=vk_params(keyboard)).raw_query_string.encode()
+
+
+def measure(name: str, encode, keyboard: InlineKeyboard, number: int = 5000):
+    best = min(timeit.repeat(lambda: encode(keyboard), number=number, repeat=5)) / number
+    size = len(encode(keyboard))
+    print(f"{name:<28} {best * 1e6:8.1f} µs/call  {size:6} bytes")
+    return best
+
+
+def main():
+    keyboard = board()
+    print(f"make_table: {THEMES} тем x {QUESTIONS} вопросов")
+    query = measure("telegram: query string", telegram_query, keyboard)
+    body = measure("telegram: json body", telegram_body, keyboard)
+    print(f"telegram: {query / body:.1f}x")
+    query = measure("vk: query string", vk_query, keyboard)
+    body = measure("vk: form body", vk_form, keyboard)
+    print(f"vk: {query / body:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+"""
+Разбор обновлений платформ: прежние каскады структурных шаблонов (скопированы ниже как были)
+против loaders.load. Корпус - ответы getUpdates / Long Poll в сыром виде, по составу похожие на игру:
+в основном нажатия кнопок табло и кнопки ответа, реже сообщения с ответами и команды.
+Время включает orjson.loads ответа, как в аксессорах.
+
+Запуск из корня репозитория: python -m benchmarks.update_decoding
+"""
+import random
+import timeit
+
+import orjson
+
+from app.bot.enums import ChatType
+from app.bot.inline import CallbackData
+from app.bot.telegram import loaders as telegram_loaders
+from app.bot.updates import Origin, BotCommand, BotMessage, BotCallbackQuery
+from app.bot.user import BotUser
+from app.bot.vk import loaders as vk_loaders
+
+UPDATES = 5000
+BATCH = 50  # обновлений в ответе
+CALLBACKS, MESSAGES = 0.7, 0.2  # доли; остальное - команды
+BOT_USERNAME, BOT_ID, GROUP_ID = "own_game_bot", 6000000001, 219000001
+
+
+def telegram_corpus(rnd: random.Random, packed: bool) -> list[bytes]:
+    def from_():
+        user_id = rnd.randint(10 ** 8, 10 ** 9)
+        return {"id": user_id, "is_bot": False, "first_name": "Игрок", "last_name": "Тестовый",
+                "username": f"player{user_id}", "language_code": "ru"}
+
+    chat = {"id": -1001234567890, "title": "Своя игра", "type": "supergroup"}
+    updates = []
+    for update_id in range(UPDATES):
+        kind = rnd.random()
+        if kind < CALLBACKS:
+            callback_data = CallbackData("select_question", str(rnd.randint(1, 300)))
+            updates.append({"update_id": update_id, "callback_query": {
+                "id": str(rnd.getrandbits(60)),
+                "from": from_(),
+                "message": {"message_id": rnd.randint(1, 10 ** 5), "from": {"id": BOT_ID, "is_bot": True},
+                            "chat": chat, "date": 1700000000, "text": "Табло"},
+                "chat_instance": "-4710123456789",
+                "data": callback_data.pack() if packed else orjson.dumps(callback_data).decode(),
+            }})
+            continue
+        text = "Ответ игрока" if kind < CALLBACKS + MESSAGES else f"/play@{BOT_USERNAME}"
+        updates.append({"update_id": update_id, "message": {
+            "message_id": rnd.randint(1, 10 ** 5), "from": from_(), "chat": chat, "date": 1700000000, "text": text
+        }})
+    return [orjson.dumps({"ok": True, "result": updates[i:i + BATCH]}) for i in range(0, UPDATES, BATCH)]
+
+
+def vk_corpus(rnd: random.Random) -> list[bytes]:
+    peer_id = 2000000001
+    updates = []
+    for _ in range(UPDATES):
+        kind = rnd.random()
+        if kind < CALLBACKS:
+            updates.append({"group_id": GROUP_ID, "type": "message_event", "event_id": "e", "v": "5.131", "object": {
+                "user_id": rnd.randint(10 ** 8, 10 ** 9), "peer_id": peer_id,
+                "event_id": f"{rnd.getrandbits(48):x}",
+                "payload": {"type": "select_question", "value": str(rnd.randint(1, 300))},
+                "conversation_message_id": rnd.randint(1, 10 ** 5)
+            }})
+            continue
+        text = "Ответ игрока" if kind < CALLBACKS + MESSAGES else f"[club{GROUP_ID}|@own_game] play"
+        updates.append({"group_id": GROUP_ID, "type": "message_new", "event_id": "e", "v": "5.131", "object": {
+            "message": {"date": 1700000000, "from_id": rnd.randint(10 ** 8, 10 ** 9), "id": 0, "out": 0,
+                        "peer_id": peer_id, "text": text, "conversation_message_id": rnd.randint(1, 10 ** 5),
+                        "fwd_messages": [], "important": False, "attachments": [], "is_hidden": False},
+            "client_info": {"button_actions": ["text", "callback"], "keyboard": True, "inline_keyboard": True}
+        }})
+    return [orjson.dumps({"ts": "1", "updates": updates[i:i + BATCH]}) for i in range(0, UPDATES, BATCH)]
+
+
+# Как было: Telegram (accessor._load и loaders).
+
+def telegram_update_from_dict(**data):
+    match data:
+        case {"message": {
+            "from": {"id": user_id} as from_,
+            "chat": {"id": chat_id, "type": chat_type}
+        }}:
+            return dict(
+                origin=Origin.TELEGRAM, user_id=user_id, chat_id=chat_id,
+                chat_type=ChatType.PRIVATE if chat_type == 'private' else ChatType.GROUP,
+                user=BotUser(id=user_id, first_name=from_.get('first_name'),
+                             last_name=from_.get('last_name'), username=from_.get('username'))
+            )
+        case {"callback_query": {
+            "from": {"id": user_id} as from_,
+            "message": {"chat": {"id": chat_id, "type": chat_type}}
+        }}:
+            return dict(
+                origin=Origin.TELEGRAM, user_id=user_id, chat_id=chat_id,
+                chat_type=ChatType.PRIVATE if chat_type == 'private' else ChatType.GROUP,
+                user=BotUser(id=user_id, first_name=from_.get('first_name'),
+                             last_name=from_.get('last_name'), username=from_.get('username'))
+            )
+    raise ValueError("Unprocessable update data.")
+
+
+def telegram_command_from_dict(**data) -> BotCommand:
+    match data:
+        case {"message": {"text": text}}:
+            command, *_ = text.split()
+            return BotCommand(command=command.removeprefix('/'), **telegram_update_from_dict(**data))
+    raise ValueError("Unprocessable Telegram command.")
+
+
+def telegram_message_from_dict(**data) -> BotMessage:
+    match data:
+        case {"message": {"text": text}}:
+            return BotMessage(text=text, **telegram_update_from_dict(**data))
+    raise ValueError("Unprocessable Telegram message data/")
+
+
+def telegram_callback_query_from_dict(**data) -> BotCallbackQuery:
+    match data:
+        case {"callback_query": {
+            "id": callback_query_id,
+            "data": callback_data,
+            "message": {"message_id": message_id}
+        }}:
+            return BotCallbackQuery(
+                callback_data=CallbackData(**orjson.loads(callback_data)),
+                message_id=message_id,
+                callback_query_id=callback_query_id,
+                **telegram_update_from_dict(**data)
+            )
+    raise ValueError("Unprocessable Telegram callback_query data/")
+
+
+def telegram_baseline(body: bytes) -> list:
+    result = []
+    for update in orjson.loads(body)["result"]:
+        match update:
+            case {"message": {"text": text} as command} as data if text.startswith("/"):
+                command["text"] = text.replace(f"@{BOT_USERNAME}", '')
+                result.append(telegram_command_from_dict(**data))
+            case {"message": {"text": _}} as data:
+                result.append(telegram_message_from_dict(**data))
+            case {"callback_query": _} as data:
+                result.append(telegram_callback_query_from_dict(**data))
+    return result
+
+
+def telegram_load(body: bytes) -> list:
+    return [telegram_loaders.load(update, BOT_USERNAME, BOT_ID) for update in orjson.loads(body)["result"]]
+
+
+# Как было: ВК (accessor._pack и loaders).
+
+def vk_update_from_dict(**data):
+    match data:
+        case {"object": {"message": {"from_id": user_id, "peer_id": peer_id}}}:
+            return dict(origin=Origin.VK, user_id=user_id, chat_id=peer_id,
+                        chat_type=vk_loaders.define_chat_type(peer_id), user=None)
+        case {"object": {"user_id": user_id, "peer_id": peer_id}}:
+            return dict(origin=Origin.VK, user_id=user_id, chat_id=peer_id,
+                        chat_type=vk_loaders.define_chat_type(peer_id), user=None)
+    raise ValueError("Unprocessable VK update data.")
+
+
+def vk_command_from_dict(**data) -> BotCommand:
+    match data:
+        case {"object": {"message": {"text": text}}}:
+            if text.startswith('/'):
+                command, *_ = text.split()
+                command = command.removeprefix('/')
+            else:
+                args = text.split(']')
+                command = args[1].strip() if len(args) > 1 else ''
+            return BotCommand(command=command, **vk_update_from_dict(**data))
+    raise ValueError("Unprocessable VK command data.")
+
+
+def vk_message_from_dict(**data) -> BotMessage:
+    match data:
+        case {"object": {"message": {"text": text}}}:
+            return BotMessage(text=text, **vk_update_from_dict(**data))
+    raise ValueError("Unprocessable VK message data.")
+
+
+def vk_callback_query_from_dict(**data) -> BotCallbackQuery:
+    match data:
+        case {"object": {
+            "event_id": event_id,
+            "payload": {"type": data_type, "value": value},
+            "conversation_message_id": conversation_message_id
+        }}:
+            return BotCallbackQuery(
+                message_id=conversation_message_id,
+                callback_data=CallbackData(data_type, value),
+                callback_query_id=event_id,
+                **vk_update_from_dict(**data)
+            )
+    raise ValueError("Unprocessable VK callback_query data.")
+
+
+def vk_baseline(body: bytes) -> list:
+    result = []
+    for update in orjson.loads(body)["updates"]:
+        match update:
+            case {
+                "type": "message_new",
+                "object": {"message": {"text": text}}
+            } as data if text.startswith("/") or text.startswith(f"[club{GROUP_ID}|"):
+                result.append(vk_command_from_dict(**data))
+            case {"type": "message_new", "object": {"message": {"text": text}}} as data if text:
+                result.append(vk_message_from_dict(**data))
+            case {"type": "message_event", "object": {"payload": _}} as data:
+                result.append(vk_callback_query_from_dict(**data))
+    return result
+
+
+def vk_load(body: bytes) -> list:
+    return [vk_loaders.load(update, GROUP_ID) for update in orjson.loads(body)["updates"]]
+
+
+def measure(name: str, decode, corpus: list[bytes]) -> float:
+    def run():
+        return [decode(body) for body in corpus]
+
+    assert sum(map(len, run())) == UPDATES, name
+    best = min(timeit.repeat(run, number=5, repeat=5)) / 5 / UPDATES
+    print(f"{name:<22} {best * 1e6:6.2f} µs/update")
+    return best
+
+
+def main():
+    print(f"{UPDATES} обновлений: {CALLBACKS:.0%} кнопок, {MESSAGES:.0%} сообщений, остальное - команды")
+    baseline = measure("telegram: match", telegram_baseline, telegram_corpus(random.Random(0), packed=False))
+    load = measure("telegram: load", telegram_load, telegram_corpus(random.Random(0), packed=True))
+    print(f"telegram: {baseline / load:.1f}x")
+    corpus = vk_corpus(random.Random(0))
+    baseline = measure("vk: match", vk_baseline, corpus)
+    load = measure("vk: load", vk_load, corpus)
+    print(f"vk: {baseline / load:.1f}x")
+
+
+if __name__ == '__main__':
+    main()